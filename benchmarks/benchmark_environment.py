@@ -0,0 +1,41 @@
+"""ベンチマークで共通して使用する、Lambda関数を実行するための環境変数とパス"""
+import json
+import os
+from pathlib import Path
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+LAYER_DIR = REPOSITORY_DIR / "lambda" / "layers" / "common" / "python"
+FUNCTIONS = ("redirect_request", "admin_portal")
+BENCHMARK_DOMAIN = "link.example.com"
+
+# 計測用の環境変数 (テーブル名などはダミーでよい。初期化時の接続の事前確立は行わない)
+BENCHMARK_ENVIRONMENT = {
+    "AWS_REGION": "ap-northeast-1",
+    "AWS_DEFAULT_REGION": "ap-northeast-1",
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "ENV_VAR": json.dumps({"DDB_PREWARM_CONNECTION": False}),
+    "DELIBIRD_ENV": "benchmark",
+    "ALLOWED_DOMAIN": BENCHMARK_DOMAIN,
+    "LINK_PREFIX": f"https://{BENCHMARK_DOMAIN}/",
+    "LINK_TABLE_NAME": "benchmark-link",
+    "LINK_TAG_TABLE_NAME": "benchmark-link-tag",
+    "NONCE_TABLE_NAME": "benchmark-nonce",
+    "DOMAIN_META_TABLE_NAME": "benchmark-domain-meta",
+    "LINK_COUNTER_TABLE_NAME": "benchmark-link-counter",
+    "CLICK_EVENT_TABLE_NAME": "benchmark-click-event",
+    "CLICK_ROLLUP_TABLE_NAME": "benchmark-click-rollup",
+    "NONCE_LIFETIME_SECONDS": "300",
+    "MAX_QUERY_KEY_LENGTH": "64",
+    "MAX_QUERY_VALUE_LENGTH": "512",
+    "MAX_TOTAL_QUERY_PARAMS": "32",
+    "STATIC_RESOURCE_DIR": str(REPOSITORY_DIR / "static"),
+}
+
+
+def function_environment(function: str) -> dict[str, str]:
+    """関数を子プロセスで実行するための環境変数を返す"""
+    function_dir = REPOSITORY_DIR / "lambda" / function
+    return {**os.environ, **BENCHMARK_ENVIRONMENT,
+            "FUNCTION_RESOURCE_DIR": str(function_dir),
+            "PYTHONPATH": os.pathsep.join([str(LAYER_DIR), str(function_dir)])}
@@ -0,0 +1,132 @@
+"""
+Lambda関数のコールドスタート(モジュールの読み込み〜初回呼び出し)を計測するベンチマーク。
+
+関数ごとに新しいPythonプロセスを起動し、`python -X importtime` の結果と、DynamoDBへアクセスしない経路
+(redirect_request: "/"へのアクセス -> 404, admin_portal: 許可されていないメソッド -> 405) の初回呼び出し時間を計測する。
+--baselineに以前の --output の結果を指定すると、中央値が閾値を超えて悪化した場合に終了コード1を返す。
+
+Usage:
+    python benchmarks/cold_start.py [--function redirect_request] [--runs 10] [--top 15] \\
+        [--output result.json] [--baseline baseline.json] [--threshold 20]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmark_environment import BENCHMARK_DOMAIN, FUNCTIONS, function_environment
+
+_EVENTS = {
+    "redirect_request": {"httpMethod": "GET", "headers": {"Host": BENCHMARK_DOMAIN}, "pathParameters": None},
+    "admin_portal": {"httpMethod": "DELETE", "headers": {"Host": BENCHMARK_DOMAIN}, "pathParameters": None},
+}
+
+# 子プロセスで実行するスクリプト。import時間は-X importtimeで、初回呼び出し時間はperf_counterで計測する
+_BOOTSTRAP = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.lambda_handler(json.loads(sys.argv[1]), None)
+invoked = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_invoke_ms": (invoked - imported) * 1000,
+                  "status_code": response["statusCode"]}))
+"""
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure cold start time of the Lambda functions.")
+    parser.add_argument("--function", choices=FUNCTIONS, action="append", help="Function to measure (default: all).")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to report.")
+    parser.add_argument("--output", default=None, help="Write the result as JSON.")
+    parser.add_argument("--baseline", default=None, help="Compare with a previous JSON result.")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed regression against the baseline (%%).")
+    return parser.parse_args()
+
+
+def _parse_importtime(stderr: str) -> dict[str, int]:
+    """`-X importtime` の出力から、モジュールごとの累積時間(us)を返す"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            cumulative[module.strip()] = int(cumulative_us)
+        except ValueError:
+            continue  # ヘッダー行
+    return cumulative
+
+
+def _run_once(function: str) -> tuple[dict, dict[str, int]]:
+    environment = function_environment(function)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", _BOOTSTRAP, json.dumps(_EVENTS[function])],
+                               env=environment, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), _parse_importtime(completed.stderr)
+
+
+def _measure(function: str, runs: int, top: int) -> dict:
+    # 1回目はバイトコードの生成を含むため、計測から除外する
+    _run_once(function)
+
+    import_ms, first_invoke_ms, imports = [], [], {}
+    status_code = None
+    for _ in range(runs):
+        result, cumulative = _run_once(function)
+        import_ms.append(result["import_ms"])
+        first_invoke_ms.append(result["first_invoke_ms"])
+        status_code = result["status_code"]
+        for module, us in cumulative.items():
+            imports.setdefault(module, []).append(us)
+
+    slowest = sorted(((module, statistics.median(us) / 1000) for module, us in imports.items()),
+                     key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "runs": runs,
+        "status_code": status_code,
+        "import_ms": statistics.median(import_ms),
+        "first_invoke_ms": statistics.median(first_invoke_ms),
+        "total_ms": statistics.median(i + f for i, f in zip(import_ms, first_invoke_ms)),
+        "slowest_imports_ms": {module: round(ms, 2) for module, ms in slowest},
+    }
+
+
+def _compare(results: dict, baseline: dict, threshold: float) -> bool:
+    ok = True
+    for function, result in results.items():
+        if function not in baseline:
+            continue
+        for key in ("import_ms", "first_invoke_ms", "total_ms"):
+            before, after = baseline[function][key], result[key]
+            change = (after - before) / before * 100 if before else 0.0
+            regressed = change > threshold
+            ok = ok and not regressed
+            print(f"{function} {key}: {before:.1f}ms -> {after:.1f}ms ({change:+.1f}%){' REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main() -> int:
+    args = _parse_args()
+    results = {}
+    for function in args.function or FUNCTIONS:
+        result = _measure(function, args.runs, args.top)
+        results[function] = result
+        print(f"[{function}] import: {result['import_ms']:.1f}ms, first invoke: {result['first_invoke_ms']:.1f}ms, "
+              f"total: {result['total_ms']:.1f}ms (median of {result['runs']}, status: {result['status_code']})")
+        for module, ms in result["slowest_imports_ms"].items():
+            print(f"  {ms:8.2f}ms  {module}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not _compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+lambda_handlerの負荷ベンチマーク。DynamoDBの代わりにmoto(プロセス内)またはDynamoDB Local(--endpoint-url)を使用する。
+
+シナリオごとにAPI Gatewayのイベントを生成して連続で呼び出し、レイテンシ(p50/p95/p99)・スループット・
+リクエストあたりのDynamoDB呼び出し回数・ピークメモリを計測する。関数ごとに別のプロセスで実行する。
+--baselineに以前の --output の結果を指定すると、p95が閾値を超えて悪化した場合に終了コード1を返す。
+
+Usage:
+    pip install "moto[dynamodb]"  # DynamoDB Localを使用する場合は不要
+    python benchmarks/load.py [--scenario hot_slugs] [--requests 2000] [--admin-links 10000] \\
+        [--endpoint-url http://localhost:8000] [--output result.json] [--baseline baseline.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmark_environment import FUNCTIONS, function_environment
+
+# 関数ごとのシナリオ
+SCENARIOS = {
+    "redirect_request": ("hot_slugs", "not_found", "protected_challenge", "query_passthrough", "mixed"),
+    "admin_portal": ("admin_list", "admin_links_api", "admin_links_filter"),
+}
+_WORKER = Path(__file__).resolve().parent / "load_worker.py"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load benchmark of lambda_handler against a local DynamoDB stand-in.")
+    parser.add_argument("--scenario", action="append", choices=[s for v in SCENARIOS.values() for s in v],
+                        help="Scenario to run (default: all).")
+    parser.add_argument("--requests", type=int, default=2000, help="Invocations per redirect scenario.")
+    parser.add_argument("--admin-requests", type=int, default=20, help="Invocations per admin scenario.")
+    parser.add_argument("--warmup", type=int, default=50, help="Invocations before measuring (excluded from the result).")
+    parser.add_argument("--admin-links", type=int, default=10000, help="Links in the domain of the admin list page.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoint-url", default=None, help="Use DynamoDB Local instead of moto.")
+    parser.add_argument("--verbose", action="store_true", help="Show the application logs.")
+    parser.add_argument("--output", default=None, help="Write the result as JSON.")
+    parser.add_argument("--baseline", default=None, help="Compare with a previous JSON result.")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed p95 regression against the baseline (%%).")
+    return parser.parse_args()
+
+
+def _run_worker(function: str, scenarios: list[str], args: argparse.Namespace) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        command = [sys.executable, str(_WORKER), function, result_file.name,
+                   "--requests", str(args.requests if function == "redirect_request" else args.admin_requests),
+                   "--warmup", str(args.warmup), "--admin-links", str(args.admin_links), "--seed", str(args.seed)]
+        for scenario in scenarios:
+            command += ["--scenario", scenario]
+        if args.endpoint_url:
+            command += ["--endpoint-url", args.endpoint_url]
+        # アプリケーションのログは標準出力へ出力されるため、計測中は破棄する
+        subprocess.run(command, env=function_environment(function), check=True,
+                       stdout=None if args.verbose else subprocess.DEVNULL)
+        return json.loads(Path(result_file.name).read_text(encoding="utf-8"))
+
+
+def _print_result(scenario: str, result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"[{scenario}] {result['invocations']} invocations, {result['invocations_per_second']:.1f} inv/s, "
+          f"p50: {latency['p50']:.2f}ms, p95: {latency['p95']:.2f}ms, p99: {latency['p99']:.2f}ms, "
+          f"ddb calls/req: {result['ddb_calls_per_request']:.2f}, peak memory: {result['peak_traced_memory_kib']:.0f}KiB, "
+          f"status: {result['status_codes']}")
+
+
+def _compare(results: dict, baseline: dict, threshold: float) -> bool:
+    ok = True
+    for scenario, result in results.items():
+        if scenario not in baseline:
+            continue
+        before, after = baseline[scenario]["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(f"{scenario} p95: {before:.2f}ms -> {after:.2f}ms ({change:+.1f}%){' REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main() -> int:
+    args = _parse_args()
+    results = {}
+    for function in FUNCTIONS:
+        scenarios = [s for s in SCENARIOS[function] if (not args.scenario) or (s in args.scenario)]
+        if not scenarios:
+            continue
+        for scenario, result in _run_worker(function, scenarios, args).items():
+            results[scenario] = result
+            _print_result(scenario, result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not _compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
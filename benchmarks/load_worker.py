@@ -0,0 +1,348 @@
+"""
+benchmarks/load.pyから関数ごとに起動されるワーカー。
+テーブルの作成・テストデータの投入を行ってからlambda_handlerを読み込み、シナリオごとの計測結果をJSONファイルへ書き込む。
+load.pyが設定する環境変数(benchmark_environment.function_environment)で実行すること。
+"""
+import argparse
+import collections
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import sys
+import time
+import threading
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmark_environment import BENCHMARK_DOMAIN
+
+_HOT_LINKS = 100
+_QUERY_LINKS = 10
+_PROTECTED_LINKS = 5
+_PASSPHRASE = "benchmark-passphrase"
+# メモリ計測(tracemalloc)は処理が遅くなるため、レイテンシの計測とは別に少数の呼び出しで行う
+_MEMORY_TRACE_INVOCATIONS = 200
+_NONCE_PATTERN = re.compile(r"const nonce = '([^']+)'")
+# 一覧ページのスクリプト(lambda/admin_portal/static/links.js)が読み込むフィールド
+_ADMIN_LIST_FIELDS = "origin,status,disabled,uses,max_uses,memo,tag,expiration_date,expired_origin,protected,query_omit,query_whitelist,inactive_reason"
+
+_MODEL_MODULES = {
+    "redirect_request": ("ddb.models.delibird_link", "ddb.models.delibird_domain_meta", "ddb.models.delibird_link_counter",
+                         "models.delibird_nonce", "ddb.models.delibird_click_event", "ddb.models.delibird_click_rollup"),
+    "admin_portal": ("ddb.models.delibird_link", "ddb.models.delibird_domain_meta", "ddb.models.delibird_link_counter",
+                     "ddb.models.delibird_link_tag", "ddb.models.delibird_click_rollup"),
+}
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("function")
+    parser.add_argument("result_file")
+    parser.add_argument("--scenario", action="append", required=True)
+    parser.add_argument("--requests", type=int, required=True)
+    parser.add_argument("--warmup", type=int, required=True)
+    parser.add_argument("--admin-links", type=int, required=True)
+    parser.add_argument("--seed", type=int, required=True)
+    parser.add_argument("--endpoint-url", default=None)
+    return parser.parse_args()
+
+
+def _event(path: str = "", method: str = "GET", query: dict[str, str | list[str]] = None, body: str = None) -> dict[str, Any]:
+    """API Gateway(REST API)のプロキシイベントを生成する"""
+    multi_value = {k: (v if isinstance(v, list) else [v]) for k, v in (query or {}).items()}
+    return {
+        "resource": "/{path+}",
+        "path": f"/{path}",
+        "httpMethod": method,
+        "headers": {"Host": BENCHMARK_DOMAIN, "User-Agent": "delibird-benchmark", "Accept": "text/html"},
+        "multiValueHeaders": {"Host": [BENCHMARK_DOMAIN], "User-Agent": ["delibird-benchmark"], "Accept": ["text/html"]},
+        "pathParameters": {"path": path} if path else None,
+        "queryStringParameters": {k: v[-1] for k, v in multi_value.items()} or None,
+        "multiValueQueryStringParameters": multi_value or None,
+        "requestContext": {"httpMethod": method, "stage": "benchmark"},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+class _DynamoDBCallCounter:
+    """pynamodbのAPI呼び出しを数える (バックグラウンドでの書き込みを含む)"""
+
+    def __init__(self):
+        self.calls: collections.Counter = collections.Counter()
+        from pynamodb.connection.base import Connection
+        original = Connection._make_api_call
+
+        def counting(connection, operation_name, *args, **kwargs):
+            self.calls[operation_name] += 1
+            return original(connection, operation_name, *args, **kwargs)
+
+        Connection._make_api_call = counting
+
+
+class _ExtensionsApiStub:
+    """
+    LambdaのExtensions APIの代わり。util.lifecycle_utilの拡張機能を登録させ、呼び出しごとにINVOKEイベントを配信する。
+    Lambdaと同じく、拡張機能の処理(呼び出し完了後の書き込み)が終わるまで次の呼び出しを行わないために使用する。
+    """
+
+    def __init__(self):
+        self._invocations = threading.Semaphore(0)
+        self._idle = threading.Event()
+        self._registered = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args) -> None:
+                pass
+
+            def _reply(self, body: bytes, headers: dict[str, str] = None) -> None:
+                self.send_response(200)
+                for key, value in {"Content-Length": str(len(body)), **(headers or {})}.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub._registered = True
+                self._reply(b"{}", {"Lambda-Extension-Identifier": "benchmark"})
+
+            def do_GET(self) -> None:
+                stub._idle.set()
+                stub._invocations.acquire()
+                self._reply(json.dumps({"eventType": "INVOKE", "deadlineMs": int(time.time() * 1000) + 30000}).encode())
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.address = f"127.0.0.1:{self._server.server_port}"
+
+    def begin_invocation(self) -> None:
+        if not self._registered:
+            # 拡張機能を使用しない関数 (管理画面など)
+            return
+        self._idle.clear()
+        self._invocations.release()
+
+    def wait_idle(self) -> None:
+        if self._registered and not self._idle.wait(timeout=30):
+            raise RuntimeError("The after-invocation extension did not finish in 30 seconds.")
+
+
+def _create_tables(function: str) -> None:
+    from pynamodb.models import Model
+    for module_name in _MODEL_MODULES[function]:
+        module = importlib.import_module(module_name)
+        for value in vars(module).values():
+            if isinstance(value, type) and issubclass(value, Model) and (value is not Model) and (value.__module__ == module.__name__):
+                if not value.exists():
+                    value.create_table(billing_mode="PAY_PER_REQUEST", wait=True)
+
+
+def _seed_redirect_links() -> None:
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+    from util.date_util import get_jst_datetime_now
+    now = get_jst_datetime_now()
+    with DelibirdLinkTableModel.batch_write() as batch:
+        for i in range(_HOT_LINKS):
+            batch.save(DelibirdLinkTableModel(domain=BENCHMARK_DOMAIN, slug=f"hot-{i}", created_at=now,
+                                              origin=f"https://example.com/hot/{i}", status=302))
+        for i in range(_QUERY_LINKS):
+            batch.save(DelibirdLinkTableModel(domain=BENCHMARK_DOMAIN, slug=f"query-{i}", created_at=now,
+                                              origin=f"https://example.com/query/{i}?src=link#section", status=302, query_omit=False))
+        for i in range(_PROTECTED_LINKS):
+            batch.save(DelibirdLinkTableModel(domain=BENCHMARK_DOMAIN, slug=f"protected-{i}", created_at=now,
+                                              origin=f"https://example.com/protected/{i}", status=302, passphrase=_PASSPHRASE))
+
+
+def _seed_admin_links(count: int, rng: random.Random) -> None:
+    from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+    from ddb.models.delibird_link_tag import DelibirdLinkTagTableModel
+    from util.date_util import get_jst_datetime_now
+    now = get_jst_datetime_now()
+    disabled_count = 0
+    with DelibirdLinkTableModel.batch_write() as batch, DelibirdLinkTagTableModel.batch_write() as tag_batch:
+        for i in range(count):
+            disabled = rng.random() < 0.05
+            disabled_count += int(disabled)
+            slug = f"link-{i:05d}"
+            tag = f"tag-{i % 20}"
+            tag_batch.save(DelibirdLinkTagTableModel.of(BENCHMARK_DOMAIN, tag, slug))
+            batch.save(DelibirdLinkTableModel(
+                domain=BENCHMARK_DOMAIN, slug=slug, created_at=now - timedelta(minutes=i),
+                origin=f"https://example.com/articles/{i}?ref=delibird", status=rng.choice((301, 302, 307)),
+                disabled=disabled, disabled_at=(now - timedelta(minutes=i)) if disabled else None,
+                memo=f"benchmark link {i}", tag={tag},
+                expiration_date=(now + timedelta(days=rng.randint(-30, 365))) if rng.random() < 0.3 else None,
+                passphrase=_PASSPHRASE if rng.random() < 0.1 else None,
+                max_uses=rng.randint(1, 1000) if rng.random() < 0.2 else None))
+    # リンク数・タグのインデックスは作成時に書き込まれるため、直接書き込んだリンクの分を設定する
+    DelibirdDomainMetaTableModel(BENCHMARK_DOMAIN, link_count=count, disabled_link_count=disabled_count).save()
+
+
+def _redirect_scenarios(rng: random.Random) -> dict[str, Callable[[Callable], None]]:
+    from protected_util import NONCE_QUERY_KEY, CHALLENGE_QUERY_KEY
+
+    hot_slugs = [f"hot-{i}" for i in range(_HOT_LINKS)]
+    # アクセスが一部のリンクに集中する分布 (Zipf)
+    hot_weights = [1 / (rank + 1) for rank in range(_HOT_LINKS)]
+
+    def hot_slugs_scenario(invoke: Callable) -> None:
+        invoke(_event(rng.choices(hot_slugs, weights=hot_weights)[0]))
+
+    def not_found_scenario(invoke: Callable) -> None:
+        invoke(_event(f"missing-{rng.getrandbits(48):012x}"))
+
+    def protected_challenge_scenario(invoke: Callable) -> None:
+        slug = f"protected-{rng.randrange(_PROTECTED_LINKS)}"
+        response = invoke(_event(slug))
+        if (match := _NONCE_PATTERN.search(response["body"])) is None:
+            raise RuntimeError(f"Nonce not found in the protected page: {response['statusCode']}")
+        nonce = match.group(1)
+        challenge = hashlib.sha256(f"{_PASSPHRASE}#{nonce}".encode()).hexdigest()
+        invoke(_event(slug, query={NONCE_QUERY_KEY: nonce, CHALLENGE_QUERY_KEY: challenge}))
+
+    def query_passthrough_scenario(invoke: Callable) -> None:
+        invoke(_event(f"query-{rng.randrange(_QUERY_LINKS)}", query={
+            "utm_source": "newsletter", "utm_medium": "email", "utm_campaign": f"campaign-{rng.randrange(100)}",
+            "id": [str(rng.randrange(10000)) for _ in range(rng.randint(1, 3))]}))
+
+    def mixed_scenario(invoke: Callable) -> None:
+        rng.choices((hot_slugs_scenario, not_found_scenario, query_passthrough_scenario, protected_challenge_scenario),
+                    weights=(80, 10, 7, 3))[0](invoke)
+
+    return {
+        "hot_slugs": hot_slugs_scenario,
+        "not_found": not_found_scenario,
+        "protected_challenge": protected_challenge_scenario,
+        "query_passthrough": query_passthrough_scenario,
+        "mixed": mixed_scenario,
+    }
+
+
+def _admin_scenarios(rng: random.Random) -> dict[str, Callable[[Callable], None]]:
+    def admin_list_scenario(invoke: Callable) -> None:
+        invoke(_event(method="GET"))
+
+    def admin_links_api_scenario(invoke: Callable) -> None:
+        # 一覧ページのスクリプトと同じフィールドで、最初のページと続きのページを読み込む
+        response = invoke(_event("links", query={"fields": _ADMIN_LIST_FIELDS}))
+        if (cursor := json.loads(response["body"]).get("next_cursor")) is not None:
+            invoke(_event("links", query={"fields": _ADMIN_LIST_FIELDS, "cursor": cursor}))
+
+    def admin_links_filter_scenario(invoke: Callable) -> None:
+        # タグ・有効期限(1週間以内)・無効化のそれぞれで絞り込んだ最初のページを読み込む
+        now = datetime.now(timezone.utc)
+        invoke(_event("links", query={"fields": _ADMIN_LIST_FIELDS, "tag": f"tag-{rng.randrange(20)}"}))
+        invoke(_event("links", query={"fields": _ADMIN_LIST_FIELDS, "expires_after": now.isoformat(),
+                                      "expires_before": (now + timedelta(days=7)).isoformat()}))
+        invoke(_event("links", query={"fields": _ADMIN_LIST_FIELDS, "disabled": "true"}))
+
+    return {"admin_list": admin_list_scenario, "admin_links_api": admin_links_api_scenario,
+            "admin_links_filter": admin_links_filter_scenario}
+
+
+def _run_scenario(handler: Callable, scenario: Callable[[Callable], None], requests: int, warmup: int,
+                  counter: _DynamoDBCallCounter, extensions_api: _ExtensionsApiStub) -> dict[str, Any]:
+    latencies_ns: list[int] = []
+    status_codes: collections.Counter = collections.Counter()
+    invocations = 0
+
+    def invoke(event: dict[str, Any]) -> dict[str, Any]:
+        nonlocal invocations
+        extensions_api.begin_invocation()
+        started = time.perf_counter_ns()
+        response = handler(event, None)
+        latencies_ns.append(time.perf_counter_ns() - started)
+        status_codes[response["statusCode"]] += 1
+        invocations += 1
+        # レスポンスの返却後に行われる書き込み(使用回数・クリックイベント)はレイテンシに含めず、完了を待ってから次の呼び出しを行う
+        extensions_api.wait_idle()
+        return response
+
+    # ウォームアップ (コンテナ内キャッシュの充填など)
+    while invocations < warmup:
+        scenario(invoke)
+    latencies_ns.clear()
+    status_codes.clear()
+    counter.calls.clear()
+    invocations = 0
+
+    started = time.perf_counter()
+    while invocations < requests:
+        scenario(invoke)
+    elapsed = time.perf_counter() - started
+    # 呼び出し完了後の書き込み(使用回数・クリックイベント)も、リクエストによるDynamoDB呼び出しとして数える
+    ddb_calls = dict(counter.calls)
+    measured_status_codes = dict(status_codes)
+
+    # ピークメモリ (計測区間で新たに確保されたメモリの最大値)
+    invocations = 0
+    tracemalloc.start()
+    while invocations < min(requests, _MEMORY_TRACE_INVOCATIONS):
+        scenario(invoke)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = [ns / 1e6 for ns in latencies_ns[:requests]]
+    percentiles = statistics.quantiles(latencies_ms, n=100, method="inclusive") if len(latencies_ms) > 1 else latencies_ms * 99
+    measured = len(latencies_ms)
+    return {
+        "invocations": measured,
+        "elapsed_seconds": round(elapsed, 3),
+        "invocations_per_second": round(measured / elapsed, 2),
+        "latency_ms": {"p50": round(percentiles[49], 3), "p95": round(percentiles[94], 3), "p99": round(percentiles[98], 3),
+                       "mean": round(statistics.fmean(latencies_ms), 3), "max": round(max(latencies_ms), 3)},
+        "ddb_calls_per_request": round(sum(ddb_calls.values()) / measured, 3),
+        "ddb_calls": ddb_calls,
+        "status_codes": {str(k): v for k, v in sorted(measured_status_codes.items())},
+        "peak_traced_memory_kib": round(peak / 1024, 1),
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main() -> int:
+    args = _parse_args()
+    rng = random.Random(args.seed)
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+        stand_in = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        stand_in = mock_aws()
+
+    with stand_in:
+        _create_tables(args.function)
+        if args.function == "redirect_request":
+            _seed_redirect_links()
+        else:
+            _seed_admin_links(args.admin_links, rng)
+
+        # 拡張機能の登録は関数の読み込み時に行われる
+        extensions_api = _ExtensionsApiStub()
+        os.environ["AWS_LAMBDA_RUNTIME_API"] = extensions_api.address
+        import app
+        counter = _DynamoDBCallCounter()
+        scenarios = _redirect_scenarios(rng) if args.function == "redirect_request" else _admin_scenarios(rng)
+
+        results = {}
+        for name in args.scenario:
+            results[name] = _run_scenario(app.lambda_handler, scenarios[name], args.requests, args.warmup, counter, extensions_api)
+
+    Path(args.result_file).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+リダイレクト先URLの構築について、リクエストごとにパースする方式(parse_origin + queried_origin)と、
+リンクごとに構築したリダイレクト計画(redirect_plan.RedirectPlan)を比較するマイクロベンチマーク。
+計測前に、両者が同じURLを返すことを確認する。
+
+Usage:
+    python benchmarks/redirect_plan_micro.py [--number 20000] [--repeat 5] [--output result.json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from http import HTTPStatus
+from pathlib import Path
+
+_REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+
+# (説明, リダイレクト先URL, リクエストのクエリパラメータ, ホワイトリスト, ブラックリスト)
+_CASES = [
+    ("no query", "https://example.com/landing", {}, set(), set()),
+    ("passthrough", "https://example.com/landing?ref=link#top",
+     {"utm_source": ["x"], "utm_medium": ["social"], "utm_campaign": ["spring sale"]}, set(), set()),
+    ("whitelist", "https://example.com/a/b;p?lang=ja&debug=1",
+     {"utm_source": ["x"], "debug": ["1"], "id": ["1", "2"]}, {"lang", "utm_source", "id"}, set()),
+    ("protected", "https://example.com/secret",
+     {"n": ["nonce"], "c": ["challenge"], "ref": ["mail"]}, set(), {"n", "c"}),
+]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare redirect plans with per-request origin parsing.")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per measurement.")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per case (the fastest is reported).")
+    parser.add_argument("--output", default=None, help="Write the result as JSON.")
+    return parser.parse_args()
+
+
+def _setup() -> None:
+    os.environ.setdefault("AWS_REGION", "ap-northeast-1")
+    os.environ.setdefault("ENV_VAR", "{}")
+    os.environ.setdefault("ALLOWED_DOMAIN", "link.example.com")
+    os.environ.setdefault("LINK_TABLE_NAME", "benchmark-link")
+    os.environ.setdefault("LINK_COUNTER_TABLE_NAME", "benchmark-link-counter")
+    os.environ.setdefault("MAX_QUERY_KEY_LENGTH", "64")
+    os.environ.setdefault("MAX_QUERY_VALUE_LENGTH", "512")
+    os.environ.setdefault("MAX_TOTAL_QUERY_PARAMS", "32")
+    sys.path[:0] = [str(_REPOSITORY_DIR / "lambda" / "layers" / "common" / "python"), str(_REPOSITORY_DIR / "lambda" / "redirect_request")]
+
+
+def main() -> int:
+    args = _parse_args()
+    _setup()
+
+    from query import queried_origin
+    from redirect_plan import RedirectPlan
+    from util.parse_util import parse_origin
+
+    results = {}
+    for name, origin, query_data, whitelist, blacklist in _CASES:
+        plan = RedirectPlan(origin, HTTPStatus.FOUND, query_omit=False, query_whitelist=whitelist, query_blacklist=blacklist)
+
+        def per_request() -> str:
+            return queried_origin(parse_origin(origin), query_data, whitelist, blacklist)
+
+        def planned() -> str:
+            return plan.build_url(query_data)
+
+        if per_request() != planned():
+            print(f"[{name}] result mismatch: {per_request()} != {planned()}", file=sys.stderr)
+            return 1
+
+        per_request_us = min(timeit.repeat(per_request, number=args.number, repeat=args.repeat)) / args.number * 1e6
+        planned_us = min(timeit.repeat(planned, number=args.number, repeat=args.repeat)) / args.number * 1e6
+        results[name] = {"per_request_us": round(per_request_us, 3), "plan_us": round(planned_us, 3),
+                         "speedup": round(per_request_us / planned_us, 2)}
+        print(f"[{name}] per request: {per_request_us:.2f}us, plan: {planned_us:.2f}us "
+              f"(x{per_request_us / planned_us:.1f}) -> {planned()}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+スタンドアロンサーバー(server/standalone_server.py)のリダイレクトをHTTPで計測する負荷ベンチマーク。
+
+DynamoDBの代わりにmoto(サーバーのプロセス内)またはDynamoDB Local(--endpoint-url)を使用し、
+benchmarks/load.pyと同じリンクを投入してからサーバーを起動する。--concurrencyの数のクライアントプロセスが
+キープアライブの接続でリクエストを連続で送信し、レイテンシ(p50/p95/p99)・スループット・ステータスコードを計測する。
+(motoを使用する場合、各ワーカーはfork時点のテーブルの複製を使用する)
+--baselineに以前の --output の結果を指定すると、p95が閾値を超えて悪化した場合に終了コード1を返す。
+
+Usage:
+    pip install "moto[dynamodb]"  # DynamoDB Localを使用する場合は不要
+    python benchmarks/server_load.py [--scenario hot_slugs] [--workers 4] [--concurrency 8] [--requests 20000] \\
+        [--endpoint-url http://localhost:8000] [--output result.json] [--baseline baseline.json]
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmark_environment import BENCHMARK_DOMAIN, REPOSITORY_DIR, function_environment
+
+SCENARIOS = ("hot_slugs", "not_found", "mixed")
+# load_worker._seed_redirect_linksが投入するリンク
+_HOT_LINKS = 100
+_SERVER_DIR = REPOSITORY_DIR / "server"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP load benchmark of the standalone server.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (default: all).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Server worker processes.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client processes (one keep-alive connection each).")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests per client before measuring.")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoint-url", default=None, help="Use DynamoDB Local instead of moto.")
+    parser.add_argument("--verbose", action="store_true", help="Show the application logs.")
+    parser.add_argument("--output", default=None, help="Write the result as JSON.")
+    parser.add_argument("--baseline", default=None, help="Compare with a previous JSON result.")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed p95 regression against the baseline (%%).")
+    # 内部用: テーブルを作成してからサーバーを起動する
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def _serve(args: argparse.Namespace) -> int:
+    """DynamoDBの代わりを用意してリンクを投入し、サーバーのマスタープロセスとして動作する"""
+    from load_worker import _create_tables, _seed_redirect_links
+
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.endpoint_url
+        stand_in = contextlib.nullcontext()
+    else:
+        from moto import mock_aws
+        stand_in = mock_aws()
+    with stand_in:
+        _create_tables("redirect_request")
+        _seed_redirect_links()
+        sys.path.insert(0, str(_SERVER_DIR))
+        import standalone_server
+
+        sys.argv = [sys.argv[0], "--function", "redirect_request", "--host", "127.0.0.1", "--port", str(args.port),
+                    "--workers", str(args.workers), "--keep-alive-timeout", "5"]
+        return standalone_server.main()
+
+
+def _paths(scenario: str, rng: random.Random, count: int) -> list[str]:
+    hot_slugs = [f"hot-{i}" for i in range(_HOT_LINKS)]
+    # アクセスが一部のリンクに集中する分布 (Zipf)
+    hot_weights = [1 / (rank + 1) for rank in range(_HOT_LINKS)]
+    paths = []
+    for _ in range(count):
+        if (scenario == "not_found") or ((scenario == "mixed") and (rng.random() < 0.1)):
+            paths.append(f"/missing-{rng.randrange(1000)}")
+        else:
+            paths.append("/" + rng.choices(hot_slugs, hot_weights)[0])
+    return paths
+
+
+def _client(port: int, paths: list[str], warmup: int) -> tuple[list[int], dict[int, int]]:
+    """1つのキープアライブの接続でリクエストを送信し、計測区間のレイテンシ(ナノ秒)とステータスコードを返す"""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies_ns: list[int] = []
+    status_codes: Counter = Counter()
+    for i, path in enumerate(paths):
+        started = time.perf_counter_ns()
+        connection.request("GET", path, headers={"Host": BENCHMARK_DOMAIN})
+        response = connection.getresponse()
+        response.read()
+        if i >= warmup:
+            latencies_ns.append(time.perf_counter_ns() - started)
+            status_codes[response.status] += 1
+        if response.will_close:
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.close()
+    return latencies_ns, dict(status_codes)
+
+
+def _run_scenario(scenario: str, args: argparse.Namespace, rng: random.Random) -> dict:
+    per_client = max(1, args.requests // args.concurrency)
+    jobs = [(args.port, _paths(scenario, rng, per_client + args.warmup), args.warmup) for _ in range(args.concurrency)]
+    with multiprocessing.Pool(args.concurrency) as pool:
+        started = time.perf_counter()
+        results = pool.starmap(_client, jobs)
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(ns / 1e6 for latencies, _ in results for ns in latencies)
+    status_codes: Counter = Counter()
+    for _, codes in results:
+        status_codes.update(codes)
+    percentiles = statistics.quantiles(latencies_ms, n=100, method="inclusive") if len(latencies_ms) > 1 else latencies_ms * 99
+    # ウォームアップを含む全リクエストの経過時間のため、スループットは計測区間の件数から概算する
+    requests = len(latencies_ms)
+    return {
+        "requests": requests,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 2),
+        "latency_ms": {"p50": round(percentiles[49], 3), "p95": round(percentiles[94], 3), "p99": round(percentiles[98], 3),
+                       "mean": round(statistics.fmean(latencies_ms), 3), "max": round(latencies_ms[-1], 3)},
+        "status_codes": {str(k): v for k, v in sorted(status_codes.items())},
+    }
+
+
+def _wait_ready(port: int, server: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with {server.returncode}.")
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=1):
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"The server did not start in {timeout} seconds.")
+
+
+def _compare(results: dict, baseline: dict, threshold: float) -> bool:
+    ok = True
+    for scenario, result in results.items():
+        if scenario not in baseline:
+            continue
+        before, after = baseline[scenario]["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(f"{scenario} p95: {before:.2f}ms -> {after:.2f}ms ({change:+.1f}%){' REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.serve:
+        return _serve(args)
+
+    command = [sys.executable, __file__, "--serve", "--workers", str(args.workers), "--port", str(args.port)]
+    if args.endpoint_url:
+        command += ["--endpoint-url", args.endpoint_url]
+    environment = function_environment("redirect_request")
+    environment["PYTHONPATH"] = os.pathsep.join([environment["PYTHONPATH"], str(Path(__file__).resolve().parent)])
+    # 書き込み(使用回数・クリックイベント)はレスポンスの返却後にワーカー内で行われるため、計測には含まれない
+    server = subprocess.Popen(command, env=environment, stdout=None if args.verbose else subprocess.DEVNULL)
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        _wait_ready(args.port, server)
+        for scenario in (args.scenario or SCENARIOS):
+            result = _run_scenario(scenario, args, rng)
+            results[scenario] = result
+            latency = result["latency_ms"]
+            print(f"[{scenario}] {result['requests']} requests, {result['requests_per_second']:.1f} req/s, "
+                  f"p50: {latency['p50']:.2f}ms, p95: {latency['p95']:.2f}ms, p99: {latency['p99']:.2f}ms, "
+                  f"status: {result['status_codes']}")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not _compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,11 +14,36 @@ module "aws_iam" {
     arn  = module.aws_dynamodb.link_table.arn
   }
 
+  ddb_link_tag_table = {
+    name = module.aws_dynamodb.link_tag_table.name
+    arn  = module.aws_dynamodb.link_tag_table.arn
+  }
+
   ddb_link_nonce_table = {
     name = module.aws_dynamodb.link_nonce_table.name
     arn  = module.aws_dynamodb.link_nonce_table.arn
   }
 
+  ddb_domain_meta_table = {
+    name = module.aws_dynamodb.domain_meta_table.name
+    arn  = module.aws_dynamodb.domain_meta_table.arn
+  }
+
+  ddb_link_counter_table = {
+    name = module.aws_dynamodb.link_counter_table.name
+    arn  = module.aws_dynamodb.link_counter_table.arn
+  }
+
+  ddb_click_event_table = {
+    name = module.aws_dynamodb.click_event_table.name
+    arn  = module.aws_dynamodb.click_event_table.arn
+  }
+
+  ddb_click_rollup_table = {
+    name = module.aws_dynamodb.click_rollup_table.name
+    arn  = module.aws_dynamodb.click_rollup_table.arn
+  }
+
   lambda_redirect_request = {
     name = module.aws_lambda.lambda_redirect_request.function_name
     arn  = module.aws_lambda.lambda_redirect_request.arn
@@ -45,11 +70,36 @@ module "aws_lambda" {
     arn  = module.aws_dynamodb.link_table.arn
   }
 
+  ddb_link_tag_table = {
+    name = module.aws_dynamodb.link_tag_table.name
+    arn  = module.aws_dynamodb.link_tag_table.arn
+  }
+
   ddb_link_nonce_table = {
     name = module.aws_dynamodb.link_nonce_table.name
     arn  = module.aws_dynamodb.link_nonce_table.arn
   }
 
+  ddb_domain_meta_table = {
+    name = module.aws_dynamodb.domain_meta_table.name
+    arn  = module.aws_dynamodb.domain_meta_table.arn
+  }
+
+  ddb_link_counter_table = {
+    name = module.aws_dynamodb.link_counter_table.name
+    arn  = module.aws_dynamodb.link_counter_table.arn
+  }
+
+  ddb_click_event_table = {
+    name = module.aws_dynamodb.click_event_table.name
+    arn  = module.aws_dynamodb.click_event_table.arn
+  }
+
+  ddb_click_rollup_table = {
+    name = module.aws_dynamodb.click_rollup_table.name
+    arn  = module.aws_dynamodb.click_rollup_table.arn
+  }
+
   role_redirect_request = {
     name = module.aws_iam.role_lambda_redirect_request.name
     arn  = module.aws_iam.role_lambda_redirect_request.arn
@@ -60,6 +110,11 @@ module "aws_lambda" {
     arn  = module.aws_iam.role_lambda_admin_portal.arn
   }
 
+  role_link_sweeper = {
+    name = module.aws_iam.role_lambda_link_sweeper.name
+    arn  = module.aws_iam.role_lambda_link_sweeper.arn
+  }
+
   link_prefix                           = "" # TODO: Change value as needed (e.g. https://example.com/dev/.... -> "dev")
   allowed_domain                        = local.config["allowed_domain"]
   protected_link_request_nonce_lifetime = 300 # TODO: Change value as needed
@@ -1,21 +1,46 @@
 from http import HTTPStatus
+from typing import TYPE_CHECKING
 
-from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
-from aws_lambda_powertools.utilities.typing import LambdaContext
-
+from ddb.connection import prewarm_connections, probe_connections
+from ddb.models.delibird_link import DelibirdLinkTableModel
+from portal_page.link_api import PortalLinkApiPage
+from portal_page.link_bulk import PortalLinkBulkPage, LINK_BULK_PATH
 from portal_page.link_create import PortalLinkCreatePage
-from portal_page.link_list import PortalListPage
+from portal_page.link_list import PortalListPage, PortalListScriptPage, LINK_LIST_SCRIPT_PATH
+from portal_page.link_patch import PortalLinkPatchPage
+from portal_page.link_stats import PortalLinkStatsPage
 from portal_page.link_update import PortalLinkUpdatePage
-from util.logger_util import setup_logger, setup_dev_logger
+from util.logger_util import setup_logger, setup_dev_logger, buffer_invocation_logs
 from util.parse_util import parse_domain, parse_request_path
+from util.request_util import DelibirdRequest, apigateway_event
 from util.response_util import error_response
 
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
+
 logger = setup_logger("admin_portal")
 setup_dev_logger()
 
+# GETのみを受け付けるサブパスのページ
+_GET_PAGES = {
+    "links": PortalLinkApiPage,
+    "stats": PortalLinkStatsPage,
+    LINK_LIST_SCRIPT_PATH: PortalListScriptPage,
+}
+# POST(作成)・PUT(更新)のみを受け付けるサブパスのページ
+_WRITE_PAGES = {
+    LINK_BULK_PATH: PortalLinkBulkPage,
+}
+
+# リクエスト時のTLSハンドシェイク・認証情報の解決を避けるため、初期化フェーズでリンクテーブルへの接続を確立しておく
+prewarm_connections(DelibirdLinkTableModel)
 
-@event_source(data_class=APIGatewayProxyEvent)
-def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
+
+# 管理画面の操作ログはサンプリングせず、呼び出しごとに1回の書き込みで出力する
+@buffer_invocation_logs(sampling=False)
+@probe_connections(DelibirdLinkTableModel)
+@apigateway_event
+def lambda_handler(event: DelibirdRequest, context: "LambdaContext"):
     try:
         # parse domain
         domain: str = parse_domain(event.headers.get("Host", ""))
@@ -28,6 +53,18 @@ def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
         logger.exception(f"Failed to parse request.")
         return error_response(HTTPStatus.BAD_REQUEST)
 
+    if (page := _GET_PAGES.get(request_path)) is not None:
+        if event.http_method != "GET":
+            logger.info(f"Get Invalid HTTP method request: {event.http_method}, domain: {domain}, path: {request_path}")
+            return error_response(HTTPStatus.METHOD_NOT_ALLOWED, force_json=True)
+        return page.perform(domain, event)
+
+    if (page := _WRITE_PAGES.get(request_path)) is not None:
+        if event.http_method not in ("POST", "PUT"):
+            logger.info(f"Get Invalid HTTP method request: {event.http_method}, domain: {domain}, path: {request_path}")
+            return error_response(HTTPStatus.METHOD_NOT_ALLOWED, force_json=True)
+        return page.perform(domain, event)
+
     if request_path:
         logger.info(f"Get Invalid request path: {request_path}")
         return error_response(HTTPStatus.NOT_FOUND)
@@ -39,6 +76,8 @@ def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
             return PortalLinkCreatePage.perform(domain, event)
         case "PUT":
             return PortalLinkUpdatePage.perform(domain, event)
+        case "PATCH":
+            return PortalLinkPatchPage.perform(domain, event)
         case _:
             logger.info(f"Get Invalid HTTP method request: {event.http_method}, domain: {domain}")
             return error_response(HTTPStatus.METHOD_NOT_ALLOWED)
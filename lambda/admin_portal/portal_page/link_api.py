@@ -0,0 +1,299 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Callable, Iterator, Optional
+
+from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLinkInactiveStatus, get_inactive_reason
+from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel
+from ddb.models.delibird_link_tag import DelibirdLinkTagTableModel
+from portal_page.page import AdminPortalPage
+from util.assert_util import assert_positive
+from util.date_util import as_jst
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+from util.parse_util import parse_query
+from util.request_util import DelibirdRequest
+from util.response_util import error_response, success_response
+from util.signature_util import encode_signed_token, decode_signed_token
+
+logger = setup_logger("admin_portal.link_api")
+_PAGE_SIZE = assert_positive(int(get_env_var("LINK_LIST_PAGE_SIZE", 50)), "LINK_LIST_PAGE_SIZE")
+_MAX_PAGE_SIZE = assert_positive(int(get_env_var("LINK_LIST_MAX_PAGE_SIZE", 200)), "LINK_LIST_MAX_PAGE_SIZE")
+_FIELDS_QUERY_KEY = "fields"
+_SLUG_QUERY_KEY = "slug"
+_CURSOR_QUERY_KEY = "cursor"
+_LIMIT_QUERY_KEY = "limit"
+_TAG_QUERY_KEY = "tag"
+_DISABLED_QUERY_KEY = "disabled"
+_EXPIRES_AFTER_QUERY_KEY = "expires_after"
+_EXPIRES_BEFORE_QUERY_KEY = "expires_before"
+
+_CURSOR_SIGNING_KEY = str(get_env_var("LINK_LIST_CURSOR_SIGNING_KEY", "")).encode("utf-8")
+if not _CURSOR_SIGNING_KEY:
+    # 未設定の場合はコンテナごとの鍵で署名する (他のコンテナで発行されたカーソルは無効になり、最初のページからやり直しになる)
+    logger.warning("LINK_LIST_CURSOR_SIGNING_KEY is not set. Cursors are only valid in this container.")
+    _CURSOR_SIGNING_KEY = os.urandom(32)
+
+_M = DelibirdLinkTableModel
+
+
+@dataclass(frozen=True)
+class _LinkField:
+    # 射影式で読み込む属性
+    attributes: tuple[str, ...]
+    # (リンクのアイテム, 使用回数) -> JSONの値
+    serialize: Callable[[DelibirdLinkTableModel, int], Any]
+    # カウンターテーブルの使用回数が必要か
+    uses: bool = False
+
+
+@dataclass(frozen=True)
+class _LinkFilter:
+    """一覧の絞り込み。いずれの条件も1回のQuery(タグのテーブルまたはGSI)で読み込む (複数の条件は組み合わせられない)"""
+    tag: Optional[str] = None
+    disabled: bool = False
+    expires_after: Optional[datetime] = None
+    expires_before: Optional[datetime] = None
+
+    @property
+    def index(self):
+        """読み込むリンクテーブルのGSI (slugの順に読み込む場合はNone)"""
+        if self.disabled:
+            return _M.disabled_index
+        if (self.expires_after is not None) or (self.expires_before is not None):
+            return _M.expiration_index
+        return None
+
+    def expiration_condition(self):
+        if (self.expires_after is not None) and (self.expires_before is not None):
+            return _M.expiration_date.between(self.expires_after, self.expires_before)
+        if self.expires_after is not None:
+            return _M.expiration_date >= self.expires_after
+        if self.expires_before is not None:
+            return _M.expiration_date <= self.expires_before
+        return None
+
+
+def _iso_jst(value) -> Optional[str]:
+    return as_jst(value).isoformat() if value is not None else None
+
+
+def _inactive_reason(model: DelibirdLinkTableModel, uses: int) -> Optional[str]:
+    max_uses = int(model.max_uses) if model.max_uses is not None else None
+    inactive_status = DelibirdLinkInactiveStatus[model.inactive_status] if model.inactive_status else None
+    reason = get_inactive_reason(bool(model.disabled), model.expiration_date, max_uses, uses, inactive_status)
+    return reason.status.name if reason is not None else None
+
+
+# 取得できるフィールド (slugは常に返す)
+_LINK_FIELDS: dict[str, _LinkField] = {
+    "origin": _LinkField((_M.origin.attr_name,), lambda m, _: m.origin),
+    "status": _LinkField((_M.status.attr_name,), lambda m, _: int(m.status)),
+    "disabled": _LinkField((_M.disabled.attr_name,), lambda m, _: bool(m.disabled)),
+    # PATCHで条件にする版数 (版数のない移行前のリンクは0)
+    "version": _LinkField((_M.version.attr_name,), lambda m, _: int(m.version or 0)),
+    "uses": _LinkField((), lambda m, uses: uses, uses=True),
+    "max_uses": _LinkField((_M.max_uses.attr_name,), lambda m, _: int(m.max_uses) if m.max_uses is not None else None),
+    "memo": _LinkField((_M.memo.attr_name,), lambda m, _: m.memo or ""),
+    "tag": _LinkField((_M.tag.attr_name,), lambda m, _: sorted(m.tag or ())),
+    "created_at": _LinkField((_M.created_at.attr_name,), lambda m, _: _iso_jst(m.created_at)),
+    "expiration_date": _LinkField((_M.expiration_date.attr_name,), lambda m, _: _iso_jst(m.expiration_date)),
+    "expired_origin": _LinkField((_M.expired_origin.attr_name,), lambda m, _: m.expired_origin),
+    "protected": _LinkField((_M.passphrase.attr_name,), lambda m, _: bool(m.passphrase) and (not m.passphrase.isspace())),
+    "passphrase": _LinkField((_M.passphrase.attr_name,), lambda m, _: m.passphrase),
+    "query_omit": _LinkField((_M.query_omit.attr_name,), lambda m, _: bool(m.query_omit)),
+    "query_whitelist": _LinkField((_M.query_whitelist.attr_name,), lambda m, _: sorted(m.query_whitelist or ())),
+    "cacheable": _LinkField((_M.cacheable.attr_name,), lambda m, _: bool(m.cacheable)),
+    # 無効な理由 (DISABLED / EXPIRED / MAX_USES_EXCEEDED)、有効な場合はnull
+    "inactive_reason": _LinkField((_M.disabled.attr_name, _M.expiration_date.attr_name, _M.max_uses.attr_name, _M.inactive_status.attr_name),
+                                  _inactive_reason, uses=True),
+}
+_DEFAULT_FIELDS = ("origin", "status", "disabled", "uses", "max_uses", "expiration_date", "query_omit", "inactive_reason")
+
+
+class PortalLinkApiPage(AdminPortalPage):
+    """
+    リンクを指定されたフィールドのみJSONで返す。slugを指定した場合は1件、指定しない場合はページ単位で返す。
+    一覧はタグ(tag)・無効化(disabled=true)・有効期限の範囲(expires_after / expires_before)のいずれかで絞り込める。
+    """
+
+    @classmethod
+    def _encode_cursor(cls, domain: str, start_slug: str, index_value: Optional[str]) -> str:
+        # ドメインを含めて署名し、他のドメインのカーソルや改ざんされたカーソルを受け付けない
+        payload = {"d": domain, "s": start_slug}
+        if index_value is not None:
+            # GSIから読み込む場合は、インデックスの範囲キーの値も開始位置に必要
+            payload["k"] = index_value
+        return encode_signed_token(payload, _CURSOR_SIGNING_KEY)
+
+    @classmethod
+    def _decode_cursor(cls, domain: str, cursor: str, link_filter: _LinkFilter) -> tuple[str, Optional[str]]:
+        payload = decode_signed_token(cursor, _CURSOR_SIGNING_KEY)
+        if (payload.get("d") != domain) or (not isinstance(start_slug := payload.get("s"), str)):
+            raise ValueError("Invalid cursor payload.")
+        index_value = payload.get("k")
+        if (link_filter.index is not None) != isinstance(index_value, str):
+            raise ValueError("Cursor does not match the filter.")
+        return start_slug, index_value
+
+    @classmethod
+    def _parse_datetime(cls, query: dict[str, list[str]], key: str) -> Optional[datetime]:
+        if (value := parse_query(query, key, allow_notfound=True)) is None:
+            return None
+        # インデックスの有効期限はJSTで保存されているため、JSTに揃えて文字列の順序で比較できるようにする
+        return as_jst(datetime.fromisoformat(value))
+
+    @classmethod
+    def _parse_filter(cls, query: dict[str, list[str]]) -> _LinkFilter:
+        disabled = parse_query(query, _DISABLED_QUERY_KEY, allow_notfound=True)
+        if disabled not in (None, "true"):
+            raise ValueError(f"Invalid disabled filter: {disabled}")
+        link_filter = _LinkFilter(
+            tag=parse_query(query, _TAG_QUERY_KEY, allow_notfound=True),
+            disabled=disabled is not None,
+            expires_after=cls._parse_datetime(query, _EXPIRES_AFTER_QUERY_KEY),
+            expires_before=cls._parse_datetime(query, _EXPIRES_BEFORE_QUERY_KEY),
+        )
+        if link_filter.tag == "":
+            raise ValueError("Tag filter is empty.")
+        if (link_filter.expires_after is not None) and (link_filter.expires_before is not None) \
+                and (link_filter.expires_after > link_filter.expires_before):
+            raise ValueError("expires_after is later than expires_before.")
+        if sum((link_filter.tag is not None, link_filter.disabled, link_filter.expiration_condition() is not None)) > 1:
+            raise ValueError("Only one filter can be used at a time.")
+        return link_filter
+
+    @classmethod
+    def _parse_fields(cls, query: dict[str, list[str]]) -> dict[str, _LinkField]:
+        # fields=origin,status のようにカンマ区切りでも、fieldsを複数指定しても良い
+        values = parse_query(query, _FIELDS_QUERY_KEY, allow_notfound=True, expected_single_value=False) or []
+        names = [name.strip() for value in values for name in value.split(",") if name.strip()] or _DEFAULT_FIELDS
+        if unknown := [name for name in names if (name not in _LINK_FIELDS) and (name != "slug")]:
+            raise ValueError(f"Unknown fields: {unknown}")
+        return {name: _LINK_FIELDS[name] for name in dict.fromkeys(names) if name != "slug"}
+
+    @classmethod
+    def _projection(cls, fields: dict[str, _LinkField], link_filter: _LinkFilter) -> list[str]:
+        attributes = dict.fromkeys([_M.domain.attr_name, _M.slug.attr_name])
+        if link_filter.disabled:
+            # 次のページのカーソルにインデックスの範囲キーが必要
+            attributes[_M.disabled_at.attr_name] = None
+        elif link_filter.index is not None:
+            attributes[_M.expiration_date.attr_name] = None
+        for field in fields.values():
+            attributes.update(dict.fromkeys(field.attributes))
+        if any(field.uses for field in fields.values()):
+            # 移行前のリンクはリンクアイテム自体に使用回数を保持している
+            attributes[_M.uses.attr_name] = None
+        return list(attributes)
+
+    @classmethod
+    def _serialize(cls, model: DelibirdLinkTableModel, fields: dict[str, _LinkField], uses: Optional[int]) -> dict[str, Any]:
+        """usesがNoneの場合は、使用回数が不要なフィールドのみを変換する"""
+        return {name: field.serialize(model, uses) for name, field in fields.items() if (uses is not None) or (not field.uses)}
+
+    @classmethod
+    def _get_link(cls, domain: str, slug: str, fields: dict[str, _LinkField]):
+        try:
+            model = _M.get(domain, slug, attributes_to_get=cls._projection(fields, _LinkFilter()))
+        except _M.DoesNotExist:
+            logger.info(f"Link not found for domain: {domain}, slug: {slug}")
+            return error_response(HTTPStatus.NOT_FOUND, force_json=True)
+
+        uses = None
+        if any(field.uses for field in fields.values()):
+            uses = int(model.uses or 0) + sum(DelibirdLinkCounterTableModel.get_link_uses(domain, slug, consistent_read=False).values())
+        return success_response(HTTPStatus.OK, {"link": {"slug": model.slug, **cls._serialize(model, fields, uses)}})
+
+    @classmethod
+    def _query_links(cls, domain: str, link_filter: _LinkFilter, start: Optional[tuple[str, Optional[str]]], page_size: int,
+                     attributes_to_get: list[str]) -> Iterator[tuple[tuple[str, Optional[str]], Optional[DelibirdLinkTableModel]]]:
+        """
+        ページのリンクを(次のページの開始位置, アイテム)として最大page_size+1件返す。
+        タグのインデックスに対応するリンクがない場合は、アイテムをNoneとして返す。
+        """
+        if (index := link_filter.index) is not None:
+            range_key_condition = None if link_filter.disabled else link_filter.expiration_condition()
+            for model in _M.query_index_page(index, domain, page_size, range_key_condition, start, attributes_to_get):
+                yield model.index_start_key(index), model
+            return
+
+        start_slug = start[0] if start is not None else None
+        if link_filter.tag is None:
+            for model in _M.query_page(domain, page_size, start_slug, attributes_to_get=attributes_to_get):
+                yield (model.slug, None), model
+            return
+
+        # タグのインデックスからslugを読み込み、リンクは1回のBatchGetItemで読み込む
+        slugs = list(DelibirdLinkTagTableModel.query_slugs(domain, link_filter.tag, page_size + 1, start_slug))
+        models = {model.slug: model for model in _M.batch_get([(domain, slug) for slug in slugs], attributes_to_get=attributes_to_get)}
+        for slug in slugs:
+            yield (slug, None), models.get(slug)
+
+    @classmethod
+    def _get_page(cls, domain: str, link_filter: _LinkFilter, start: Optional[tuple[str, Optional[str]]], page_size: int,
+                  fields: dict[str, _LinkField]):
+        uses_fields = {name: field for name, field in fields.items() if field.uses}
+        links: list[dict[str, Any]] = []
+        # 使用回数はページの範囲が確定してからまとめて読み込むため、必要なフィールドの分のみアイテムを保持する
+        pending_uses: list[tuple[dict[str, Any], DelibirdLinkTableModel]] = []
+        read_count = 0
+        last_key: Optional[tuple[str, Optional[str]]] = None
+        next_key: Optional[tuple[str, Optional[str]]] = None
+        # 読み込んだアイテムから順に変換し、リンクのオブジェクトを生成・保持しない
+        for key, model in cls._query_links(domain, link_filter, start, page_size, cls._projection(fields, link_filter)):
+            if read_count == page_size:
+                next_key = last_key
+                break
+            read_count += 1
+            last_key = key
+            if model is None:
+                logger.warning(f"Tagged link is not found for domain: {domain}, slug: {key[0]}, tag: {link_filter.tag}")
+                continue
+            link = {"slug": model.slug, **cls._serialize(model, fields, None)}
+            links.append(link)
+            if uses_fields:
+                pending_uses.append((link, model))
+
+        if pending_uses:
+            sharded_uses = DelibirdLinkCounterTableModel.sum_slugs(domain, [link["slug"] for link, _ in pending_uses])
+            for link, model in pending_uses:
+                uses = int(model.uses or 0) + sharded_uses.get(model.slug, 0)
+                link.update(cls._serialize(model, uses_fields, uses))
+
+        body: dict[str, Any] = {
+            "links": links,
+            "next_cursor": cls._encode_cursor(domain, *next_key) if next_key is not None else None,
+        }
+        if (start is None) and (link_filter == _LinkFilter()):
+            # リンク数は全リンクを読み込まずに、ドメインのメタデータから取得する
+            total_count, disabled_count = DelibirdDomainMetaTableModel.get_link_counts(domain)
+            body["counts"] = {"total": total_count, "enabled": total_count - disabled_count, "disabled": disabled_count}
+        return success_response(HTTPStatus.OK, body)
+
+    @classmethod
+    def perform(cls, domain: str, event: DelibirdRequest):
+        query = event.resolved_query_string_parameters
+        try:
+            fields = cls._parse_fields(query)
+            link_filter = cls._parse_filter(query)
+            slug = parse_query(query, _SLUG_QUERY_KEY, allow_notfound=True)
+            cursor = parse_query(query, _CURSOR_QUERY_KEY, allow_notfound=True)
+            limit = parse_query(query, _LIMIT_QUERY_KEY, allow_notfound=True)
+            page_size = int(limit) if limit is not None else _PAGE_SIZE
+            if not (0 < page_size <= _MAX_PAGE_SIZE):
+                raise ValueError(f"Invalid page size: {page_size}")
+            start = cls._decode_cursor(domain, cursor, link_filter) if cursor else None
+        except ValueError as e:
+            logger.info(f"Get Invalid link api request for domain: {domain}, error: {e}")
+            return error_response(HTTPStatus.BAD_REQUEST, force_json=True)
+
+        try:
+            if slug is not None:
+                return cls._get_link(domain, slug, fields)
+            return cls._get_page(domain, link_filter, start, page_size, fields)
+        except Exception:
+            logger.exception(f"Failed to query delibird link data for domain: {domain}")
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, force_json=True)
@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any, Callable, Optional
+
+from pynamodb.exceptions import TransactWriteError
+
+from ddb.connection import DelibirdTableMeta
+from ddb.link_cache import notify_link_changed
+from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink, MAX_TRANSACTION_ITEMS
+from portal_page.link_data import parse_link_data, new_link_model, link_update_actions
+from portal_page.page import AdminPortalPage
+from util.assert_util import assert_positive
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+from util.request_util import DelibirdRequest
+from util.response_util import error_response, success_response
+
+logger = setup_logger("admin_portal.link_bulk_page")
+_MAX_ROWS = assert_positive(int(get_env_var("LINK_BULK_MAX_ROWS", 5000)), "LINK_BULK_MAX_ROWS")
+LINK_BULK_PATH = "bulk"
+
+_CSV_CONTENT_TYPE = "text/csv"
+# CSVで複数の値を持つ列の区切り文字
+_CSV_LIST_SEPARATOR = ";"
+_CSV_LIST_COLUMNS = ("tag", "query_whitelist")
+_CSV_BOOLEAN_COLUMNS = ("disabled", "query_omit", "cacheable")
+_CSV_BOOLEAN_VALUES = {"true": True, "1": True, "false": False, "0": False}
+# 1回のBatchGetItemで読み込めるキーの上限
+_BATCH_GET_SIZE = 100
+
+
+@dataclass
+class _BulkRow:
+    # 1始まりの行番号 (CSVはヘッダー行を除く)
+    row: int
+    link: Optional[DelibirdLink] = None
+    # 更新前のリンク (更新のみ)
+    model: Optional[DelibirdLinkTableModel] = None
+    # 処理結果 (Noneは未処理)
+    status: Optional[HTTPStatus] = None
+    error: Optional[str] = None
+
+    @property
+    def slug(self) -> Optional[str]:
+        return self.link.link_slug if self.link is not None else None
+
+    def fail(self, status: HTTPStatus, error: str) -> None:
+        self.status = status
+        self.error = error
+
+    def to_result(self) -> dict[str, Any]:
+        result = {"row": self.row, "slug": self.slug, "status": self.status.value}
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+class PortalLinkBulkPage(AdminPortalPage):
+    """
+    NDJSON(1行に1つのリンクのJSON)またはCSVで指定された複数のリンクを、作成(POST)・更新(PUT)する。
+    リンクはトランザクションの項目数の上限までまとめて並列に書き込み、行ごとの結果を返す。
+    """
+
+    @classmethod
+    def _csv_row_to_body(cls, values: dict[Optional[str], Optional[str]]) -> dict[str, Any]:
+        # 空のセルは指定されていないものとして扱う
+        body: dict[str, Any] = {}
+        for key, value in values.items():
+            if (key is None) or (not value):
+                continue
+            key = key.strip()
+            if key in _CSV_LIST_COLUMNS:
+                body[key] = [v.strip() for v in value.split(_CSV_LIST_SEPARATOR) if v.strip()]
+            elif key in _CSV_BOOLEAN_COLUMNS:
+                if (boolean := _CSV_BOOLEAN_VALUES.get(value.strip().lower())) is None:
+                    raise ValueError(f"Invalid boolean value for {key}: {value}")
+                body[key] = boolean
+            else:
+                body[key] = value
+        return body
+
+    @classmethod
+    def _read_rows(cls, content_type: str, body: str) -> list[tuple[int, dict[str, Any] | Exception]]:
+        """リクエストの本文を、行ごとの(行番号, リンクのJSON(辞書)または変換できなかった理由)に分割する"""
+        rows: list[tuple[int, dict[str, Any] | Exception]] = []
+        if content_type.split(";")[0].strip().lower() == _CSV_CONTENT_TYPE:
+            for number, values in enumerate(csv.DictReader(io.StringIO(body)), 1):
+                try:
+                    rows.append((number, cls._csv_row_to_body(values)))
+                except ValueError as e:
+                    rows.append((number, e))
+            return rows
+
+        for number, line in enumerate(body.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+                if not isinstance(value, dict):
+                    raise ValueError("Row is not a JSON object.")
+                rows.append((number, value))
+            except ValueError as e:
+                rows.append((number, e))
+        return rows
+
+    @classmethod
+    def _parse_rows(cls, domain: str, event: DelibirdRequest) -> list[_BulkRow]:
+        rows: list[_BulkRow] = []
+        seen_slugs: set[str] = set()
+        for number, value in cls._read_rows(event.headers.get("Content-Type", ""), event.body or ""):
+            row = _BulkRow(row=number)
+            rows.append(row)
+            if isinstance(value, Exception):
+                row.fail(HTTPStatus.BAD_REQUEST, f"Invalid row: {value}")
+                continue
+            try:
+                row.link = parse_link_data(domain, value)
+            except KeyError as e:
+                row.fail(HTTPStatus.BAD_REQUEST, f"Missing field: {e.args[0]}")
+                continue
+            except Exception as e:
+                row.fail(HTTPStatus.BAD_REQUEST, f"Invalid link: {e}")
+                continue
+            # 1つのトランザクションで同じアイテムを2回書き込めないため、slugの重複は受け付けない
+            if row.slug in seen_slugs:
+                row.fail(HTTPStatus.BAD_REQUEST, "Duplicate slug in the request.")
+                continue
+            seen_slugs.add(row.slug)
+        return rows
+
+    @staticmethod
+    def _chunks(rows: list[_BulkRow], transaction_items: Callable[[_BulkRow], int]) -> list[list[_BulkRow]]:
+        """行をトランザクションの項目数の上限までまとめる"""
+        chunks: list[list[_BulkRow]] = []
+        chunk: list[_BulkRow] = []
+        chunk_items = 0
+        for row in rows:
+            items = transaction_items(row)
+            if items > MAX_TRANSACTION_ITEMS:
+                row.fail(HTTPStatus.BAD_REQUEST, "Too many tag changes in one link.")
+                continue
+            if chunk_items + items > MAX_TRANSACTION_ITEMS:
+                chunks.append(chunk)
+                chunk, chunk_items = [], 0
+            chunk.append(row)
+            chunk_items += items
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @classmethod
+    def _write_chunk(cls, domain: str, chunk: list[_BulkRow], write: Callable[[list[_BulkRow]], None], status: HTTPStatus) -> None:
+        """
+        まとめた行を1つのトランザクションで書き込む。条件を満たさなかった(作成では既存、更新では競合した)リンクは
+        409として除き、残りの行で書き込みをやり直す。
+        """
+        pending = chunk
+        while pending:
+            try:
+                write(pending)
+            except TransactWriteError as e:
+                reasons = [reason for reason in e.cancellation_reasons if reason is not None]
+                if (not reasons) or any((reason.code != "ConditionalCheckFailed") or (not reason.raw_item) for reason in reasons):
+                    # 行を特定できない失敗は、まとめた行全体の失敗とする
+                    code = reasons[0].code if reasons else e.cause_response_code
+                    logger.warning(f"Failed to write links in bulk for domain: {domain}, reason: {code}", exc_info=e)
+                    failed_status = HTTPStatus.CONFLICT if code in ("ConditionalCheckFailed", "TransactionConflict") \
+                        else HTTPStatus.INTERNAL_SERVER_ERROR
+                    for row in pending:
+                        row.fail(failed_status, f"Failed to write the batch: {code}")
+                    return
+                # 条件を満たさなかったリンクは、ALL_OLDで返却された既存のアイテムから特定する
+                conflicts = {reason.raw_item[DelibirdLinkTableModel.slug.attr_name]["S"] for reason in reasons}
+                for row in pending:
+                    if row.slug in conflicts:
+                        row.fail(HTTPStatus.CONFLICT, "Link already exists." if status == HTTPStatus.CREATED else "Link was updated concurrently.")
+                pending = [row for row in pending if row.status is None]
+                continue
+            except Exception:
+                logger.exception(f"Failed to write links in bulk for domain: {domain}")
+                for row in pending:
+                    row.fail(HTTPStatus.INTERNAL_SERVER_ERROR, "Failed to write the batch.")
+                return
+            for row in pending:
+                row.status = status
+            return
+
+    @classmethod
+    def _load_models(cls, domain: str, rows: list[_BulkRow]) -> None:
+        """更新するリンクの、更新前の無効化の状態とタグを読み込む"""
+        attributes = [DelibirdLinkTableModel.domain.attr_name, DelibirdLinkTableModel.slug.attr_name,
+                      DelibirdLinkTableModel.disabled.attr_name, DelibirdLinkTableModel.tag.attr_name]
+
+        def load(group: list[_BulkRow]) -> None:
+            models = {model.slug: model for model in DelibirdLinkTableModel.batch_get(
+                [(domain, row.slug) for row in group], attributes_to_get=attributes)}
+            for row in group:
+                if (model := models.get(row.slug)) is None:
+                    row.fail(HTTPStatus.NOT_FOUND, "Link not found.")
+                row.model = model
+
+        groups = [rows[i:i + _BATCH_GET_SIZE] for i in range(0, len(rows), _BATCH_GET_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(len(groups), DelibirdTableMeta.max_pool_connections) or 1) as executor:
+            # 例外はここで送出させる
+            list(executor.map(load, groups))
+
+    @classmethod
+    def _create(cls, domain: str, rows: list[_BulkRow]) -> tuple[int, int]:
+        """リンクを作成し、(作成したリンク数, そのうち無効化されたリンク数)を返す"""
+        models = {row.row: new_link_model(row.link) for row in rows}
+
+        def write(chunk: list[_BulkRow]) -> None:
+            DelibirdLinkTableModel.create_links([models[row.row] for row in chunk])
+
+        cls._run_chunks(domain, cls._chunks(rows, lambda row: models[row.row].create_transaction_items()), write, HTTPStatus.CREATED)
+        created = [row for row in rows if row.status == HTTPStatus.CREATED]
+        return len(created), sum(int(row.link.disabled) for row in created)
+
+    @classmethod
+    def _update(cls, domain: str, rows: list[_BulkRow]) -> tuple[int, int]:
+        """リンクを更新し、(0, 無効化されたリンク数の増減)を返す"""
+        cls._load_models(domain, rows)
+        rows = [row for row in rows if row.status is None]
+
+        def write(chunk: list[_BulkRow]) -> None:
+            DelibirdLinkTableModel.update_links(
+                [(row.model, link_update_actions(row.link), row.link.disabled, row.link.tag) for row in chunk])
+
+        cls._run_chunks(domain, cls._chunks(rows, lambda row: row.model.update_transaction_items(row.link.tag)), write, HTTPStatus.OK)
+        updated = [row for row in rows if row.status == HTTPStatus.OK]
+        return 0, sum((1 if row.link.disabled else -1) for row in updated if bool(row.model.disabled) != row.link.disabled)
+
+    @classmethod
+    def _run_chunks(cls, domain: str, chunks: list[list[_BulkRow]], write: Callable[[list[_BulkRow]], None], status: HTTPStatus) -> None:
+        if not chunks:
+            return
+        with ThreadPoolExecutor(max_workers=min(len(chunks), DelibirdTableMeta.max_pool_connections)) as executor:
+            list(executor.map(lambda chunk: cls._write_chunk(domain, chunk, write, status), chunks))
+
+    @classmethod
+    def perform(cls, domain: str, event: DelibirdRequest):
+        try:
+            rows = cls._parse_rows(domain, event)
+        except csv.Error as e:
+            logger.info(f"Invalid CSV body for domain: {domain}, error: {e}")
+            return error_response(HTTPStatus.BAD_REQUEST, force_json=True)
+        if not rows:
+            logger.info(f"Get empty bulk request for domain: {domain}")
+            return error_response(HTTPStatus.BAD_REQUEST, force_json=True)
+        if len(rows) > _MAX_ROWS:
+            logger.info(f"Get too many rows in bulk request for domain: {domain}, rows: {len(rows)}")
+            return error_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, force_json=True)
+
+        valid_rows = [row for row in rows if row.status is None]
+        try:
+            if event.http_method == "POST":
+                links, disabled_links = cls._create(domain, valid_rows)
+            else:
+                links, disabled_links = cls._update(domain, valid_rows)
+        except Exception:
+            logger.exception(f"Failed to write links in bulk for domain: {domain}")
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, force_json=True)
+
+        if links or disabled_links:
+            # リンク数は並列のトランザクションが競合しないように、書き込み後にまとめて加算する
+            try:
+                DelibirdDomainMetaTableModel(domain).update(actions=DelibirdDomainMetaTableModel.link_count_actions(links, disabled_links))
+            except Exception:
+                logger.exception(f"Failed to update link counts for domain: {domain}, links: {links}, disabled: {disabled_links}")
+        if any(row.status in (HTTPStatus.CREATED, HTTPStatus.OK) for row in rows):
+            # リダイレクト側のキャッシュを無効化 (更新したリンクはCDNのキャッシュもパージする)
+            notify_link_changed(domain, purge_slugs=[row.slug for row in rows if row.status == HTTPStatus.OK])
+
+        succeeded = sum(1 for row in rows if row.status in (HTTPStatus.CREATED, HTTPStatus.OK))
+        logger.info(f"Bulk {event.http_method} for domain: {domain}, rows: {len(rows)}, succeeded: {succeeded}")
+        return success_response(HTTPStatus.OK, {
+            "results": [row.to_result() for row in rows],
+            "succeeded": succeeded,
+            "failed": len(rows) - succeeded,
+        })
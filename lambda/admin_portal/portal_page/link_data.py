@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Optional
+
+from pynamodb.expressions.update import Action, RemoveAction
+
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink
+from ddb.models.delibird_link_tag import MAX_LINK_TAGS
+from util.date_util import get_jst_datetime_now, as_jst
+
+
+def parse_link_data(domain: str, body: dict[str, Any]) -> DelibirdLink:
+    """
+    リンクの作成・更新リクエストのJSON(辞書)からリンクを生成する。値の検証はDelibirdLink._validationで行う。
+    不正な値の場合はValueErrorなどの例外を送出する。
+    """
+    link = DelibirdLink(
+        _model=None,
+        domain=domain,
+        link_slug=str(body["link_slug"]),
+        link_origin=str(body["link_origin"]),
+        status=HTTPStatus(int(body["status"])),
+        disabled=bool(body["disabled"]),
+
+        memo=str(body["memo"]) if "memo" in body else "",
+        tag=set(body["tag"]) if "tag" in body else None,
+        expiration_date=as_jst(datetime.fromisoformat(str(body["expiration_date"]))) if "expiration_date" in body else None,
+        expired_origin=str(body["expired_origin"]) if "expired_origin" in body else None,
+        _passphrase=str(body["passphrase"]) if "passphrase" in body else None,
+        query_omit=bool(body["query_omit"]),
+        query_whitelist=set(body["query_whitelist"]) if "query_whitelist" in body else None,
+        max_uses=int(body["max_uses"]) if "max_uses" in body else None,
+        cacheable=bool(body["cacheable"]) if "cacheable" in body else False,
+    )
+    if not link.status.is_redirection:
+        raise ValueError(f"status is not redirection: {link.status}")
+    if link.query_omit and link.query_whitelist:
+        raise ValueError("both query_omit and query_whitelist are set.")
+    if link.expiration_date and link.expiration_date.tzinfo is None:
+        raise ValueError("expiration_date is not timezone-aware.")
+    if (len(link.tag) > MAX_LINK_TAGS) or (not all(link.tag)):
+        raise ValueError(f"tag must be up to {MAX_LINK_TAGS} non-empty values.")
+    return link
+
+
+def new_link_model(link: DelibirdLink) -> DelibirdLinkTableModel:
+    """作成するリンクのアイテムを生成する"""
+    inactive_status = DelibirdLinkTableModel.written_inactive_status(link.expiration_date)
+    return DelibirdLinkTableModel(
+        domain=link.domain,
+        slug=link.link_slug,
+
+        created_at=get_jst_datetime_now(),
+        origin=link.link_origin,
+        status=link.status.value,
+        disabled=link.disabled,
+
+        memo=link.memo,
+        tag=link.tag,
+        expiration_date=link.expiration_date,
+        expired_origin=link.expired_origin,
+        passphrase=link._passphrase,  # allow read private field
+        query_omit=link.query_omit,
+        query_whitelist=link.query_whitelist,
+        max_uses=link.max_uses,
+        inactive_status=inactive_status.name if inactive_status is not None else None,
+        cacheable=link.cacheable,
+    )
+
+
+def link_update_actions(link: DelibirdLink) -> list[Action]:
+    """リンクの設定値をリクエストの値で置き換える更新のアクションを返す"""
+    return [
+        DelibirdLinkTableModel.origin.set(link.link_origin),
+        DelibirdLinkTableModel.status.set(int(link.status)),
+        DelibirdLinkTableModel.disabled.set(link.disabled),
+        DelibirdLinkTableModel.memo.set(link.memo),
+        DelibirdLinkTableModel.tag.set(link.tag),
+        # GSIのキーはNULLにできないため、有効期限を設定しない場合は属性を削除する
+        (DelibirdLinkTableModel.expiration_date.set(link.expiration_date) if link.expiration_date is not None
+         else DelibirdLinkTableModel.expiration_date.remove()),
+        DelibirdLinkTableModel.expired_origin.set(link.expired_origin),
+        DelibirdLinkTableModel.passphrase.set(link._passphrase),  # allow read private field
+        DelibirdLinkTableModel.query_omit.set(link.query_omit),
+        DelibirdLinkTableModel.query_whitelist.set(link.query_whitelist),
+        DelibirdLinkTableModel.max_uses.set(link.max_uses),
+        DelibirdLinkTableModel.inactive_status_action(link.expiration_date),
+        DelibirdLinkTableModel.cacheable.set(link.cacheable),
+    ]
+
+
+@dataclass
+class LinkPatch:
+    """PATCHで変更する属性。disabled・tagは変更しない場合None"""
+    slug: str
+    version: int
+    actions: list[Action] = field(default_factory=list)
+    disabled: Optional[bool] = None
+    tag: Optional[set[str]] = None
+
+
+def _patch_value_actions(key: str, value: Any) -> dict[str, Action]:
+    """PATCHの1つのフィールドを、属性名ごとのアクションに変換する。nullは任意の属性の削除を表す"""
+    _M = DelibirdLinkTableModel
+    match key:
+        case "link_origin":
+            if not value:
+                raise ValueError("Origin is required.")
+            return {_M.origin.attr_name: _M.origin.set(str(value))}
+        case "status":
+            status = HTTPStatus(int(value))
+            if not status.is_redirection:
+                raise ValueError(f"status is not redirection: {status}")
+            return {_M.status.attr_name: _M.status.set(status.value)}
+        case "cacheable":
+            if not isinstance(value, bool):
+                raise ValueError("cacheable must be a boolean.")
+            return {_M.cacheable.attr_name: _M.cacheable.set(value)}
+        case "query_omit":
+            if not isinstance(value, bool):
+                raise ValueError("query_omit must be a boolean.")
+            actions = {_M.query_omit.attr_name: _M.query_omit.set(value)}
+            if value:
+                # クエリを省略する場合、ホワイトリストは使用されない
+                actions[_M.query_whitelist.attr_name] = _M.query_whitelist.remove()
+            return actions
+        case "memo":
+            return {_M.memo.attr_name: _M.memo.set(str(value) if value is not None else "")}
+        case "query_whitelist":
+            if not value:
+                return {_M.query_whitelist.attr_name: _M.query_whitelist.remove()}
+            return {_M.query_whitelist.attr_name: _M.query_whitelist.set(set(value))}
+        case "expiration_date":
+            if value is None:
+                # GSIのキーはNULLにできないため、属性を削除する
+                return {_M.expiration_date.attr_name: _M.expiration_date.remove(),
+                        _M.inactive_status.attr_name: _M.inactive_status.remove()}
+            expiration_date = datetime.fromisoformat(str(value))
+            if expiration_date.tzinfo is None:
+                raise ValueError("expiration_date is not timezone-aware.")
+            return {_M.expiration_date.attr_name: _M.expiration_date.set(as_jst(expiration_date)),
+                    _M.inactive_status.attr_name: _M.inactive_status_action(expiration_date)}
+        case "expired_origin":
+            if not value:
+                return {_M.expired_origin.attr_name: _M.expired_origin.remove()}
+            return {_M.expired_origin.attr_name: _M.expired_origin.set(str(value))}
+        case "passphrase":
+            if (passphrase := DelibirdLink.normalize_passphrase(str(value) if value is not None else None)) is None:
+                return {_M.passphrase.attr_name: _M.passphrase.remove()}
+            return {_M.passphrase.attr_name: _M.passphrase.set(passphrase)}
+        case "max_uses":
+            # 上限超過の記録は、次のリクエストで使用回数から判定し直す
+            if value is None:
+                return {_M.max_uses.attr_name: _M.max_uses.remove(), _M.inactive_status.attr_name: _M.inactive_status.remove()}
+            return {_M.max_uses.attr_name: _M.max_uses.set(int(value)), _M.inactive_status.attr_name: _M.inactive_status.remove()}
+    raise ValueError(f"Unknown field: {key}")
+
+
+def parse_link_patch(body: dict[str, Any]) -> LinkPatch:
+    """
+    PATCHリクエストのJSON(辞書)から、変更する属性のみの更新を生成する。link_slugと読み込んだ版数(version)は必須。
+    不正な値の場合はValueErrorなどの例外を送出する。
+    """
+    version = body["version"]
+    if isinstance(version, bool) or (not isinstance(version, int)) or (version < 0):
+        raise ValueError(f"Invalid version: {version}")
+    patch = LinkPatch(slug=str(body["link_slug"]), version=version)
+
+    if body.get("query_whitelist") and (body.get("query_omit") is not False):
+        # 現在の値を読み込まないため、ホワイトリストはクエリを省略しない設定と同時にのみ変更できる
+        raise ValueError("query_whitelist must be set together with query_omit: false.")
+    actions: dict[str, Action] = {}
+    for key, value in body.items():
+        if key in ("link_slug", "version"):
+            continue
+        if key == "disabled":
+            if not isinstance(value, bool):
+                raise ValueError("disabled must be a boolean.")
+            patch.disabled = value
+        elif key == "tag":
+            patch.tag = set(value or ())
+            if (len(patch.tag) > MAX_LINK_TAGS) or (not all(patch.tag)):
+                raise ValueError(f"tag must be up to {MAX_LINK_TAGS} non-empty values.")
+        else:
+            for name, action in _patch_value_actions(key, value).items():
+                # 同じ属性への削除は、先に指定された値(有効期限切れの記録など)を上書きしない
+                if (name in actions) and isinstance(action, RemoveAction):
+                    continue
+                actions[name] = action
+    patch.actions = list(actions.values())
+
+    if (not patch.actions) and (patch.disabled is None) and (patch.tag is None):
+        raise ValueError("No fields to update.")
+    return patch
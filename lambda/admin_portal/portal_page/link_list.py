@@ -1,59 +1,77 @@
+import functools
+import hashlib
 import os
 from http import HTTPStatus
 from typing import Optional
 
-from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
-
-from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink
 from portal_page.page import AdminPortalPage
-from util.date_util import get_jst_datetime_now
+from util.environment_util import get_env_var
 from util.logger_util import setup_logger
-from util.nonce_util import create_nonce
+from util.parse_util import parse_query
+from util.request_util import DelibirdRequest
 from util.response_util import error_response, success_response, STATIC_FOOTER
-from util.static_resource_util import load_function_html
+from util.static_resource_util import load_function_html, load_function_resource
 
 logger = setup_logger("admin_portal.link_list_page")
 _ENVIRONMENT = str(os.environ["DELIBIRD_ENV"])
 _LINK_PREFIX = str(os.environ["LINK_PREFIX"])
+# 一覧ページ(リンクのデータを含まない)をブラウザでキャッシュする秒数
+_PAGE_MAX_AGE_SECONDS = int(get_env_var("ADMIN_PAGE_MAX_AGE_SECONDS", 300))
+# スクリプトはURLに内容のハッシュを含むため、内容が変わらない限り長期間キャッシュする
+_SCRIPT_MAX_AGE_SECONDS = 31536000
+LINK_LIST_SCRIPT_PATH = "links.js"
+_SCRIPT_VERSION_QUERY_KEY = "v"
 
 
-class PortalListPage(AdminPortalPage):
-    @classmethod
-    def _get_links_html(cls, domain: str, links: list[DelibirdLink], *, style_nonce: str = None, script_nonce: str = None) -> Optional[str]:
-        # アクティブ/非アクティブのカウント
-        active_count = sum(1 for link in links if link.check_active()[0])
-        inactive_count = len(links) - active_count
+@functools.cache
+def _load_script() -> tuple[Optional[str], str]:
+    script = load_function_resource(f"static/{LINK_LIST_SCRIPT_PATH}")
+    return script, hashlib.sha256((script or "").encode("utf-8")).hexdigest()[:16]
 
-        # 現在時刻を取得
-        now = get_jst_datetime_now()
 
+class PortalListPage(AdminPortalPage):
+    """リンク一覧ページ。リンクのデータはPortalLinkApiPageからスクリプトで読み込むため、ページ自体はドメインごとに同一になる"""
+
+    @classmethod
+    @functools.cache
+    def _get_links_html(cls, domain: str) -> Optional[str]:
+        _, script_version = _load_script()
+        link_prefix = _LINK_PREFIX + "/" if _LINK_PREFIX else ""
         return load_function_html("static/links.html", {
             'domain': domain,
             'delibird_environment': _ENVIRONMENT,
-            'link_prefix': _LINK_PREFIX + "/" if _LINK_PREFIX else "",
-            'links': links,
-            'active_count': active_count,
-            'inactive_count': inactive_count,
-            'now': now,
-            'style_nonce': style_nonce,
-            'script_nonce': script_nonce,
+            'link_prefix': link_prefix,
+            'script_url': f"/{link_prefix}admin/{LINK_LIST_SCRIPT_PATH}?{_SCRIPT_VERSION_QUERY_KEY}={script_version}",
             "STATIC_FOOTER": STATIC_FOOTER if STATIC_FOOTER else None
         })
 
     @classmethod
-    def perform(cls, domain: str, event: APIGatewayProxyEvent):
-        script_nonce = create_nonce()
-
+    def perform(cls, domain: str, event: DelibirdRequest):
         try:
-            links = DelibirdLinkTableModel.scan_domain(domain)
-            html_content = cls._get_links_html(domain, links, script_nonce=script_nonce)
+            html_content = cls._get_links_html(domain)
             if html_content is None:
                 raise RuntimeError("Failed to generate HTML content.")
         except Exception:
-            logger.exception(f"Failed to scan delibird link data for domain: {domain}")
+            logger.exception(f"Failed to render link list page for domain: {domain}")
             return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
 
         # HTMLレスポンスを返す
         return success_response(HTTPStatus.OK, html_content,
                                 content_type='text/html;charset=utf-8', use_css=True, use_bootstrap=True, use_self_api=True,
-                                script_nonce=script_nonce)
+                                use_self_script=True, cache_max_age=_PAGE_MAX_AGE_SECONDS)
+
+
+class PortalListScriptPage(AdminPortalPage):
+    """リンク一覧ページのスクリプト"""
+
+    @classmethod
+    def perform(cls, domain: str, event: DelibirdRequest):
+        script, script_version = _load_script()
+        if script is None:
+            logger.error(f"Link list script is not found for domain: {domain}")
+            return error_response(HTTPStatus.NOT_FOUND, force_json=True)
+
+        # 古いバージョンのURLでは最新のスクリプトを返すが、キャッシュはさせない
+        version = parse_query(event.resolved_query_string_parameters, _SCRIPT_VERSION_QUERY_KEY, allow_notfound=True, expected_single_value=False)
+        cache_max_age = _SCRIPT_MAX_AGE_SECONDS if version == [script_version] else None
+        return success_response(HTTPStatus.OK, script, content_type="text/javascript;charset=utf-8", cache_max_age=cache_max_age)
@@ -0,0 +1,90 @@
+import json
+from http import HTTPStatus
+from typing import Optional
+
+from pynamodb.exceptions import TransactWriteError
+
+from ddb.link_cache import notify_link_changed
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLinkVersionMismatch
+from portal_page.link_data import LinkPatch, parse_link_patch
+from portal_page.page import AdminPortalPage
+from util.logger_util import setup_logger
+from util.request_util import DelibirdRequest
+from util.response_util import error_response, success_response
+
+logger = setup_logger("admin_portal.link_patch_page")
+
+
+class PortalLinkPatchPage(AdminPortalPage):
+    """
+    リクエストに含まれる属性のみを、読み込んだ版数(version)のままであることを条件に1回の書き込みで更新する。
+    版数が異なる場合は409を返す。タグを変更する場合のみ、インデックスを更新するために現在のタグを読み込む。
+    """
+
+    @classmethod
+    def _parse_request_data(cls, _body: str) -> Optional[LinkPatch]:
+        try:
+            body = json.loads(_body)
+        except json.decoder.JSONDecodeError as e:
+            logger.info(f"Invalid JSON body: {_body}", exc_info=e)
+            return None
+
+        try:
+            return parse_link_patch(body)
+        except KeyError as e:
+            logger.info(f"Missing field in link patch request: {e.args[0]}")
+            return None
+        except Exception as e:
+            logger.info(f"Failed to parse link patch from body, error: {e}")
+            return None
+
+    @classmethod
+    def _patch_tag(cls, domain: str, patch: LinkPatch) -> int:
+        """
+        タグを含む更新を、現在のタグを読み込んでからインデックスと同じトランザクションで書き込み、更新後の版数を返す。
+        リンクが存在しない場合はDoesNotExistを、版数が異なる場合はDelibirdLinkVersionMismatchを送出する。
+        """
+        _M = DelibirdLinkTableModel
+        model = _M.get(domain, patch.slug, consistent_read=True,
+                       attributes_to_get=[_M.domain.attr_name, _M.slug.attr_name, _M.version.attr_name, _M.disabled.attr_name,
+                                          _M.tag.attr_name])
+        if int(model.version or 0) != patch.version:
+            raise DelibirdLinkVersionMismatch(int(model.version or 0))
+
+        disabled = patch.disabled if patch.disabled is not None else bool(model.disabled)
+        actions = [*patch.actions, _M.tag.set(patch.tag), _M.disabled.set(disabled)]
+        try:
+            model.update_link(actions=actions, disabled=disabled, tag=patch.tag, version=patch.version)
+        except TransactWriteError as e:
+            if any(reason and (reason.code == "ConditionalCheckFailed") for reason in e.cancellation_reasons):
+                raise DelibirdLinkVersionMismatch(None) from e
+            raise e
+        return patch.version + 1
+
+    @classmethod
+    def perform(cls, domain: str, event: DelibirdRequest):
+        patch = cls._parse_request_data(event.body)
+        if patch is None:
+            logger.info(f"Get Invalid link patch request data for domain: {domain}")
+            return error_response(HTTPStatus.BAD_REQUEST, force_json=True)
+
+        try:
+            if patch.tag is not None:
+                version = cls._patch_tag(domain, patch)
+            else:
+                version = DelibirdLinkTableModel.patch_link(domain, patch.slug, patch.version, patch.actions, disabled=patch.disabled)
+        except DelibirdLinkTableModel.DoesNotExist:
+            logger.info(f"Link not found for domain: {domain}, slug: {patch.slug}")
+            return error_response(HTTPStatus.NOT_FOUND, force_json=True)
+        except DelibirdLinkVersionMismatch as e:
+            logger.info(f"Link version mismatch for domain: {domain}, slug: {patch.slug}, "
+                        f"expected: {patch.version}, current: {e.current_version}")
+            return error_response(HTTPStatus.CONFLICT, force_json=True)
+        except Exception:
+            logger.exception(f"Failed to patch DelibirdLinkTableModel for domain: {domain}, slug: {patch.slug}")
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+        # リダイレクト側のキャッシュを無効化
+        notify_link_changed(domain, purge_slugs=(patch.slug,))
+
+        return success_response(HTTPStatus.OK, {"status": "updated", "version": version})
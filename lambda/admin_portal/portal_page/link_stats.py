@@ -0,0 +1,69 @@
+from datetime import timedelta, date
+from http import HTTPStatus
+
+from ddb.models.delibird_click_rollup import DelibirdClickRollupTableModel, HOURS_PER_DAY
+from portal_page.page import AdminPortalPage
+from util.date_util import get_jst_datetime_now
+from util.logger_util import setup_logger
+from util.parse_util import parse_query
+from util.request_util import DelibirdRequest
+from util.response_util import error_response, success_response
+
+logger = setup_logger("admin_portal.link_stats_page")
+
+# 時系列として返す日数 (当日を含む)
+_STATS_DAYS = 30
+
+
+class PortalLinkStatsPage(AdminPortalPage):
+    @classmethod
+    def _build_stats(cls, slug: str, since: date, rollups: list[DelibirdClickRollupTableModel]) -> dict:
+        rollup_by_day = {rollup.day: rollup for rollup in rollups}
+        days = []
+        status_clicks: dict[str, int] = {}
+        referrers: set[str] = set()
+        for offset in range(_STATS_DAYS):
+            day = (since + timedelta(days=offset)).isoformat()
+            # 集計のない日(クリックのなかった日)も0件として返す
+            rollup = rollup_by_day.get(day)
+            day_status_clicks = rollup.status_counts() if rollup else {}
+            day_referrers = (rollup.referrers or set()) if rollup else set()
+            days.append({
+                "date": day,
+                "clicks": int(rollup.clicks) if rollup else 0,
+                "hourly_clicks": rollup.hourly_counts() if rollup else [0] * HOURS_PER_DAY,
+                "status_clicks": day_status_clicks,
+                "distinct_referrers": len(day_referrers),
+            })
+            for status, count in day_status_clicks.items():
+                status_clicks[status] = status_clicks.get(status, 0) + count
+            referrers |= day_referrers
+
+        return {
+            "slug": slug,
+            "days": days,
+            "total": {
+                "clicks": sum(day["clicks"] for day in days),
+                "status_clicks": status_clicks,
+                "distinct_referrers": len(referrers),
+            },
+        }
+
+    @classmethod
+    def perform(cls, domain: str, event: DelibirdRequest):
+        try:
+            slug = parse_query(event.resolved_query_string_parameters, "slug")
+            if not slug:
+                raise ValueError("slug is empty.")
+        except ValueError as e:
+            logger.info("Get Invalid link stats request for domain: %s, error: %s", domain, e)
+            return error_response(HTTPStatus.BAD_REQUEST, force_json=True)
+
+        since = get_jst_datetime_now().date() - timedelta(days=_STATS_DAYS - 1)
+        try:
+            rollups = DelibirdClickRollupTableModel.query_days(domain, slug, since)
+        except Exception:
+            logger.exception("Failed to query click rollups for domain: %s, slug: %s", domain, slug)
+            return error_response(HTTPStatus.INTERNAL_SERVER_ERROR, force_json=True)
+
+        return success_response(HTTPStatus.OK, cls._build_stats(slug, since, rollups))
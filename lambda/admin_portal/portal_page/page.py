@@ -1,9 +1,9 @@
 from abc import ABC, abstractmethod
 
-from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+from util.request_util import DelibirdRequest
 
 
 class AdminPortalPage(ABC):
     @abstractmethod
-    def perform(self, domain: str, event: APIGatewayProxyEvent):
+    def perform(self, domain: str, event: DelibirdRequest):
         pass
@@ -0,0 +1,624 @@
+// 管理画面のパスとドメイン (一覧ページのbody要素のdata属性から取得する)
+const ADMIN_PATH = '/' + document.body.dataset.linkPrefix + 'admin';
+const DOMAIN = document.body.dataset.domain;
+// 一覧の表示に必要なフィールドのみを読み込む
+const LIST_FIELDS = ['origin', 'status', 'disabled', 'uses', 'max_uses', 'memo', 'tag', 'expiration_date', 'expired_origin',
+                     'protected', 'query_omit', 'query_whitelist', 'inactive_reason'];
+const EDIT_FIELDS = ['version', 'origin', 'status', 'disabled', 'max_uses', 'memo', 'tag', 'expiration_date', 'expired_origin',
+                     'passphrase', 'query_omit', 'query_whitelist', 'cacheable'];
+// 編集で変更を送信するフィールド (PATCHのキー)
+const PATCH_KEYS = ['link_origin', 'status', 'disabled', 'query_omit', 'max_uses', 'expiration_date', 'expired_origin',
+                    'passphrase', 'memo', 'tag', 'query_whitelist', 'cacheable'];
+
+// 次に読み込むページのカーソル (nullの場合は最初のページ)
+let nextCursor = null;
+let loadedCount = 0;
+// 一覧の絞り込み条件 (APIのクエリパラメータ)
+let linkFilter = {};
+const EXPIRING_DAYS = 7;
+
+function linksApiUrl(params) {
+    const query = new URLSearchParams();
+    for (const [key, value] of Object.entries(params)) {
+        if (value !== null && value !== undefined) {
+            query.set(key, Array.isArray(value) ? value.join(',') : value);
+        }
+    }
+    return ADMIN_PATH + '/links?' + query.toString();
+}
+
+function fetchJson(url) {
+    return fetch(url, {headers: {'Accept': 'application/json'}}).then(response => {
+        if (!response.ok) {
+            return response.text().then(text => {
+                throw new Error(text || response.statusText);
+            });
+        }
+        return response.json();
+    });
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// 要素を生成する (childrenは文字列(テキスト)または要素)
+function element(tag, attributes, ...children) {
+    const el = document.createElement(tag);
+    for (const [key, value] of Object.entries(attributes || {})) {
+        if (key === 'className') {
+            el.className = value;
+        } else {
+            el.setAttribute(key, value);
+        }
+    }
+    for (const child of children) {
+        if (child !== null && child !== undefined) {
+            el.append(child);
+        }
+    }
+    return el;
+}
+
+function icon(name) {
+    return element('i', {className: 'bi ' + name});
+}
+
+function tooltipIcon(className, title) {
+    return element('i', {className: className, 'data-bs-toggle': 'tooltip', 'data-bs-placement': 'top', 'data-bs-html': 'true', title: title});
+}
+
+function activeBadge(link) {
+    switch (link.inactive_reason) {
+        case null:
+            return element('span', {className: 'badge bg-success'}, icon('bi-check-circle'), ' Active');
+        case 'EXPIRED':
+            return link.expired_origin
+                ? element('span', {className: 'badge bg-expired'}, icon('bi-clock-history'), ' Expired')
+                : element('span', {className: 'badge bg-danger'}, icon('bi-x-circle'), ' Expired');
+        case 'MAX_USES_EXCEEDED':
+            return element('span', {className: 'badge bg-danger'}, icon('bi-x-circle'), ' Exceeded');
+        case 'DISABLED':
+            return element('span', {className: 'badge bg-danger'}, icon('bi-x-circle'), ' Disabled');
+        default:
+            return element('span', {className: 'badge bg-danger'}, icon('bi-x-circle'), ' Unknown');
+    }
+}
+
+function renderLink(link) {
+    const isActive = link.inactive_reason === null;
+    const exceeded = (link.max_uses !== null) && (link.uses >= link.max_uses);
+    const expired = link.expiration_date && (new Date(link.expiration_date) < new Date());
+    const row = element('tr', {className: isActive ? '' : ({DISABLED: 'disabled-row', EXPIRED: 'expired-row', MAX_USES_EXCEEDED: 'max-uses-exceeded-row'}[link.inactive_reason] || '')});
+
+    // Slug
+    row.append(element('td', {className: 'link-slug'},
+        element('strong', {}, element('a', {href: 'https://' + DOMAIN + '/' + document.body.dataset.linkPrefix + link.slug, target: '_blank', className: 'text-decoration-none'}, link.slug)),
+        link.memo ? tooltipIcon('bi bi-sticky-fill text-warning ms-1', escapeHtml(link.memo).replace(/\n/g, '<br>')) : null,
+        link.tag.length ? tooltipIcon('bi bi-tags-fill text-info ms-1', escapeHtml(link.tag.join(', '))) : null,
+        link.protected ? element('i', {className: 'bi bi-lock-fill ms-1'}) : null));
+
+    // Origin
+    row.append(element('td', {className: 'link-origin'},
+        element('a', {href: link.origin, target: '_blank', className: 'text-decoration-none'}, link.origin),
+        (!isActive && link.expired_origin) ? element('br') : null,
+        (!isActive && link.expired_origin) ? element('small', {className: 'text-muted'}, 'Expired Origin:', element('br'), link.expired_origin) : null));
+
+    // HTTP Status
+    row.append(element('td', {className: 'link-status'},
+        element('span', {className: 'badge status-badge ' + (link.status < 300 ? 'bg-success' : link.status < 400 ? 'bg-info' : 'bg-warning')}, String(link.status))));
+
+    // Active Status
+    row.append(element('td', {className: 'link-active'}, activeBadge(link)));
+
+    // Uses
+    row.append(element('td', {}, element('span', {className: 'badge bg-primary'}, String(link.uses))));
+
+    // Limit
+    row.append(element('td', {},
+        element('span', {className: 'badge ' + (exceeded ? 'bg-danger' : 'bg-warning text-black')}, link.max_uses !== null ? String(link.max_uses) : '∞')));
+
+    // Expiration Date (JST)
+    row.append(element('td', {className: 'link-expiration-date'}, link.expiration_date
+        ? element('span', {className: expired ? 'text-danger' : ''}, link.expiration_date.slice(0, 16).replace('T', ' '))
+        : element('span', {className: 'text-muted'}, '-')));
+
+    // Query Settings
+    row.append(element('td', {className: 'link-query'}, link.query_omit
+        ? element('span', {className: 'badge bg-secondary'}, icon('bi-slash-circle'), ' Omit')
+        : element('span', {className: 'badge bg-success'}, icon('bi-check-circle'), link.query_whitelist.length ? ' Whitelist' : ' Include')));
+
+    // Edit Button
+    row.append(element('td', {className: 'link-edit'},
+        element('button', {type: 'button', className: 'btn btn-sm btn-outline-primary edit-link-btn', 'data-slug': link.slug,
+                           'data-bs-toggle': 'modal', 'data-bs-target': '#editLinkModal'}, icon('bi-pencil'))));
+    return row;
+}
+
+// 次のページを読み込んで一覧の末尾に追加する
+function loadLinks() {
+    const loadMoreButton = document.getElementById('loadMoreButton');
+    loadMoreButton.disabled = true;
+    fetchJson(linksApiUrl({fields: LIST_FIELDS, cursor: nextCursor, ...linkFilter}))
+    .then(data => {
+        if (data.counts) {
+            document.getElementById('totalCount').textContent = data.counts.total;
+            document.getElementById('enabledCount').textContent = data.counts.enabled;
+            document.getElementById('disabledCount').textContent = data.counts.disabled;
+        }
+
+        const tbody = document.getElementById('linksBody');
+        const fragment = document.createDocumentFragment();
+        data.links.forEach(link => fragment.append(renderLink(link)));
+        tbody.append(fragment);
+        // Bootstrap ツールチップの初期化 (追加した行のみ)
+        tbody.querySelectorAll('[data-bs-toggle="tooltip"]:not([data-tooltip-ready])').forEach(el => {
+            el.setAttribute('data-tooltip-ready', 'true');
+            new bootstrap.Tooltip(el);
+        });
+
+        loadedCount += data.links.length;
+        nextCursor = data.next_cursor;
+        document.getElementById('linksEmpty').classList.toggle('d-none', loadedCount > 0);
+        document.getElementById('linksLoaded').textContent = loadedCount + ' links loaded';
+        loadMoreButton.classList.toggle('d-none', !nextCursor);
+    })
+    .catch(error => {
+        alert('リンクの読み込みに失敗しました: ' + error.message);
+    })
+    .finally(() => {
+        loadMoreButton.disabled = false;
+    });
+}
+
+// 絞り込み条件を変更して、最初のページから読み込み直す
+function applyFilter() {
+    const filter = document.getElementById('linkFilter').value;
+    const now = new Date();
+    switch (filter) {
+        case 'tag':
+            linkFilter = {tag: document.getElementById('linkFilterTag').value.trim()};
+            if (!linkFilter.tag) {
+                alert('タグを入力してください。');
+                return;
+            }
+            break;
+        case 'expiring':
+            linkFilter = {expires_after: now.toISOString(),
+                          expires_before: new Date(now.getTime() + EXPIRING_DAYS * 24 * 60 * 60 * 1000).toISOString()};
+            break;
+        case 'disabled':
+            linkFilter = {disabled: 'true'};
+            break;
+        default:
+            linkFilter = {};
+    }
+    nextCursor = null;
+    loadedCount = 0;
+    document.getElementById('linksBody').replaceChildren();
+    loadLinks();
+}
+
+// パスフレーズのバリデーション
+function validatePassphrase(passphrase) {
+    if (!passphrase || passphrase === '') {
+        return { valid: true };
+    }
+
+    // 許可される文字: 英数字と -_/*+.!#$%&~@=^
+    const passphrasePattern = /^[a-zA-Z0-9\-_/*+.!#$%&~@=^]+$/;
+    if (!passphrasePattern.test(passphrase)) {
+        return { valid: false, message: 'パスフレーズに使用できない文字が含まれています。\n使用可能な文字: 英数字、-_/*+.!#$%&~@=^' };
+    }
+
+    return { valid: true };
+}
+
+// Query Omit チェックボックスの制御
+document.addEventListener('DOMContentLoaded', function() {
+    // リンク一覧の読み込み
+    const loadMoreButton = document.getElementById('loadMoreButton');
+    loadMoreButton.addEventListener('click', function() {
+        loadLinks();
+    });
+    loadLinks();
+
+    // 一覧の絞り込み
+    const linkFilterSelect = document.getElementById('linkFilter');
+    linkFilterSelect.addEventListener('change', function() {
+        document.getElementById('linkFilterTag').classList.toggle('d-none', linkFilterSelect.value !== 'tag');
+    });
+    document.getElementById('linkFilterForm').addEventListener('submit', function(event) {
+        event.preventDefault();
+        applyFilter();
+    });
+
+    // パスワード表示トグル機能（作成モーダル）
+    const togglePassphraseBtn = document.getElementById('togglePassphrase');
+    const passphraseInput = document.getElementById('passphrase');
+    if (togglePassphraseBtn && passphraseInput) {
+        togglePassphraseBtn.addEventListener('click', function() {
+            const isPassword = passphraseInput.type === 'password';
+            passphraseInput.type = isPassword ? 'text' : 'password';
+            const icon = togglePassphraseBtn.querySelector('i');
+            icon.classList.toggle('bi-eye');
+            icon.classList.toggle('bi-eye-slash');
+        });
+    }
+
+    // パスワード表示トグル機能（編集モーダル）
+    const toggleEditPassphraseBtn = document.getElementById('toggleEditPassphrase');
+    const editPassphraseInput = document.getElementById('editPassphrase');
+    if (toggleEditPassphraseBtn && editPassphraseInput) {
+        toggleEditPassphraseBtn.addEventListener('click', function() {
+            const isPassword = editPassphraseInput.type === 'password';
+            editPassphraseInput.type = isPassword ? 'text' : 'password';
+            const icon = toggleEditPassphraseBtn.querySelector('i');
+            icon.classList.toggle('bi-eye');
+            icon.classList.toggle('bi-eye-slash');
+        });
+    }
+
+    const queryOmitCheckbox = document.getElementById('queryOmit');
+    const queryWhitelistContainer = document.getElementById('queryWhitelistContainer');
+    const queryWhitelistInput = document.getElementById('queryWhitelist');
+
+    // チェックボックスの状態に応じてホワイトリスト入力欄を表示/非表示・有効/無効
+    function updateQueryWhitelistState() {
+        if (queryOmitCheckbox.checked) {
+            queryWhitelistContainer.classList.add('hidden-field');
+            queryWhitelistInput.disabled = true;
+            queryWhitelistInput.value = '';
+        } else {
+            queryWhitelistContainer.classList.remove('hidden-field');
+            queryWhitelistInput.disabled = false;
+        }
+    }
+
+    // 初期状態を設定
+    updateQueryWhitelistState();
+
+    // チェックボックス変更時
+    queryOmitCheckbox.addEventListener('change', updateQueryWhitelistState);
+
+    // フォーム送信ボタンのクリックイベント
+    const submitButton = document.getElementById('submitButton');
+    submitButton.addEventListener('click', function(e) {
+        // イベント伝播を防止
+        e.preventDefault();
+        e.stopPropagation();
+
+        const slugInput = document.getElementById('linkSlug');
+        const slugPattern = /^[a-zA-Z0-9_\-/]+$/;
+
+        if (!slugInput.value) {
+            alert('Slugを入力してください。');
+            return;
+        }
+
+        if (!slugPattern.test(slugInput.value)) {
+            alert('Slugは英数字、ハイフン、アンダースコア、スラッシュのみ使用可能です。');
+            return;
+        }
+
+        const originInput = document.getElementById('linkOrigin');
+        if (!originInput.value) {
+            alert('Originを入力してください。');
+            return;
+        }
+
+        // パスフレーズのバリデーション
+        const passphrase = document.getElementById('passphrase').value;
+        const passphraseValidation = validatePassphrase(passphrase);
+        if (!passphraseValidation.valid) {
+            alert(passphraseValidation.message);
+            return;
+        }
+
+        // JSONデータを作成
+        const data = {
+            link_slug: document.getElementById('linkSlug').value,
+            link_origin: document.getElementById('linkOrigin').value,
+            status: parseInt(document.getElementById('status').value),
+            disabled: document.getElementById('disabled').checked,
+            query_omit: queryOmitCheckbox.checked,
+            cacheable: document.getElementById('cacheable').checked
+        };
+
+        // オプショナルフィールドを追加
+        const maxUses = document.getElementById('maxUses').value;
+        if (maxUses) {
+            data.max_uses = parseInt(maxUses);
+        }
+
+        const expirationDate = document.getElementById('expirationDate').value;
+        if (expirationDate) {
+            // ISO 8601(with timezone)
+            data.expiration_date = (new Date(expirationDate)).toISOString();
+        }
+
+        const expiredOrigin = document.getElementById('expiredOrigin').value;
+        if (expiredOrigin) {
+            data.expired_origin = expiredOrigin;
+        }
+
+        if (passphrase) {
+            data.passphrase = passphrase;
+        }
+
+        const memo = document.getElementById('memo').value;
+        if (memo) {
+            data.memo = memo;
+        }
+
+        const tag = document.getElementById('tag').value;
+        if (tag) {
+            data.tag = tag.split(',').map(s => s.trim()).filter(s => s);
+        }
+
+        // query_omitがfalseの場合のみ、query_whitelistを送信
+        if (!queryOmitCheckbox.checked) {
+            const queryWhitelist = document.getElementById('queryWhitelist').value;
+            if (queryWhitelist) {
+                data.query_whitelist = queryWhitelist.split(',').map(s => s.trim()).filter(s => s);
+            }
+        }
+
+        // POSTリクエストを送信（JSON形式）
+        fetch(ADMIN_PATH, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(data)
+        })
+        .then(response => {
+            if (response.ok) {
+                // 成功したらページをリロード
+                window.location.reload();
+            } else if(response.status === 409) { // CONFLICT
+                alert('指定したリンクはすでに存在しています。最新のリンク一覧を確認してください。');
+            } else {
+                // エラーの場合はアラート表示
+                return response.text().then(text => {
+                    alert('エラーが発生しました: ' + (text || response.statusText));
+                });
+            }
+        })
+        .catch(error => {
+            alert('エラーが発生しました: ' + error.message);
+        });
+    });
+
+    // モーダルが閉じられたときにフォームをリセット
+    const createLinkModal = document.getElementById('createLinkModal');
+    const createLinkForm = document.getElementById('createLinkForm');
+    createLinkModal.addEventListener('hidden.bs.modal', function() {
+        createLinkForm.reset();
+        updateQueryWhitelistState();
+
+        // パスワード入力欄を非表示状態にリセット
+        if (passphraseInput) {
+            passphraseInput.type = 'password';
+        }
+        if (togglePassphraseBtn) {
+            const icon = togglePassphraseBtn.querySelector('i');
+            if (icon) {
+                icon.classList.remove('bi-eye-slash');
+                icon.classList.add('bi-eye');
+            }
+        }
+    });
+
+    // === 編集機能 ===
+    const editQueryOmitCheckbox = document.getElementById('editQueryOmit');
+    const editQueryWhitelistContainer = document.getElementById('editQueryWhitelistContainer');
+    const editQueryWhitelistInput = document.getElementById('editQueryWhitelist');
+
+    // 編集モーダル用のホワイトリスト状態制御
+    function updateEditQueryWhitelistState() {
+        if (editQueryOmitCheckbox.checked) {
+            editQueryWhitelistContainer.classList.add('hidden-field');
+            editQueryWhitelistInput.disabled = true;
+            editQueryWhitelistInput.value = '';
+        } else {
+            editQueryWhitelistContainer.classList.remove('hidden-field');
+            editQueryWhitelistInput.disabled = false;
+        }
+    }
+
+    // 編集チェックボックス変更時
+    editQueryOmitCheckbox.addEventListener('change', updateEditQueryWhitelistState);
+
+    // 編集中のリンクの版数と、読み込んだ時点のフォームの値 (変更されたフィールドのみを送信する)
+    let editVersion = null;
+    let editInitialData = null;
+
+    // 編集フォームの値からリンクのJSONデータを作成する
+    function buildEditData() {
+        const data = {
+            link_slug: document.getElementById('editLinkSlug').value,
+            link_origin: document.getElementById('editLinkOrigin').value,
+            status: parseInt(document.getElementById('editStatus').value),
+            disabled: document.getElementById('editDisabled').checked,
+            query_omit: editQueryOmitCheckbox.checked,
+            cacheable: document.getElementById('editCacheable').checked
+        };
+
+        // オプショナルフィールドを追加
+        const maxUses = document.getElementById('editMaxUses').value;
+        if (maxUses) {
+            data.max_uses = parseInt(maxUses);
+        }
+
+        const expirationDate = document.getElementById('editExpirationDate').value;
+        if (expirationDate) {
+            data.expiration_date = (new Date(expirationDate)).toISOString();
+        }
+
+        const expiredOrigin = document.getElementById('editExpiredOrigin').value;
+        if (expiredOrigin) {
+            data.expired_origin = expiredOrigin;
+        }
+
+        const editPassphrase = document.getElementById('editPassphrase').value;
+        if (editPassphrase) {
+            data.passphrase = editPassphrase;
+        }
+
+        const memo = document.getElementById('editMemo').value;
+        if (memo) {
+            data.memo = memo;
+        }
+
+        const tag = document.getElementById('editTag').value;
+        if (tag) {
+            data.tag = tag.split(',').map(s => s.trim()).filter(s => s);
+        }
+
+        // query_omitがfalseの場合のみ、query_whitelistを送信
+        if (!editQueryOmitCheckbox.checked) {
+            const queryWhitelist = editQueryWhitelistInput.value;
+            if (queryWhitelist) {
+                data.query_whitelist = queryWhitelist.split(',').map(s => s.trim()).filter(s => s);
+            }
+        }
+        return data;
+    }
+
+    // 編集ボタンのクリックイベント (ボタンは一覧の読み込みごとに追加されるため、tbodyで受け取る)
+    document.getElementById('linksBody').addEventListener('click', function(e) {
+        const button = e.target.closest('.edit-link-btn');
+        if (!button) {
+            return;
+        }
+        // 編集に必要なフィールド(パスフレーズなど)は、編集するリンクのみ読み込む
+        document.getElementById('editLinkForm').reset();
+        document.getElementById('editSubmitButton').disabled = true;
+        fetchJson(linksApiUrl({slug: button.getAttribute('data-slug'), fields: EDIT_FIELDS}))
+        .then(data => {
+            const link = data.link;
+
+            // フォームに値を設定
+            document.getElementById('editLinkSlug').value = link.slug;
+            document.getElementById('editLinkOrigin').value = link.origin;
+            document.getElementById('editStatus').value = String(link.status);
+            document.getElementById('editDisabled').checked = link.disabled;
+            document.getElementById('editMaxUses').value = link.max_uses ?? '';
+            document.getElementById('editExpirationDate').value = link.expiration_date ? link.expiration_date.slice(0, 16) : '';
+            document.getElementById('editExpiredOrigin').value = link.expired_origin ?? '';
+            document.getElementById('editQueryOmit').checked = link.query_omit;
+            document.getElementById('editCacheable').checked = link.cacheable;
+            document.getElementById('editQueryWhitelist').value = link.query_whitelist.join(',');
+            document.getElementById('editMemo').value = link.memo;
+            document.getElementById('editTag').value = link.tag.join(',');
+
+            // パスワードを表示（既存のパスワードを確認できるように）
+            document.getElementById('editPassphrase').value = link.passphrase ?? '';
+            document.getElementById('editPassphrase').type = 'password';
+            if (toggleEditPassphraseBtn) {
+                const icon = toggleEditPassphraseBtn.querySelector('i');
+                if (icon) {
+                    icon.classList.remove('bi-eye-slash');
+                    icon.classList.add('bi-eye');
+                }
+            }
+
+            document.getElementById('editSubmitButton').disabled = false;
+            // Query Whitelist の状態を更新
+            updateEditQueryWhitelistState();
+
+            editVersion = link.version;
+            editInitialData = buildEditData();
+        })
+        .catch(error => {
+            alert('リンクの読み込みに失敗しました: ' + error.message);
+        });
+    });
+
+    // 編集フォーム送信ボタンのクリックイベント
+    const editSubmitButton = document.getElementById('editSubmitButton');
+    editSubmitButton.addEventListener('click', function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+
+        const originInput = document.getElementById('editLinkOrigin');
+
+        if (!originInput.value) {
+            alert('Originを入力してください。');
+            return;
+        }
+
+        // パスフレーズのバリデーション
+        const editPassphrase = document.getElementById('editPassphrase').value;
+        const passphraseValidation = validatePassphrase(editPassphrase);
+        if (!passphraseValidation.valid) {
+            alert(passphraseValidation.message);
+            return;
+        }
+
+        // 読み込んだ時点から変更されたフィールドのみを送信する (未設定にしたフィールドはnull)
+        const data = buildEditData();
+        const patch = {link_slug: data.link_slug, version: editVersion};
+        for (const key of PATCH_KEYS) {
+            if (JSON.stringify(data[key] ?? null) !== JSON.stringify(editInitialData[key] ?? null)) {
+                patch[key] = data[key] ?? null;
+            }
+        }
+        // ホワイトリストはクエリを省略しない設定と同時に送信する
+        if (patch.query_whitelist && !('query_omit' in patch)) {
+            patch.query_omit = data.query_omit;
+        }
+        if (Object.keys(patch).length === 2) {
+            bootstrap.Modal.getInstance(document.getElementById('editLinkModal'))?.hide();
+            return;
+        }
+
+        // PATCHリクエストを送信（JSON形式、読み込んだ版数から更新されていた場合は409）
+        fetch(ADMIN_PATH, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(patch)
+        })
+        .then(response => {
+            if (response.ok) {
+                // 成功したらページをリロード
+                window.location.reload();
+            } else if (response.status === 409) {
+                alert('リンクが他の操作で更新されています。再読み込みしてから編集してください。');
+            } else {
+                // エラーの場合はアラート表示
+                return response.text().then(text => {
+                    alert('エラーが発生しました: ' + (text || response.statusText));
+                });
+            }
+        })
+        .catch(error => {
+            alert('エラーが発生しました: ' + error.message);
+        });
+    });
+
+    // 編集モーダルが閉じられたときにフォームをリセット
+    const editLinkModal = document.getElementById('editLinkModal');
+    const editLinkForm = document.getElementById('editLinkForm');
+    editLinkModal.addEventListener('hidden.bs.modal', function() {
+        editLinkForm.reset();
+        updateEditQueryWhitelistState();
+
+        // パスワード入力欄を非表示状態にリセット
+        if (editPassphraseInput) {
+            editPassphraseInput.type = 'password';
+        }
+        if (toggleEditPassphraseBtn) {
+            const icon = toggleEditPassphraseBtn.querySelector('i');
+            if (icon) {
+                icon.classList.remove('bi-eye-slash');
+                icon.classList.add('bi-eye');
+            }
+        }
+    });
+});
@@ -84,6 +84,20 @@ if [ "$copied_count" -eq 0 ]; then
     exit 1
 fi
 
+# バイトコードをプリコンパイル (Lambdaと同じPythonで、実行時にソースの更新確認を行わないunchecked-hash形式)
+# BYTECODE_ONLY=trueの場合は、ソースと同じ場所に.pycを生成して.pyを削除する(パッケージ縮小・ソースの読み込みを省略)
+echo "Precompiling bytecode..."
+if [ "${BYTECODE_ONLY}" = "true" ]; then
+    COMPILE_COMMAND="python -m compileall -q -f -j 0 -b --invalidation-mode unchecked-hash /delibird/output \
+        && find /delibird/output -name '*.py' -delete && find /delibird/output -name '__pycache__' -type d -prune -exec rm -rf {} +"
+else
+    COMPILE_COMMAND="python -m compileall -q -f -j 0 --invalidation-mode unchecked-hash /delibird/output"
+fi
+docker run --rm \
+-v "${BUILD_DIR}":/delibird/output \
+public.ecr.aws/sam/build-python3.13:latest-arm64 \
+bash -c "${COMPILE_COMMAND}"
+
 echo "Function ${LAMBDA_NAME} build completed successfully."
 
 # ビルド成果物の内容を表示
@@ -87,6 +87,31 @@ else
     echo "Warning: Static resources directory not found at ${STATIC_SOURCE}"
 fi
 
+# 静的リソースのテンプレートをプリコンパイル (レイヤーにインストールしたjinja2を使用する)
+if [ -d "${BUILD_DIR}/delibird/static" ]; then
+    echo "Precompiling static templates..."
+    docker run --rm \
+    -v "${BUILD_DIR}":/delibird/output \
+    -v "${LAYER_DIR}/compile_templates.py":/delibird/compile_templates.py:ro \
+    -e PYTHONPATH=/delibird/output/python \
+    public.ecr.aws/sam/build-python3.13:latest-arm64 \
+    python /delibird/compile_templates.py /delibird/output/delibird/static /delibird/output/delibird/compiled_templates
+fi
+
+# バイトコードをプリコンパイル (Lambdaと同じPythonで、実行時にソースの更新確認を行わないunchecked-hash形式)
+# BYTECODE_ONLY=trueの場合は、ソースと同じ場所に.pycを生成して.pyを削除する(パッケージ縮小・ソースの読み込みを省略)
+echo "Precompiling bytecode..."
+if [ "${BYTECODE_ONLY}" = "true" ]; then
+    COMPILE_COMMAND="python -m compileall -q -f -j 0 -b --invalidation-mode unchecked-hash /delibird/output \
+        && find /delibird/output -name '*.py' -delete && find /delibird/output -name '__pycache__' -type d -prune -exec rm -rf {} +"
+else
+    COMPILE_COMMAND="python -m compileall -q -f -j 0 --invalidation-mode unchecked-hash /delibird/output"
+fi
+docker run --rm \
+-v "${PYTHON_DIR}":/delibird/output \
+public.ecr.aws/sam/build-python3.13:latest-arm64 \
+bash -c "${COMPILE_COMMAND}"
+
 echo "Common layer build complete: ${BUILD_DIR}"
 
 # ビルド成果物の内容を表示
@@ -0,0 +1,28 @@
+"""
+静的リソースのテンプレートを、util.static_resource_utilのModuleLoaderで読み込める形式にプリコンパイルする。
+テンプレートの実行時と同じバージョンのjinja2で実行すること(build.shからレイヤーのパッケージを使って実行される)。
+
+Usage:
+    python compile_templates.py {static resource dir} {output dir}
+"""
+import compileall
+import sys
+
+from jinja2 import Environment, FileSystemLoader, PrefixLoader
+
+# util.static_resource_utilのテンプレート名のプレフィックスと一致させること
+_STATIC_TEMPLATE_PREFIX = "static"
+
+
+def main(static_dir: str, output_dir: str) -> int:
+    environment = Environment(loader=PrefixLoader({_STATIC_TEMPLATE_PREFIX: FileSystemLoader(static_dir)}))
+    environment.compile_templates(output_dir, extensions=["html"], zip=None, log_function=print, ignore_errors=False)
+    # 生成されたPythonモジュールをバイトコードにコンパイルしておく
+    return 0 if compileall.compile_dir(output_dir, quiet=1) else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__, file=sys.stderr)
+        sys.exit(1)
+    sys.exit(main(sys.argv[1], sys.argv[2]))
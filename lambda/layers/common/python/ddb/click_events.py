@@ -0,0 +1,311 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, asdict, field
+from datetime import date, datetime, timedelta
+from typing import Optional
+from urllib.parse import urlsplit
+
+from util.assert_util import assert_positive
+from util.date_util import JST_TIMEZONE
+from util.environment_util import get_env_var
+from util.lifecycle_util import is_draining
+from util.logger_util import setup_logger
+from util.request_util import DelibirdRequest
+
+logger = setup_logger("delibird.click_events", logging.INFO)
+
+# 書き込み先 ("dynamodb": イベントテーブル, "file": ローカルのファイル(JSON Lines), "none": 記録しない)
+_SINK = str(get_env_var("CLICK_EVENT_SINK", "dynamodb"))
+_FILE_PATH = str(get_env_var("CLICK_EVENT_FILE", "/tmp/delibird-click-events.jsonl"))
+_RETENTION_DAYS = assert_positive(int(get_env_var("CLICK_EVENT_RETENTION_DAYS", 90)), "CLICK_EVENT_RETENTION_DAYS")
+# 書き込みに失敗し続けた場合に、コンテナ内に保持するイベントの上限 (超えた分は古いものから破棄する)
+_MAX_BUFFERED_EVENTS = assert_positive(int(get_env_var("CLICK_EVENT_MAX_BUFFERED", 10000)), "CLICK_EVENT_MAX_BUFFERED")
+# リンク・日ごとの集計(ClickRollupSink)を更新するか
+_ROLLUP_ENABLED = bool(get_env_var("CLICK_ROLLUP_ENABLED", True))
+_ROLLUP_RETENTION_DAYS = assert_positive(int(get_env_var("CLICK_ROLLUP_RETENTION_DAYS", 400)), "CLICK_ROLLUP_RETENTION_DAYS")
+# 集計をコンテナ内で保持し、集計テーブルへ加算する間隔と、間隔を待たずに加算するイベント数
+_ROLLUP_FLUSH_INTERVAL_SECONDS = float(get_env_var("CLICK_ROLLUP_FLUSH_INTERVAL_SECONDS", 60))
+_ROLLUP_FLUSH_EVENTS = assert_positive(int(get_env_var("CLICK_ROLLUP_FLUSH_EVENTS", 1000)), "CLICK_ROLLUP_FLUSH_EVENTS")
+# BatchWriteItemの1リクエストあたりの上限
+_BATCH_SIZE = 25
+# 集計・ファイルへの書き込みで、1回にまとめて処理するイベントの最大数
+_ROLLUP_BATCH_SIZE = 1000
+
+_MAX_QUERY_KEYS = 20
+_MAX_QUERY_KEY_LENGTH = 64
+_MAX_REFERRER_LENGTH = 253
+
+_BOT_MARKERS = ("bot", "crawl", "spider", "slurp", "preview", "facebookexternalhit", "curl", "wget", "python-", "go-http-client", "okhttp")
+_TABLET_MARKERS = ("ipad", "tablet", "kindle", "silk")
+_MOBILE_MARKERS = ("mobi", "iphone", "ipod", "android", "windows phone")
+
+
+# 同じUser-Agentが繰り返し送られるため、分類の結果をキャッシュする
+@functools.lru_cache(maxsize=1024)
+def classify_user_agent(user_agent: Optional[str]) -> str:
+    """User-Agentを集計用の分類 (bot / tablet / mobile / desktop / unknown) に変換する"""
+    if not user_agent:
+        return "unknown"
+    user_agent = user_agent.lower()
+    if any(marker in user_agent for marker in _BOT_MARKERS):
+        return "bot"
+    # Androidのタブレットは"Mobile"を含まない
+    if any(marker in user_agent for marker in _TABLET_MARKERS) or (("android" in user_agent) and ("mobile" not in user_agent)):
+        return "tablet"
+    if any(marker in user_agent for marker in _MOBILE_MARKERS):
+        return "mobile"
+    return "desktop"
+
+
+def referrer_host(referer: Optional[str]) -> Optional[str]:
+    """Refererヘッダーからホスト名のみを取り出す (パスやクエリは個人情報を含みうるため記録しない)"""
+    if not referer:
+        return None
+    try:
+        host = urlsplit(referer).hostname
+    except ValueError:
+        return None
+    return host[:_MAX_REFERRER_LENGTH] if host else None
+
+
+@dataclass(frozen=True, slots=True)
+class ClickEvent:
+    event_id: str
+    # UNIX時間(ミリ秒)
+    clicked_at: int
+    domain: str
+    slug: str
+    status: int
+    referrer: Optional[str]
+    user_agent_class: str
+    query_keys: tuple[str, ...]
+
+    @classmethod
+    def from_request(cls, request: DelibirdRequest, domain: str, slug: str, status: int) -> "ClickEvent":
+        return cls(
+            event_id=os.urandom(6).hex(),
+            clicked_at=time.time_ns() // 1_000_000,
+            domain=domain,
+            slug=slug,
+            status=status,
+            referrer=referrer_host(request.headers.get("Referer")),
+            user_agent_class=classify_user_agent(request.headers.get("User-Agent")),
+            # クエリはキーのみを記録する
+            query_keys=tuple(key[:_MAX_QUERY_KEY_LENGTH] for key in sorted(request.resolved_query_string_parameters)[:_MAX_QUERY_KEYS]),
+        )
+
+
+class ClickEventSinkError(Exception):
+    """ClickEventSinkへの書き込みが一部失敗した場合に、書き込めなかったイベントを保持する"""
+
+    def __init__(self, message: str, unwritten: list[ClickEvent]):
+        super().__init__(message)
+        self.unwritten = unwritten
+
+
+class ClickEventSink(ABC):
+    # 1回のwrite()に渡すイベントの最大数
+    batch_size: int = _BATCH_SIZE
+
+    @abstractmethod
+    def write(self, events: list[ClickEvent]) -> None:
+        """
+        eventsを書き込む。失敗した場合は例外を送出する(イベントはバッファへ戻され、次回の書き込みで再送される)。
+        一部のイベントのみ書き込めた場合は、書き込めなかったイベントを持つClickEventSinkErrorを送出する。
+        """
+        pass
+
+    def flush(self, force: bool) -> None:
+        """
+        write()で受け付けた内容をコンテナ内で保持する書き込み先が、保持している内容を書き込む(書き込む時期は書き込み先が判断する)。
+        forceの場合(プロセスの終了前)は全て書き込む。失敗した場合は例外を送出せず、保持したまま次回に再送する。
+        """
+        pass
+
+
+class DynamoDBClickEventSink(ClickEventSink):
+    def write(self, events: list[ClickEvent]) -> None:
+        from ddb.models.delibird_click_event import DelibirdClickEventTableModel
+
+        model = DelibirdClickEventTableModel
+        # 未処理のアイテム(UnprocessedItems)はpynamodbが再送する
+        with model.batch_write() as batch:
+            for event in events:
+                batch.save(model(
+                    model.build_link_key(event.domain, event.slug),
+                    model.build_event_key(event.clicked_at, event.event_id),
+                    expired_timestamp=event.clicked_at // 1000 + _RETENTION_DAYS * 86400,
+                    domain=event.domain, slug=event.slug, clicked_at=event.clicked_at, status=event.status,
+                    referrer=event.referrer, user_agent_class=event.user_agent_class,
+                    query_keys=list(event.query_keys) or None,
+                ))
+
+
+class FileClickEventSink(ClickEventSink):
+    """ローカルでの動作確認用に、イベントをJSON Linesとしてファイルへ追記する"""
+    batch_size = _ROLLUP_BATCH_SIZE
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def write(self, events: list[ClickEvent]) -> None:
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(asdict(event), ensure_ascii=False) + "\n" for event in events))
+
+
+@dataclass
+class _RollupDelta:
+    """コンテナ内で集計した、1つのリンク・日のまだ書き込んでいないクリック"""
+    hourly_clicks: Counter = field(default_factory=Counter)
+    status_clicks: Counter = field(default_factory=Counter)
+    referrers: set[str] = field(default_factory=set)
+
+    def merge(self, other: "_RollupDelta") -> None:
+        self.hourly_clicks.update(other.hourly_clicks)
+        self.status_clicks.update(other.status_clicks)
+        self.referrers |= other.referrers
+
+
+class ClickRollupSink(ClickEventSink):
+    """
+    イベントをリンク・日(JST)ごとにコンテナ内で集計し、CLICK_ROLLUP_FLUSH_INTERVAL_SECONDSごと、
+    または集計したイベントがCLICK_ROLLUP_FLUSH_EVENTSに達した時に、集計テーブルへ(リンク・日ごとに1回のUpdateItemで)加算する。
+    人気のリンクでも、日のアイテムへの書き込みはコンテナごとに間隔あたり1回になる。
+    集計した分はwrite()の時点で受け付け済みとし、加算に失敗した分はコンテナ内に残して次回に再送する(二重に計上しない)。
+    """
+    batch_size = _ROLLUP_BATCH_SIZE
+
+    def __init__(self, flush_interval_seconds: float, flush_events: int):
+        self._flush_interval_seconds = flush_interval_seconds
+        self._flush_events = flush_events
+        self._deltas: dict[tuple[str, str, date], _RollupDelta] = {}
+        self._pending_events = 0
+        self._written_at = time.monotonic()
+        # 参照元が上限に達したリンク・日 (以降は参照元を送らず、上限の確認のための条件付き更新の失敗を避ける)
+        self._referrers_capped: set[tuple[str, str, date]] = set()
+
+    def write(self, events: list[ClickEvent]) -> None:
+        for event in events:
+            clicked_at = _clicked_at_jst(event)
+            delta = self._deltas.setdefault((event.domain, event.slug, clicked_at.date()), _RollupDelta())
+            delta.hourly_clicks[clicked_at.hour] += 1
+            delta.status_clicks[event.status] += 1
+            if event.referrer:
+                delta.referrers.add(event.referrer)
+        self._pending_events += len(events)
+
+    def flush(self, force: bool) -> None:
+        if not self._deltas:
+            return
+        if (not force) and (self._pending_events < self._flush_events) and (time.monotonic() - self._written_at < self._flush_interval_seconds):
+            return
+        from ddb.models.delibird_click_rollup import DelibirdClickRollupTableModel
+
+        deltas, self._deltas = self._deltas, {}
+        self._pending_events = 0
+        self._written_at = time.monotonic()
+        failed = 0
+        for key, delta in deltas.items():
+            domain, slug, day = key
+            expired_timestamp = int(datetime.combine(day, datetime.min.time(), JST_TIMEZONE).timestamp()) + _ROLLUP_RETENTION_DAYS * 86400
+            referrers = delta.referrers if key not in self._referrers_capped else set()
+            try:
+                if DelibirdClickRollupTableModel.add_clicks(domain, slug, day, dict(delta.hourly_clicks), dict(delta.status_clicks),
+                                                            referrers, expired_timestamp):
+                    self._referrers_capped.add(key)
+            except Exception:
+                logger.exception("Failed to roll up clicks for domain: %s, slug: %s, day: %s", domain, slug, day)
+                self._deltas.setdefault(key, _RollupDelta()).merge(delta)
+                failed += sum(delta.hourly_clicks.values())
+        self._pending_events += failed
+        # 前日より前の日には加算されないため、上限の記録を破棄する
+        yesterday = datetime.now(JST_TIMEZONE).date() - timedelta(days=1)
+        self._referrers_capped = {key for key in self._referrers_capped if key[2] >= yesterday}
+
+
+def _clicked_at_jst(event: ClickEvent) -> datetime:
+    return datetime.fromtimestamp(event.clicked_at / 1000, JST_TIMEZONE)
+
+
+class ClickEventRecorder:
+    """
+    クリックイベントをコンテナ内のバッファへ追加し、flush()でまとめて書き込む。
+    record()はI/Oを行わないため、リダイレクトのレイテンシに影響しない。
+    flush()はutil.lifecycle_util.after_invocationで、呼び出しの完了後(コンテナの凍結前)に呼び出すこと。
+    書き込み先(sink)ごとにバッファを持ち、失敗した書き込み先の分のみを再送する。
+    """
+
+    def __init__(self, sinks: list[ClickEventSink], max_buffered: int = _MAX_BUFFERED_EVENTS):
+        self._sinks = sinks
+        self._pending: list[deque[ClickEvent]] = [deque(maxlen=max_buffered) for _ in sinks]
+        self._dropped = [0] * len(sinks)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def record(self, request: DelibirdRequest, domain: str, slug: str, status: int) -> None:
+        """レスポンスのクリックイベントをバッファへ追加する。イベントの記録の失敗でリクエストを失敗させないため、例外は送出しない"""
+        if not self._sinks:
+            return
+        try:
+            event = ClickEvent.from_request(request, domain, slug, status)
+        except Exception:
+            logger.exception("Failed to build click event.")
+            return
+        with self._lock:
+            for index, pending in enumerate(self._pending):
+                if len(pending) == pending.maxlen:
+                    self._dropped[index] += 1
+                pending.append(event)
+
+    def flush(self) -> bool:
+        """バッファされているイベントを書き込み先ごとにバッチで書き込む。全て書き込めた場合はTrueを返す"""
+        with self._flush_lock:
+            return all([self._flush_sink(index) for index in range(len(self._sinks))])
+
+    def _flush_sink(self, index: int) -> bool:
+        sink = self._sinks[index]
+        with self._lock:
+            events, self._pending[index] = list(self._pending[index]), deque(maxlen=self._pending[index].maxlen)
+            dropped, self._dropped[index] = self._dropped[index], 0
+        if dropped:
+            logger.warning("Dropped %d click events for %s because the buffer was full.", dropped, type(sink).__name__)
+
+        for start in range(0, len(events), sink.batch_size):
+            end = start + sink.batch_size
+            try:
+                sink.write(events[start:end])
+            except Exception as e:
+                unwritten = e.unwritten if isinstance(e, ClickEventSinkError) else events[start:end]
+                logger.exception("Failed to write %d click events to %s.", len(unwritten) + len(events[end:]), type(sink).__name__)
+                # 未書き込みの分はバッファの先頭に戻し、次回のflushで再送する (上限を超えた場合は古いものから破棄される)
+                with self._lock:
+                    pending = self._pending[index]
+                    self._pending[index] = deque([*unwritten, *events[end:], *pending], maxlen=pending.maxlen)
+                return False
+        sink.flush(force=is_draining())
+        return True
+
+
+def _build_sinks() -> list[ClickEventSink]:
+    sinks: list[ClickEventSink] = []
+    match _SINK:
+        case "dynamodb":
+            sinks.append(DynamoDBClickEventSink())
+        case "file":
+            sinks.append(FileClickEventSink(_FILE_PATH))
+        case "none":
+            pass
+        case _:
+            raise ValueError(f"Invalid CLICK_EVENT_SINK: {_SINK}")
+    if _ROLLUP_ENABLED:
+        sinks.append(ClickRollupSink(_ROLLUP_FLUSH_INTERVAL_SECONDS, _ROLLUP_FLUSH_EVENTS))
+    return sinks
+
+
+click_event_recorder = ClickEventRecorder(_build_sinks())
@@ -0,0 +1,115 @@
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Type
+
+from pynamodb.connection import Connection
+from pynamodb.models import Model
+
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+_CONNECT_TIMEOUT_SECONDS = float(get_env_var("DDB_CONNECT_TIMEOUT_SECONDS", 2))
+_READ_TIMEOUT_SECONDS = float(get_env_var("DDB_READ_TIMEOUT_SECONDS", 3))
+_MAX_RETRY_ATTEMPTS = int(get_env_var("DDB_MAX_RETRY_ATTEMPTS", 3))
+_MAX_POOL_CONNECTIONS = int(get_env_var("DDB_MAX_POOL_CONNECTIONS", 10))
+_TCP_KEEPALIVE = bool(get_env_var("DDB_TCP_KEEPALIVE", True))
+_PREWARM_ENABLED = bool(get_env_var("DDB_PREWARM_CONNECTION", True))
+
+# 事前接続で読み込むキー (存在しないアイテムを読み込み、接続だけを確立する)
+_PREWARM_KEY = "__delibird_prewarm__"
+
+logger = setup_logger("delibird.ddb_connection", logging.INFO)
+
+# pynamodbはKeep-Aliveの設定を受け取らないため、botocoreの設定(環境変数)で指定する (クライアントの生成時に参照される)
+os.environ.setdefault("BOTOCORE_TCP_KEEPALIVE", "true" if _TCP_KEEPALIVE else "false")
+
+
+class DelibirdTableMeta:
+    """各テーブルモデルのMetaの基底クラス。接続設定(タイムアウト・リトライ・プールサイズ)を共通化する"""
+    region = os.environ["AWS_REGION"]
+    connect_timeout_seconds = _CONNECT_TIMEOUT_SECONDS
+    read_timeout_seconds = _READ_TIMEOUT_SECONDS
+    max_retry_attempts = _MAX_RETRY_ATTEMPTS
+    max_pool_connections = _MAX_POOL_CONNECTIONS
+
+
+@functools.cache
+def transaction_connection() -> Connection:
+    """トランザクション(TransactWrite)用の接続。各テーブルモデルと同じ接続設定を使用する"""
+    return Connection(region=DelibirdTableMeta.region,
+                      connect_timeout_seconds=DelibirdTableMeta.connect_timeout_seconds,
+                      read_timeout_seconds=DelibirdTableMeta.read_timeout_seconds,
+                      max_retry_attempts=DelibirdTableMeta.max_retry_attempts,
+                      max_pool_connections=DelibirdTableMeta.max_pool_connections)
+
+
+def _prewarm_connection(model: Type[Model]) -> None:
+    table_connection = model._get_connection()
+    # 認証情報の解決・エンドポイントの解決・TLSハンドシェイクを、存在しないキーの読み込みで済ませておく
+    table_connection.get_item(_PREWARM_KEY, range_key=_PREWARM_KEY if model._range_keyname else None,
+                              attributes_to_get=[model._hash_keyname])
+
+
+def prewarm_connections(*models: Type[Model]) -> None:
+    """Lambdaの初期化フェーズで、各テーブルへのプール済みの接続を確立する。失敗してもリクエスト時に再接続されるため例外は送出しない"""
+    if not _PREWARM_ENABLED:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(models) or 1) as executor:
+        futures = {model.Meta.table_name: executor.submit(_prewarm_connection, model) for model in models}
+    for table_name, future in futures.items():
+        if (e := future.exception()) is not None:
+            logger.warning(f"Failed to prewarm connection to {table_name}.", exc_info=e)
+
+
+def on_dynamodb_call(callback: Callable[..., None], *models: Type[Model]) -> None:
+    """各テーブルへのAPI呼び出しの直前にcallbackを呼び出す (callbackはNoneを返すこと)。クライアントが再生成された場合は呼び出されない"""
+    for model in models:
+        model._get_connection().connection.client.meta.events.register("before-call.dynamodb", callback)
+
+
+def _connection_pool_stats(models: Iterable[Type[Model]]) -> tuple[int, int]:
+    """各テーブルのコネクションプールで、これまでに確立した接続数と送信したリクエスト数を返す"""
+    connections, requests = 0, 0
+    for model in models:
+        client = model._get_connection().connection._client
+        if client is None:
+            continue
+        pools = client._endpoint.http_session._manager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests += pool.num_requests
+    return connections, requests
+
+
+def probe_connections(*models: Type[Model]) -> Callable:
+    """Lambdaハンドラーの呼び出しごとに、DynamoDBへのリクエストが確立済みの(ウォームな)接続を再利用したかをログに出力するデコレーター"""
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                connections_before, requests_before = _connection_pool_stats(models)
+            except Exception:
+                logger.debug("Failed to read connection pool stats.", exc_info=True)
+                return handler(event, context)
+            try:
+                return handler(event, context)
+            finally:
+                try:
+                    connections_after, requests_after = _connection_pool_stats(models)
+                    new_connections = connections_after - connections_before
+                    requests = requests_after - requests_before
+                    if requests:
+                        logger.info("DynamoDB connection probe: requests=%d, new_connections=%d, reused_warm_connection=%s",
+                                    requests, new_connections, new_connections == 0)
+                except Exception:
+                    logger.debug("Failed to read connection pool stats.", exc_info=True)
+
+        return wrapper
+
+    return decorator
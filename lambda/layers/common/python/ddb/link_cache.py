@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Collection, Optional
+
+from ddb.models.delibird_link import DelibirdLink
+from store.link_snapshot import link_snapshots, refresh_link_snapshot
+from store.link_store import get_link_store
+from util.cdn_purge_util import purge_links
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+logger = setup_logger("delibird.link_cache", logging.INFO)
+
+_MAX_SIZE = int(get_env_var("LINK_CACHE_MAX_SIZE", 1024))
+_TTL_SECONDS = float(get_env_var("LINK_CACHE_TTL_SECONDS", 60))
+_NEGATIVE_TTL_SECONDS = float(get_env_var("LINK_CACHE_NEGATIVE_TTL_SECONDS", 10))
+_VERSION_CHECK_INTERVAL_SECONDS = float(get_env_var("LINK_CACHE_VERSION_CHECK_INTERVAL_SECONDS", 5))
+
+
+@dataclass
+class _LinkCacheEntry:
+    link: Optional[DelibirdLink]  # Noneの場合は存在しないリンク(ネガティブキャッシュ)
+    domain_version: int
+    expires_at: float
+
+
+@dataclass
+class _DomainVersion:
+    version: int
+    checked_at: float
+
+
+class DelibirdLinkCache:
+    """ウォームコンテナ間で(domain, slug)ごとのDelibirdLinkを保持するLRUキャッシュ"""
+
+    def __init__(self, max_size: int, ttl_seconds: float, negative_ttl_seconds: float, version_check_interval_seconds: float):
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._negative_ttl_seconds = negative_ttl_seconds
+        self._version_check_interval_seconds = version_check_interval_seconds
+
+        self._entries: OrderedDict[tuple[str, str], _LinkCacheEntry] = OrderedDict()
+        self._domain_versions: dict[str, _DomainVersion] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return (self._max_size > 0) and (self._ttl_seconds > 0)
+
+    def _get_domain_version(self, domain: str, now: float) -> int:
+        current = self._domain_versions.get(domain)
+        if (current is not None) and (now - current.checked_at < self._version_check_interval_seconds):
+            return current.version
+
+        version = get_link_store().get_cache_version(domain)
+        if (current is not None) and (current.version != version):
+            logger.info("Cache version of domain: %s changed (%s -> %s).", domain, current.version, version)
+        self._domain_versions[domain] = _DomainVersion(version=version, checked_at=now)
+        return version
+
+    def get(self, domain: str, slug: str) -> Optional[DelibirdLink]:
+        """キャッシュからリンクを取得し、存在しない・期限切れ・バージョン不一致の場合はスナップショットかDBから取得する"""
+        if not self.enabled:
+            return get_link_store().get_link(domain, slug)
+
+        key = (domain, slug)
+        now = time.monotonic()
+        try:
+            domain_version = self._get_domain_version(domain, now)
+        except Exception:
+            # バージョンが確認できない場合はキャッシュを信用せずにDBから取得する
+            logger.exception(f"Failed to fetch cache version for domain: {domain}, bypass link cache.")
+            return get_link_store().get_link(domain, slug)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None) and (entry.expires_at > now) and (entry.domain_version == domain_version):
+                self._entries.move_to_end(key)
+                return entry.link
+
+        link = self._get_uncached(domain, slug, domain_version)
+        ttl = self._ttl_seconds if link is not None else self._negative_ttl_seconds
+        if ttl > 0:
+            self._put(key, _LinkCacheEntry(link=link, domain_version=domain_version, expires_at=now + ttl))
+        return link
+
+    @staticmethod
+    def _get_uncached(domain: str, slug: str, domain_version: int) -> Optional[DelibirdLink]:
+        # 現在の版数のスナップショットにあるリンクはDBから読み込まない (ないリンクは対象外か、スナップショットの後に作成されたリンク)
+        if link_snapshots.enabled and ((link := link_snapshots.get(domain, slug, domain_version)) is not None):
+            return link
+        return get_link_store().get_link(domain, slug)
+
+    def _put(self, key: tuple[str, str], entry: _LinkCacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, domain: str, slug: Optional[str] = None) -> None:
+        """このコンテナ内のキャッシュを破棄する(slug未指定の場合はドメイン全体)"""
+        with self._lock:
+            if slug is not None:
+                self._entries.pop((domain, slug), None)
+                return
+            for key in [k for k in self._entries if k[0] == domain]:
+                del self._entries[key]
+            self._domain_versions.pop(domain, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._domain_versions.clear()
+
+
+link_cache = DelibirdLinkCache(
+    max_size=_MAX_SIZE,
+    ttl_seconds=_TTL_SECONDS,
+    negative_ttl_seconds=_NEGATIVE_TTL_SECONDS,
+    version_check_interval_seconds=_VERSION_CHECK_INTERVAL_SECONDS
+)
+
+
+def notify_link_changed(domain: str, purge_slugs: Collection[str] = ()) -> None:
+    """
+    リンクの作成・更新時に呼び出し、全コンテナのキャッシュをドメイン単位で無効化する。
+    purge_slugsのリンクは、共有キャッシュ(CDN)に保存されたリダイレクトもパージする (作成したリンクは保存されていないため不要)。
+    更新後の版数のスナップショットは、直前の版数のスナップショットのpurge_slugsのリンクを読み込み直して再構築する。
+    """
+    link_cache.invalidate(domain)
+    try:
+        version = get_link_store().bump_cache_version(domain)
+    except Exception:
+        # 書き込み自体は完了しているため、キャッシュはTTLで失効するのを待つ
+        logger.exception(f"Failed to bump cache version for domain: {domain}")
+        version = None
+    purge_links(domain, purge_slugs)
+    if version is not None:
+        refresh_link_snapshot(domain, version, purge_slugs)
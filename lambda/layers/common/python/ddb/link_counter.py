@@ -0,0 +1,70 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+
+from store.link_store import get_link_store
+from util.logger_util import setup_logger
+
+logger = setup_logger("delibird.link_counter", logging.INFO)
+
+
+class LinkUsesCounter:
+    """
+    最大使用回数のないリンクの使用回数を、コンテナ内でバッファしてから保存先(DynamoDBではシャード)へ非同期に書き込む。
+    add()はバッファへの加算のみを行い、書き込みはflush()で行う
+    (util.lifecycle_util.after_invocationで、呼び出しの完了後・コンテナの凍結前に呼び出すこと)。
+    書き込み中に発生した加算は次の書き込みでまとめて反映されるため、負荷が高いほどバッチ化される。
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._future: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="delibird-link-counter")
+
+    def add(self, domain: str, slug: str, count: int = 1) -> None:
+        key = (domain, slug)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + count
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._scheduled = False
+                    return
+                pending, self._pending = self._pending, {}
+
+            failed: dict[tuple[str, str], int] = {}
+            store = get_link_store()
+            for (domain, slug), count in pending.items():
+                try:
+                    store.add_uses(domain, slug, count)
+                except Exception:
+                    logger.exception(f"Failed to flush uses counter for domain: {domain}, slug: {slug}, count: {count}")
+                    failed[(domain, slug)] = count
+
+            if failed:
+                # 失敗分はバッファに戻し、次回のflushで再送する
+                with self._lock:
+                    for key, count in failed.items():
+                        self._pending[key] = self._pending.get(key, 0) + count
+                    self._scheduled = False
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """バッファされている使用回数を書き込み、完了を待つ。全て書き込めた場合はTrueを返す"""
+        with self._lock:
+            if self._pending and not self._scheduled:
+                self._scheduled = True
+                self._future = self._executor.submit(self._drain)
+            future = self._future
+        if future is not None:
+            future.result(timeout=timeout)
+        with self._lock:
+            return not self._pending
+
+
+link_uses_counter = LinkUsesCounter()
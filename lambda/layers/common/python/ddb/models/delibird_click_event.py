@@ -0,0 +1,37 @@
+import os
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, ListAttribute
+from pynamodb.models import Model
+
+from ddb.connection import DelibirdTableMeta
+
+_KEY_SEPARATOR = "#"
+
+
+class DelibirdClickEventTableModel(Model):
+    """リンクへのアクセス(クリック)ごとのイベントを保持するテーブル。expired_timestampを過ぎたイベントはTTLで削除される"""
+
+    class Meta(DelibirdTableMeta):
+        table_name = os.environ["CLICK_EVENT_TABLE_NAME"]
+
+    # {domain}#{slug} (ドメイン単位だと1つのパーティションにアクセスが集中するため、リンク単位で分散する)
+    link_key = UnicodeAttribute(hash_key=True)
+    # {clicked_at(ミリ秒・13桁)}#{event_id}
+    event_key = UnicodeAttribute(range_key=True)
+    expired_timestamp = NumberAttribute(null=False)
+
+    domain = UnicodeAttribute(null=False)
+    slug = UnicodeAttribute(null=False)
+    clicked_at = NumberAttribute(null=False)
+    status = NumberAttribute(null=False)
+    referrer = UnicodeAttribute(null=True)
+    user_agent_class = UnicodeAttribute(null=False)
+    query_keys = ListAttribute(of=UnicodeAttribute, null=True)
+
+    @staticmethod
+    def build_link_key(domain: str, slug: str) -> str:
+        return f"{domain}{_KEY_SEPARATOR}{slug}"
+
+    @staticmethod
+    def build_event_key(clicked_at: int, event_id: str) -> str:
+        return f"{clicked_at:013d}{_KEY_SEPARATOR}{event_id}"
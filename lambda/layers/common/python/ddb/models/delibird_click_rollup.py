@@ -0,0 +1,140 @@
+import os
+from datetime import date
+
+from pynamodb.attributes import Attribute, UnicodeAttribute, NumberAttribute, ListAttribute, MapAttribute, UnicodeSetAttribute
+from pynamodb.exceptions import UpdateError
+from pynamodb.expressions.condition import size
+from pynamodb.models import Model
+
+from ddb.connection import DelibirdTableMeta
+
+HOURS_PER_DAY = 24
+# 1日に記録する参照元の上限 (アイテムサイズの上限を超えないようにする)
+MAX_REFERRERS_PER_DAY = 1000
+# ステータスコードごとに属性を持つステータスコード (リダイレクト・認証ページ・エラーのレスポンス。それ以外はother_status_clicksに加算する)
+ROLLUP_STATUSES = (301, 302, 303, 307, 308, 400, 401, 404, 500)
+OTHER_STATUS = "other"
+_KEY_SEPARATOR = "#"
+
+
+class DelibirdClickRollupTableModel(Model):
+    """
+    リンクごと・日ごと(JST)のクリックの集計を保持するテーブル。
+    時間・ステータスコードごとのクリック数はアイテムの最上位の数値の属性として持ち、ADDのみの1回のUpdateItemで
+    アイテムの作成と加算を行う(存在しないリスト・マップの要素のパスは更新できないため)。
+    """
+
+    class Meta(DelibirdTableMeta):
+        table_name = os.environ["CLICK_ROLLUP_TABLE_NAME"]
+
+    # {domain}#{slug}
+    link_key = UnicodeAttribute(hash_key=True)
+    # YYYY-MM-DD (JST)
+    day = UnicodeAttribute(range_key=True)
+    expired_timestamp = NumberAttribute(null=False)
+
+    clicks = NumberAttribute(null=False, default=0)
+    # 時(JST)ごとのクリック数 (h00〜h23)
+    h00 = NumberAttribute(null=True)
+    h01 = NumberAttribute(null=True)
+    h02 = NumberAttribute(null=True)
+    h03 = NumberAttribute(null=True)
+    h04 = NumberAttribute(null=True)
+    h05 = NumberAttribute(null=True)
+    h06 = NumberAttribute(null=True)
+    h07 = NumberAttribute(null=True)
+    h08 = NumberAttribute(null=True)
+    h09 = NumberAttribute(null=True)
+    h10 = NumberAttribute(null=True)
+    h11 = NumberAttribute(null=True)
+    h12 = NumberAttribute(null=True)
+    h13 = NumberAttribute(null=True)
+    h14 = NumberAttribute(null=True)
+    h15 = NumberAttribute(null=True)
+    h16 = NumberAttribute(null=True)
+    h17 = NumberAttribute(null=True)
+    h18 = NumberAttribute(null=True)
+    h19 = NumberAttribute(null=True)
+    h20 = NumberAttribute(null=True)
+    h21 = NumberAttribute(null=True)
+    h22 = NumberAttribute(null=True)
+    h23 = NumberAttribute(null=True)
+    # ステータスコードごとのクリック数 (ROLLUP_STATUSES)
+    s301 = NumberAttribute(null=True)
+    s302 = NumberAttribute(null=True)
+    s303 = NumberAttribute(null=True)
+    s307 = NumberAttribute(null=True)
+    s308 = NumberAttribute(null=True)
+    s400 = NumberAttribute(null=True)
+    s401 = NumberAttribute(null=True)
+    s404 = NumberAttribute(null=True)
+    s500 = NumberAttribute(null=True)
+    other_status_clicks = NumberAttribute(null=True)
+    # 参照元のホスト名 (重複なし・MAX_REFERRERS_PER_DAYまで)
+    referrers = UnicodeSetAttribute(null=True)
+
+    # 移行前の集計 (時ごとのクリック数のリスト, ステータスコード(文字列)ごとのクリック数)。読み込み時のみ加算する
+    hourly_clicks = ListAttribute(of=NumberAttribute, null=True)
+    status_clicks = MapAttribute(null=True)
+
+    @staticmethod
+    def build_link_key(domain: str, slug: str) -> str:
+        return f"{domain}{_KEY_SEPARATOR}{slug}"
+
+    @classmethod
+    def _hour_attribute(cls, hour: int) -> Attribute:
+        return getattr(cls, f"h{hour:02d}")
+
+    @classmethod
+    def _status_attribute(cls, status: int) -> Attribute:
+        return getattr(cls, f"s{status}") if status in ROLLUP_STATUSES else cls.other_status_clicks
+
+    @classmethod
+    def add_clicks(cls, domain: str, slug: str, day: date, hourly_clicks: dict[int, int], status_clicks: dict[int, int],
+                   referrers: set[str], expired_timestamp: int) -> bool:
+        """
+        1日分のクリックの集計を1回のUpdateItemで加算する (日のアイテムがない場合は作成される)。
+        referrersは日の参照元が上限未満の場合のみ追加し、日の参照元が上限に達していることが分かった場合はTrueを返す。
+        """
+        actions = [cls.expired_timestamp.set(expired_timestamp), cls.clicks.add(sum(hourly_clicks.values()))]
+        actions += [cls._hour_attribute(hour).add(count) for hour, count in hourly_clicks.items()]
+        actions += [cls._status_attribute(status).add(count) for status, count in status_clicks.items()]
+        model = cls(cls.build_link_key(domain, slug), day.isoformat())
+        if not referrers:
+            model.update(actions=actions)
+            return False
+        try:
+            model.update(
+                actions=[*actions, cls.referrers.add(referrers)],
+                condition=(cls.referrers.does_not_exist()) | (size(cls.referrers) < MAX_REFERRERS_PER_DAY)
+            )
+        except UpdateError as e:
+            if e.cause_response_code != "ConditionalCheckFailedException":
+                raise e
+            # 他のコンテナの書き込みで参照元が上限に達していた場合のみ、参照元を追加せずにクリック数のみを加算する
+            model.update(actions=actions)
+            return True
+        # 更新後のアイテムが返されるため、上限に達したかを追加の読み込みなしで判定できる
+        return len(model.referrers or ()) >= MAX_REFERRERS_PER_DAY
+
+    def hourly_counts(self) -> list[int]:
+        counts = [int(getattr(self, f"h{hour:02d}") or 0) for hour in range(HOURS_PER_DAY)]
+        for hour, count in enumerate((self.hourly_clicks or [])[:HOURS_PER_DAY]):
+            counts[hour] += int(count)
+        return counts
+
+    def status_counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for status in ROLLUP_STATUSES:
+            if count := getattr(self, f"s{status}"):
+                counts[str(status)] = int(count)
+        if self.other_status_clicks:
+            counts[OTHER_STATUS] = int(self.other_status_clicks)
+        for status, count in (self.status_clicks.as_dict().items() if self.status_clicks is not None else ()):
+            counts[status] = counts.get(status, 0) + int(count)
+        return counts
+
+    @classmethod
+    def query_days(cls, domain: str, slug: str, since: date) -> list["DelibirdClickRollupTableModel"]:
+        """since以降の日の集計を、日付の昇順で1回のQueryで取得する"""
+        return list(cls.query(cls.build_link_key(domain, slug), cls.day >= since.isoformat()))
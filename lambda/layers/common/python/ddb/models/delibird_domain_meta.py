@@ -0,0 +1,49 @@
+import os
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute
+from pynamodb.expressions.update import Action
+from pynamodb.models import Model
+
+from ddb.connection import DelibirdTableMeta
+from ddb.datetime_attribute import DateTimeAttribute
+
+
+class DelibirdDomainMetaTableModel(Model):
+    class Meta(DelibirdTableMeta):
+        table_name = os.environ["DOMAIN_META_TABLE_NAME"]
+
+    domain = UnicodeAttribute(hash_key=True)
+    # リンクが作成・更新されるたびにインクリメントされるキャッシュ無効化用のバージョン
+    cache_version = NumberAttribute(null=False, default=0)
+    # ドメイン内のリンク数・無効化されたリンク数 (リンクの作成・更新と同じトランザクションで加算する)
+    link_count = NumberAttribute(null=True)
+    disabled_link_count = NumberAttribute(null=True)
+    # 有効期限切れのスイープで、この日時までに有効期限が過ぎたリンクを確認済み
+    expiry_swept_at = DateTimeAttribute(null=True)
+
+    @classmethod
+    def get_cache_version(cls, domain: str) -> int:
+        try:
+            return int(cls.get(domain).cache_version)
+        except cls.DoesNotExist:
+            return 0
+
+    @classmethod
+    def bump_cache_version(cls, domain: str) -> int:
+        model = cls(domain)
+        model.update(actions=[cls.cache_version.add(1)])
+        return int(model.cache_version)
+
+    @classmethod
+    def get_link_counts(cls, domain: str) -> tuple[int, int]:
+        """ドメイン内の(リンク数, 無効化されたリンク数)を返す"""
+        try:
+            model = cls.get(domain)
+        except cls.DoesNotExist:
+            return 0, 0
+        return int(model.link_count or 0), int(model.disabled_link_count or 0)
+
+    @classmethod
+    def link_count_actions(cls, links: int, disabled_links: int) -> list[Action]:
+        """リンク数・無効化されたリンク数を加算する更新のアクションを返す"""
+        return [cls.link_count.add(links), cls.disabled_link_count.add(disabled_links)]
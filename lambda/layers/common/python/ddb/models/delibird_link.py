@@ -4,27 +4,34 @@ import json
 import logging
 import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum, auto
 from http import HTTPStatus
-from typing import Optional
+from typing import Any, Iterator, Optional
 
-from pynamodb.attributes import UnicodeAttribute, NumberAttribute, BooleanAttribute, UnicodeSetAttribute
-from pynamodb.constants import NULL
-from pynamodb.exceptions import UpdateError
-from pynamodb.expressions.operand import Path
+from pynamodb.attributes import Attribute, UnicodeAttribute, NumberAttribute, BooleanAttribute, UnicodeSetAttribute
+from pynamodb.constants import ALL_OLD
+from pynamodb.exceptions import UpdateError, TransactWriteError
+from pynamodb.expressions.condition import Condition
+from pynamodb.expressions.update import Action
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
 from pynamodb.models import Model
+from pynamodb.transactions import TransactWrite
 
+from ddb.connection import DelibirdTableMeta, transaction_connection
 from ddb.datetime_attribute import DateTimeAttribute
+from ddb.link_counter import link_uses_counter
+from store.link_store import get_link_store
 from util.date_util import get_jst_datetime_now, as_jst
 from util.logger_util import setup_logger
 
-_REGION = os.environ["AWS_REGION"]
 _MAX_SLUG_LENGTH = 255
 _SLUG_PATTERN = re.compile(r'^[a-zA-Z0-9\-_]+(?:/[a-zA-Z0-9\-_]+)*$', re.ASCII)
 _MAX_PASSPHRASE_LENGTH = 255
 _PASSPHRASE_PATTERN = re.compile(r'^[A-Za-z0-9\-_/*+.!#$%&~@=^]+$', re.ASCII)
+# 1回のTransactWriteItemsに含められる項目数の上限
+MAX_TRANSACTION_ITEMS = 100
 
 logger = setup_logger("delibird.link_table", logging.INFO)
 
@@ -35,12 +42,43 @@ class DelibirdLinkInactiveStatus(Enum):
     MAX_USES_EXCEEDED = auto()
 
 
+class DelibirdLinkVersionMismatch(Exception):
+    """リンクが読み込んだ版数から更新されていた場合に送出する。current_versionは現在の版数 (不明な場合None)"""
+
+    def __init__(self, current_version: Optional[int]):
+        super().__init__(f"Link version mismatch, current version: {current_version}")
+        self.current_version = current_version
+
+
 @dataclass
 class DelibirdLinkInactiveReason:
     status: DelibirdLinkInactiveStatus
     reason: str
 
 
+def get_inactive_reason(disabled: bool, expiration_date: Optional[datetime], max_uses: Optional[int], uses: int,
+                        inactive_status: Optional[DelibirdLinkInactiveStatus] = None) -> Optional[DelibirdLinkInactiveReason]:
+    """
+    リンクが無効な場合はその理由を、有効な場合はNoneを返す。
+    inactive_statusは無効になったことが確定して記録された理由で、指定された場合は日時・使用回数を比較せずに返す。
+    """
+    if disabled:
+        return DelibirdLinkInactiveReason(
+            status=DelibirdLinkInactiveStatus.DISABLED, reason="Link is disabled.")
+    if inactive_status is DelibirdLinkInactiveStatus.EXPIRED:
+        return DelibirdLinkInactiveReason(status=inactive_status, reason=f"Link is expired at {expiration_date}.")
+    if inactive_status is DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED:
+        return DelibirdLinkInactiveReason(status=inactive_status, reason=f"Link has exceeded max uses: {max_uses}.")
+    if (expiration_date is not None) and (expiration_date < get_jst_datetime_now()):
+        return DelibirdLinkInactiveReason(
+            status=DelibirdLinkInactiveStatus.EXPIRED, reason=f"Link is expired at {expiration_date}.")
+    if (max_uses is not None) and (uses >= max_uses):
+        return DelibirdLinkInactiveReason(
+            status=DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED,
+            reason=f"Link has exceeded max uses: {max_uses}, current uses: {uses}.")
+    return None
+
+
 @dataclass
 class DelibirdLink:
     _model: "DelibirdLinkTableModel"
@@ -63,6 +101,15 @@ class DelibirdLink:
     query_whitelist: set[str] = None
 
     max_uses: Optional[int] = None
+    # 有効期限切れ・最大使用回数超過が確定して記録された理由 (Noneは未確定で、リクエスト時に判定する)
+    inactive_status: Optional[DelibirdLinkInactiveStatus] = None
+    # リダイレクトを共有キャッシュ(CDN)に保存させるか (is_shared_cacheableを満たす場合のみ有効)
+    cacheable: bool = False
+
+    # 条件なしで計上されている使用回数(条件付きインクリメントの上限計算に使用、Noneは未読み込み)
+    _unlimited_uses: Optional[int] = None
+    # リダイレクト先URLごとに構築済みのリダイレクト計画 (redirect_requestのredirect_planで使用)
+    _redirect_plans: dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
 
     @staticmethod
     def _validation(link: "DelibirdLink") -> None:
@@ -79,11 +126,16 @@ class DelibirdLink:
         if not link.status.is_redirection:
             raise ValueError(f"Status code {link.status} is not a redirection status.")
         # passphrase
-        if link._passphrase is not None:
-            if len(link._passphrase) == 0:
-                link._passphrase = None
-            elif (len(link._passphrase) > _MAX_PASSPHRASE_LENGTH) or (not _PASSPHRASE_PATTERN.fullmatch(link._passphrase)):
-                raise ValueError("Invalid passphrase.")
+        link._passphrase = DelibirdLink.normalize_passphrase(link._passphrase)
+
+    @staticmethod
+    def normalize_passphrase(passphrase: Optional[str]) -> Optional[str]:
+        """パスフレーズを検証し、空の場合はNoneを返す"""
+        if (passphrase is None) or (len(passphrase) == 0):
+            return None
+        if (len(passphrase) > _MAX_PASSPHRASE_LENGTH) or (not _PASSPHRASE_PATTERN.fullmatch(passphrase)):
+            raise ValueError("Invalid passphrase.")
+        return passphrase
 
     def __post_init__(self):
         if self.query_whitelist is None:
@@ -93,37 +145,76 @@ class DelibirdLink:
         DelibirdLink._validation(self)
 
     def check_active(self) -> tuple[bool, Optional[DelibirdLinkInactiveReason]]:
-        if self.disabled:
-            return False, DelibirdLinkInactiveReason(
-                status=DelibirdLinkInactiveStatus.DISABLED, reason="Link is disabled.")
-        if (self.expiration_date is not None) and (self.expiration_date < get_jst_datetime_now()):
-            return False, DelibirdLinkInactiveReason(
-                status=DelibirdLinkInactiveStatus.EXPIRED, reason=f"Link is expired at {self.expiration_date}.")
-        if (self.max_uses is not None) and (self.uses >= self.max_uses):
-            return False, DelibirdLinkInactiveReason(
-                status=DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED,
-                reason=f"Link has exceeded max uses: {self.max_uses}, current uses: {self.uses}.")
-        return True, None
+        reason = get_inactive_reason(self.disabled, self.expiration_date, self.max_uses, self.uses, self.inactive_status)
+        return reason is None, reason
+
+    def load_uses(self, consistent_read: bool = True) -> None:
+        """保存先から使用回数を読み込む(最大使用回数のあるリンクのみリダイレクト時に必要)"""
+        # 移行でアイテムからカウンターへ移された使用回数を二重に数えないよう、アイテムをカウンターより先に読み込む
+        legacy_uses = self._load_legacy_uses()
+        unlimited_uses, limited_uses = get_link_store().load_uses(self.domain, self.link_slug, consistent_read=consistent_read)
+        self._unlimited_uses = legacy_uses + unlimited_uses
+        self.uses = self._unlimited_uses + limited_uses
+
+    def _load_legacy_uses(self) -> int:
+        """
+        移行前のリンクがリンクアイテム自体に保持している使用回数を返す。
+        キャッシュされたアイテムの値は既にカウンターへ移行されている場合があるため、値がある場合はアイテムを読み込み直す
+        (移行後のアイテムには値がないため、読み込み直すのは移行前のリンクのみ)。
+        """
+        if (self._model is None) or (self._model.uses is None):
+            return 0
+        link = get_link_store().get_link(self.domain, self.link_slug, consistent_read=True)
+        self._model.uses = link._model.uses if (link is not None) and (link._model is not None) else None
+        return int(self._model.uses) if self._model.uses is not None else 0
 
     def increment_uses(self) -> bool:
         """リンクの使用回数をインクリメントする"""
-        try:
-            self._model.update(
-                actions=[DelibirdLinkTableModel.uses.add(1)],
-                condition=(DelibirdLinkTableModel.max_uses.does_not_exist()) |
-                          (Path(DelibirdLinkTableModel.max_uses).is_type(NULL)) |
-                          (DelibirdLinkTableModel.uses < DelibirdLinkTableModel.max_uses)
-            )
-        except UpdateError as e:
-            if e.cause_response_code == "ConditionalCheckFailedException":
-                return False
-            raise e
-        self.uses += 1
+        if self.max_uses is None:
+            # 最大使用回数がない場合は条件チェックが不要なため、シャードへ非同期に書き込む
+            link_uses_counter.add(self.domain, self.link_slug)
+            self.uses += 1
+            return True
+
+        if self._unlimited_uses is None:
+            # 条件なしの使用回数は初回のみ読み込み、キャッシュされたリンクでは再利用する
+            self.load_uses()
+        # 上限チェックとインクリメントを1回の条件付き更新で行う
+        limited_uses = get_link_store().increment_uses(self.domain, self.link_slug, limit=self.max_uses - self._unlimited_uses)
+        if limited_uses is None:
+            # 条件を満たさなかった場合のみ、最新の使用回数を読み込んで原因を確定する
+            self.load_uses()
+            if self.uses < self.max_uses:
+                # 競合により失敗しただけの場合は、最新の値で1度だけ再試行する
+                limited_uses = get_link_store().increment_uses(self.domain, self.link_slug, limit=self.max_uses - self._unlimited_uses)
+        if limited_uses is None:
+            # キャッシュされたリンクが以降のリクエストで上限超過と判定されるようにする
+            self.uses = max(self.uses, self.max_uses)
+            self._mark_max_uses_exceeded()
+            return False
+        # 更新後の値が返却されるため、他のコンテナによる使用回数も反映する
+        self.uses = self._unlimited_uses + limited_uses
         return True
 
+    def _mark_max_uses_exceeded(self) -> None:
+        """上限超過をリンクに記録し、他のコンテナでは使用回数を読み込まずに判定できるようにする"""
+        self.inactive_status = DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED
+        try:
+            get_link_store().mark_max_uses_exceeded(self.domain, self.link_slug, self.max_uses)
+        except Exception:
+            # 記録できなくても、リクエスト時の判定で上限超過になる
+            logger.exception(f"Failed to mark link as max uses exceeded, domain: {self.domain}, slug: {self.link_slug}")
+
     def is_protected(self) -> bool:
         return (self._passphrase is not None) and (not self._passphrase.isspace())
 
+    def is_shared_cacheable(self) -> bool:
+        """
+        リダイレクトを共有キャッシュに保存できるかを返す。キャッシュされたリクエストは関数に届かないため、
+        リクエストごとの判定が必要なリンク(有効期限・パスフレーズ・最大使用回数のあるリンク)は対象外とする。
+        """
+        return self.cacheable and (self.expiration_date is None) and (not self.is_protected()) and (self.max_uses is None)
+
     def validate_challenge(self, nonce: str, challenge: str) -> bool:
         if not self.is_protected():
             raise ValueError("Link is not protected.")
@@ -141,7 +232,7 @@ class DelibirdLink:
             link_origin=model.origin,
             status=HTTPStatus(model.status),
             disabled=model.disabled,
-            uses=int(model.uses),
+            uses=int(model.uses) if model.uses is not None else 0,
             memo=model.memo,
             tag=set(model.tag) if model.tag is not None else None,
             expiration_date=as_jst(model.expiration_date) if model.expiration_date is not None else None,
@@ -149,14 +240,44 @@ class DelibirdLink:
             _passphrase=model.passphrase,
             query_omit=model.query_omit,
             query_whitelist=model.query_whitelist,
-            max_uses=int(model.max_uses) if model.max_uses is not None else None
+            max_uses=int(model.max_uses) if model.max_uses is not None else None,
+            inactive_status=DelibirdLinkInactiveStatus[model.inactive_status] if model.inactive_status else None,
+            cacheable=bool(model.cacheable),
         )
 
 
-class DelibirdLinkTableModel(Model):
+def _index_range_key(index: GlobalSecondaryIndex) -> Attribute:
+    return next(attribute for attribute in index.Meta.attributes.values() if attribute.is_range_key)
+
+
+class DelibirdLinkExpirationIndex(GlobalSecondaryIndex):
+    """有効期限のあるリンクのみを含む(疎な)インデックス。有効期限はJSTで保存されるため、文字列の順序が日時の順序と一致する"""
+
     class Meta:
+        index_name = "domain-expiration_date-index"
+        projection = AllProjection()
+
+    domain = UnicodeAttribute(hash_key=True)
+    expiration_date = DateTimeAttribute(range_key=True)
+
+
+class DelibirdLinkDisabledIndex(GlobalSecondaryIndex):
+    """無効化されたリンクのみを含む(疎な)インデックス。無効化された日時の順に読み込む"""
+
+    class Meta:
+        index_name = "domain-disabled_at-index"
+        projection = AllProjection()
+
+    domain = UnicodeAttribute(hash_key=True)
+    disabled_at = DateTimeAttribute(range_key=True)
+
+
+class DelibirdLinkTableModel(Model):
+    class Meta(DelibirdTableMeta):
         table_name = os.environ["LINK_TABLE_NAME"]
-        region = _REGION
+
+    expiration_index = DelibirdLinkExpirationIndex()
+    disabled_index = DelibirdLinkDisabledIndex()
 
     domain = UnicodeAttribute(hash_key=True)
     slug = UnicodeAttribute(range_key=True)
@@ -165,7 +286,12 @@ class DelibirdLinkTableModel(Model):
     origin = UnicodeAttribute(null=False)
     status = NumberAttribute(null=False)
     disabled = BooleanAttribute(null=False, default=False)
-    uses = NumberAttribute(null=False, default=0)
+    # 無効化された日時 (無効化されている間のみ保持し、DelibirdLinkDisabledIndexのキーになる)
+    disabled_at = DateTimeAttribute(null=True)
+    # 管理画面からの作成・更新ごとに加算する版数 (楽観的排他制御に使用し、版数のない移行前のリンクは0とみなす)
+    version = NumberAttribute(null=True)
+    # 使用回数はDelibirdLinkCounterTableModelで管理する(移行前のアイテムのみ保持)
+    uses = NumberAttribute(null=True)
     memo = UnicodeAttribute(null=False, default="")
     tag = UnicodeSetAttribute(null=True)
 
@@ -175,22 +301,233 @@ class DelibirdLinkTableModel(Model):
     query_omit = BooleanAttribute(null=False, default=True)
     query_whitelist = UnicodeSetAttribute(null=True)
     max_uses = NumberAttribute(null=True)
+    # 有効期限切れ・最大使用回数超過が確定した理由 (DelibirdLinkInactiveStatusの名前)。設定の変更時に再計算される
+    inactive_status = UnicodeAttribute(null=True)
+    # リダイレクトを共有キャッシュ(CDN)に保存させるか (使用回数はアクセスログから反映する)
+    cacheable = BooleanAttribute(null=True)
 
     @classmethod
-    def get_from_request(cls, domain: str, slug: str) -> Optional[DelibirdLink]:
+    def get_from_request(cls, domain: str, slug: str, consistent_read: bool = False) -> Optional[DelibirdLink]:
         try:
-            result = cls.get(hash_key=domain, range_key=slug, consistent_read=True)
+            # 設定値は更新頻度が低くキャッシュされるため、リダイレクトでは結果整合性のある読み込みで十分
+            result = cls.get(hash_key=domain, range_key=slug, consistent_read=consistent_read)
         except cls.DoesNotExist:
             return None
         return DelibirdLink.from_model(result)
 
     @classmethod
-    def scan_domain(cls, domain: str) -> list["DelibirdLink"]:
+    def query_page(cls, domain: str, limit: int, start_slug: Optional[str] = None,
+                   attributes_to_get: Optional[list[str]] = None) -> Iterator["DelibirdLinkTableModel"]:
+        """
+        ドメイン内のリンクをslugの昇順で、start_slugの次から読み込むイテレーターを返す。
+        次のページの有無を判定できるように、最大limit+1件を返す。attributes_to_getは射影式(ProjectionExpression)として送信される。
+        """
+        last_evaluated_key = {"domain": {"S": domain}, "slug": {"S": start_slug}} if start_slug is not None else None
+        return cls.query(hash_key=domain, limit=limit + 1, page_size=limit + 1, last_evaluated_key=last_evaluated_key,
+                         attributes_to_get=attributes_to_get)
+
+    @classmethod
+    def query_index_page(cls, index: GlobalSecondaryIndex, domain: str, limit: int, range_key_condition: Optional[Condition] = None,
+                         start_key: Optional[tuple[str, str]] = None,
+                         attributes_to_get: Optional[list[str]] = None) -> Iterator["DelibirdLinkTableModel"]:
+        """
+        インデックスのドメイン内のリンクを範囲キーの順に、start_keyの次から読み込むイテレーターを返す (最大limit+1件)。
+        start_keyは直前のページの最後のリンクのindex_start_key()の値。
+        """
+        last_evaluated_key = None
+        if start_key is not None:
+            slug, index_value = start_key
+            last_evaluated_key = {"domain": {"S": domain}, "slug": {"S": slug},
+                                  _index_range_key(index).attr_name: {"S": index_value}}
+        return index.query(domain, range_key_condition=range_key_condition, limit=limit + 1, page_size=limit + 1,
+                           last_evaluated_key=last_evaluated_key, attributes_to_get=attributes_to_get)
+
+    def index_start_key(self, index: GlobalSecondaryIndex) -> tuple[str, str]:
+        """このリンクの次から読み込むための、query_index_pageのstart_keyを返す (範囲キーの属性を読み込んでいること)"""
+        attribute = _index_range_key(index)
+        return self.slug, attribute.serialize(getattr(self, attribute.attr_name))
+
+    def _transact_create(self, transaction: TransactWrite, return_values: Optional[str] = None) -> None:
+        """リンクの作成とタグのインデックスの追加をトランザクションに加える"""
+        from ddb.models.delibird_link_tag import DelibirdLinkTagTableModel
+
+        if self.disabled and (self.disabled_at is None):
+            self.disabled_at = get_jst_datetime_now()
+        self.version = 1
+        transaction.save(self, condition=DelibirdLinkTableModel.domain.does_not_exist(), return_values=return_values)
+        for tag in sorted(self.tag or ()):
+            transaction.save(DelibirdLinkTagTableModel.of(self.domain, tag, self.slug))
+
+    def _transact_update(self, transaction: TransactWrite, actions: list[Action], disabled: bool, tag: Optional[set[str]],
+                         return_values: Optional[str] = None, version: Optional[int] = None) -> int:
+        """
+        リンクの更新とタグのインデックスの追加・削除をトランザクションに加え、無効化されたリンク数の増減を返す。
+        versionを指定した場合は、リンクがその版数のままであることも条件にする。
+        """
+        from ddb.models.delibird_link_tag import DelibirdLinkTagTableModel
+
+        current_tag = set(self.tag or ())
+        new_tag = set(tag or ())
+        # インデックスが読み込んだタグに基づいて更新されるため、タグも読み込んだ値であることを条件にする
+        condition = (DelibirdLinkTableModel.disabled == bool(self.disabled)) & (
+            (DelibirdLinkTableModel.tag == current_tag) if current_tag else DelibirdLinkTableModel.tag.does_not_exist())
+        if version is not None:
+            condition &= DelibirdLinkTableModel.version_condition(version)
+        actions = [*actions, DelibirdLinkTableModel.version.add(1)]
+        if bool(self.disabled) != disabled:
+            # GSIのキーはNULLにできないため、有効化する場合は属性を削除する
+            actions = [*actions, DelibirdLinkTableModel.disabled_at.set(get_jst_datetime_now()) if disabled
+                       else DelibirdLinkTableModel.disabled_at.remove()]
+
+        transaction.update(self, actions=actions, condition=condition, return_values=return_values)
+        for removed in sorted(current_tag - new_tag):
+            transaction.delete(DelibirdLinkTagTableModel.of(self.domain, removed, self.slug))
+        for added in sorted(new_tag - current_tag):
+            transaction.save(DelibirdLinkTagTableModel.of(self.domain, added, self.slug))
+        return (1 if disabled else -1) if bool(self.disabled) != disabled else 0
+
+    def create_transaction_items(self) -> int:
+        """create_links()でこのリンクの作成に使用するトランザクションの項目数"""
+        return 1 + len(self.tag or ())
+
+    def update_transaction_items(self, tag: Optional[set[str]]) -> int:
+        """update_links()でこのリンクの更新に使用するトランザクションの項目数"""
+        return 1 + len(set(self.tag or ()) ^ set(tag or ()))
+
+    def create(self) -> None:
+        """
+        リンクを作成し、同じトランザクションでドメインのリンク数の加算とタグのインデックスの追加を行う。
+        同じslugのリンクが既に存在する場合は、cancellation_reasons[0]がConditionalCheckFailedのTransactWriteErrorを送出する。
+        """
+        from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+
+        with TransactWrite(connection=transaction_connection()) as transaction:
+            self._transact_create(transaction)
+            transaction.update(DelibirdDomainMetaTableModel(self.domain),
+                               actions=DelibirdDomainMetaTableModel.link_count_actions(1, int(bool(self.disabled))))
+
+    def update_link(self, actions: list[Action], disabled: bool, tag: Optional[set[str]], version: Optional[int] = None) -> None:
+        """
+        リンクを更新し、同じトランザクションで無効化の状態が変わる場合はドメインの無効化されたリンク数を加算し、
+        タグが変わる場合はタグのインデックスを追加・削除する。無効化された日時(disabled_at)と版数はこのメソッドで更新する。
+        読み込み後に他の更新で無効化の状態かタグ(versionを指定した場合は版数)が変わっていた場合は、
+        いずれかのcancellation_reasonsがConditionalCheckFailedのTransactWriteErrorを送出する。
+        """
+        from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+
+        with TransactWrite(connection=transaction_connection()) as transaction:
+            if disabled_links := self._transact_update(transaction, actions, disabled, tag, version=version):
+                transaction.update(DelibirdDomainMetaTableModel(self.domain),
+                                   actions=DelibirdDomainMetaTableModel.link_count_actions(0, disabled_links))
+
+    @classmethod
+    def create_links(cls, models: list["DelibirdLinkTableModel"]) -> None:
+        """
+        複数のリンクを1つのトランザクションで作成する (全て作成されるか、1つも作成されない)。
+        トランザクションの項目数はcreate_transaction_items()の合計で、MAX_TRANSACTION_ITEMS以下であること。
+        並列に実行されるトランザクションが競合しないように、ドメインのリンク数は加算しない (呼び出し側でまとめて加算する)。
+        既に存在するslugがある場合はTransactWriteErrorを送出し、そのリンクのcancellation_reasonsのraw_itemに既存のアイテムを含む。
+        """
+        with TransactWrite(connection=transaction_connection()) as transaction:
+            for model in models:
+                model._transact_create(transaction, return_values=ALL_OLD)
+
+    @classmethod
+    def update_links(cls, updates: list[tuple["DelibirdLinkTableModel", list[Action], bool, Optional[set[str]]]]) -> int:
+        """
+        複数のリンクを1つのトランザクションで更新し、無効化されたリンク数の増減を返す (全て更新されるか、1つも更新されない)。
+        updatesは(読み込んだリンク, actions, disabled, tag)で、トランザクションの項目数はupdate_transaction_items()の合計がMAX_TRANSACTION_ITEMS以下であること。
+        create_links()と同様に、ドメインの無効化されたリンク数は加算しない。
+        読み込み後に他の更新があったリンクがある場合はTransactWriteErrorを送出し、そのリンクのcancellation_reasonsのraw_itemに現在のアイテムを含む。
+        """
+        with TransactWrite(connection=transaction_connection()) as transaction:
+            return sum(model._transact_update(transaction, actions, disabled, tag, return_values=ALL_OLD)
+                       for model, actions, disabled, tag in updates)
+
+    @staticmethod
+    def written_inactive_status(expiration_date: Optional[datetime]) -> Optional[DelibirdLinkInactiveStatus]:
+        """作成・更新時に記録する無効な理由 (書き込み時点で有効期限が過ぎている場合のみ)"""
+        if (expiration_date is not None) and (expiration_date <= get_jst_datetime_now()):
+            return DelibirdLinkInactiveStatus.EXPIRED
+        return None
+
+    @classmethod
+    def inactive_status_action(cls, expiration_date: Optional[datetime]) -> Action:
+        """有効期限・最大使用回数を変更する更新で、記録された無効な理由を再計算するアクション"""
+        if (status := cls.written_inactive_status(expiration_date)) is not None:
+            return cls.inactive_status.set(status.name)
+        return cls.inactive_status.remove()
+
+    @classmethod
+    def mark_inactive(cls, domain: str, slug: str, status: DelibirdLinkInactiveStatus, condition: Condition) -> bool:
+        """
+        無効になったことが確定したリンクに理由を記録する (版数は変更しない)。conditionには判定に使用した設定値が変わっていないことを指定する。
+        既に記録されている・リンクが存在しない・条件を満たさない場合はFalseを返す。
+        """
+        try:
+            cls(domain, slug).update(actions=[cls.inactive_status.set(status.name)],
+                                     condition=cls.domain.exists() & cls.inactive_status.does_not_exist() & condition)
+        except UpdateError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                return False
+            raise e
+        return True
+
+    @staticmethod
+    def version_condition(version: int) -> Condition:
+        """リンクが存在し、読み込んだ版数のままであることの条件"""
+        if version:
+            return DelibirdLinkTableModel.version == version
+        return DelibirdLinkTableModel.domain.exists() & DelibirdLinkTableModel.version.does_not_exist()
+
+    @classmethod
+    def _current_version(cls, domain: str, slug: str) -> int:
+        model = cls.get(domain, slug, consistent_read=True, attributes_to_get=[cls.version.attr_name])
+        return int(model.version or 0)
+
+    @classmethod
+    def patch_link(cls, domain: str, slug: str, version: int, actions: list[Action], disabled: Optional[bool] = None) -> int:
+        """
+        版数(version)のリンクに変更する属性のアクションのみを1回の書き込みで適用し、更新後の版数を返す。
+        actionsには無効化の状態とタグを含めない。無効化の状態を変更する場合(disabledを指定)は、同じトランザクションで
+        無効化された日時とドメインの無効化されたリンク数を更新する。タグのインデックスは更新しないため、タグの変更はupdate_link()で行う。
+        リンクが存在しない場合はDoesNotExistを、版数が異なる場合はDelibirdLinkVersionMismatchを送出する。
+        """
+        from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+
+        model = cls(domain, slug)
+        actions = [*actions, cls.version.add(1)]
+        if disabled is None:
+            try:
+                model.update(actions=actions, condition=cls.version_condition(version))
+            except UpdateError as e:
+                if e.cause_response_code != "ConditionalCheckFailedException":
+                    raise e
+                # 失敗した場合のみ、原因(存在しない・版数の不一致)を確定するために読み込む
+                raise DelibirdLinkVersionMismatch(cls._current_version(domain, slug)) from e
+            return int(model.version)
+
+        # 無効化の状態が実際に変わる場合のみリンク数を加算するため、変更前の状態を条件にする
+        disabled_actions = [cls.disabled.set(disabled),
+                            cls.disabled_at.set(get_jst_datetime_now()) if disabled else cls.disabled_at.remove()]
         try:
-            return [DelibirdLink.from_model(model) for model in cls.query(hash_key=domain, consistent_read=True)]
-        except Exception as e:
-            logger.exception(f"Failed to scan delibird link data for domain: {domain}, Table: {cls.Meta.table_name}")
-            raise RuntimeError('Failed to scan delibird link data.') from e
+            with TransactWrite(connection=transaction_connection()) as transaction:
+                transaction.update(model, actions=[*actions, *disabled_actions],
+                                   condition=cls.version_condition(version) & (cls.disabled == (not disabled)), return_values=ALL_OLD)
+                transaction.update(DelibirdDomainMetaTableModel(domain),
+                                   actions=DelibirdDomainMetaTableModel.link_count_actions(0, 1 if disabled else -1))
+        except TransactWriteError as e:
+            reason = next((r for r in e.cancellation_reasons if r and (r.code == "ConditionalCheckFailed")), None)
+            if reason is None:
+                raise e
+            if reason.raw_item is None:
+                raise cls.DoesNotExist() from e
+            current_version = int(reason.raw_item.get(cls.version.attr_name, {}).get("N", 0))
+            if current_version != version:
+                raise DelibirdLinkVersionMismatch(current_version) from e
+            # 版数が一致する場合は無効化の状態が既に同じため、無効化の状態を変えずに更新する
+            return cls.patch_link(domain, slug, version, actions[:-1])
+        return version + 1
 
     def __str__(self):
         try:
@@ -0,0 +1,87 @@
+import os
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute
+from pynamodb.exceptions import UpdateError
+from pynamodb.models import Model
+
+from ddb.connection import DelibirdTableMeta
+from util.assert_util import assert_positive
+from util.environment_util import get_env_var
+
+_COUNTER_KEY_SEPARATOR = "#"
+# リンクごとのシャード数。読み込み時はこの数のシャードのキーを読み込むため、減らすとそれ以降のシャードの使用回数が集計されなくなる
+SHARD_COUNT = assert_positive(int(get_env_var("LINK_COUNTER_SHARDS", 8)), "LINK_COUNTER_SHARDS")
+# 最大使用回数のあるリンクは、条件付き更新のためにこのシャードのみを使用する
+LIMITED_SHARD = 0
+
+
+class DelibirdLinkCounterTableModel(Model):
+    """
+    リンクの使用回数をシャードに分散して保持するテーブル。
+    シャードごとにパーティションを分けるため、アクセスの集中するリンク・ドメインの書き込みも複数のパーティションに分散される。
+    """
+
+    class Meta(DelibirdTableMeta):
+        table_name = os.environ["LINK_COUNTER_TABLE_NAME"]
+
+    # {domain}#{slug}#{shard}
+    counter_key = UnicodeAttribute(hash_key=True)
+    uses = NumberAttribute(null=False, default=0)
+
+    @staticmethod
+    def build_counter_key(domain: str, slug: str, shard: int) -> str:
+        return f"{domain}{_COUNTER_KEY_SEPARATOR}{slug}{_COUNTER_KEY_SEPARATOR}{shard:03d}"
+
+    @staticmethod
+    def parse_counter_key(counter_key: str) -> tuple[str, str, int]:
+        domain, rest = counter_key.split(_COUNTER_KEY_SEPARATOR, 1)
+        slug, shard = rest.rsplit(_COUNTER_KEY_SEPARATOR, 1)
+        return domain, slug, int(shard)
+
+    @classmethod
+    def add_uses(cls, domain: str, slug: str, shard: int, count: int) -> None:
+        cls(cls.build_counter_key(domain, slug, shard)).update(actions=[cls.uses.add(count)])
+
+    @classmethod
+    def _batch_get_uses(cls, domain: str, slugs: Iterable[str], consistent_read: bool) -> Iterable["DelibirdLinkCounterTableModel"]:
+        """リンクの全シャードのキーをBatchGetItem(100キーごと)で読み込み、存在するシャードのみを返す"""
+        keys = [cls.build_counter_key(domain, slug, shard) for slug in slugs for shard in range(SHARD_COUNT)]
+        return cls.batch_get(keys, consistent_read=consistent_read)
+
+    @classmethod
+    def get_link_uses(cls, domain: str, slug: str, consistent_read: bool = True) -> dict[int, int]:
+        """リンクのシャードごとの使用回数を返す"""
+        return {
+            cls.parse_counter_key(model.counter_key)[2]: int(model.uses)
+            for model in cls._batch_get_uses(domain, (slug,), consistent_read)
+        }
+
+    @classmethod
+    def increment_limited(cls, domain: str, slug: str, limit: int) -> Optional[int]:
+        """
+        LIMITED_SHARDの使用回数がlimit未満の場合のみインクリメントし、更新後の値を返す。
+        条件を満たさない場合はNoneを返す。
+        """
+        if limit <= 0:
+            return None
+        model = cls(cls.build_counter_key(domain, slug, LIMITED_SHARD))
+        try:
+            model.update(
+                actions=[cls.uses.add(1)],
+                condition=(cls.uses.does_not_exist()) | (cls.uses < limit)
+            )
+        except UpdateError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                return None
+            raise e
+        return int(model.uses)
+
+    @classmethod
+    def sum_slugs(cls, domain: str, slugs: list[str]) -> dict[str, int]:
+        """slugごとの使用回数を、全リンクの全シャードのキーのBatchGetItemで集計して返す (使用されていないリンクは含まない)"""
+        result: dict[str, int] = defaultdict(int)
+        for model in cls._batch_get_uses(domain, slugs, consistent_read=False):
+            result[cls.parse_counter_key(model.counter_key)[1]] += int(model.uses)
+        return dict(result)
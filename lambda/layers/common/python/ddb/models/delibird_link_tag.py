@@ -0,0 +1,41 @@
+import os
+from typing import Iterator, Optional
+
+from pynamodb.attributes import UnicodeAttribute
+from pynamodb.models import Model
+
+from ddb.connection import DelibirdTableMeta
+
+_KEY_SEPARATOR = "#"
+# 1つのリンクに付けられるタグの上限 (タグの追加・削除をリンクの更新と同じトランザクションに収める)
+MAX_LINK_TAGS = 20
+
+
+class DelibirdLinkTagTableModel(Model):
+    """
+    タグからリンクを引くための転置インデックス。リンクのタグ1つにつき1アイテムを保持する。
+    タグの集合(UnicodeSetAttribute)はGSIのキーにできないため、リンクの作成・更新と同じトランザクションで別テーブルに書き込む。
+    """
+
+    class Meta(DelibirdTableMeta):
+        table_name = os.environ["LINK_TAG_TABLE_NAME"]
+
+    # {domain}#{tag}
+    tag_key = UnicodeAttribute(hash_key=True)
+    slug = UnicodeAttribute(range_key=True)
+
+    @staticmethod
+    def build_tag_key(domain: str, tag: str) -> str:
+        return f"{domain}{_KEY_SEPARATOR}{tag}"
+
+    @classmethod
+    def of(cls, domain: str, tag: str, slug: str) -> "DelibirdLinkTagTableModel":
+        return cls(cls.build_tag_key(domain, tag), slug)
+
+    @classmethod
+    def query_slugs(cls, domain: str, tag: str, limit: int, start_slug: Optional[str] = None) -> Iterator[str]:
+        """タグの付いたリンクのslugを昇順で、start_slugの次から最大limit件返す"""
+        tag_key = cls.build_tag_key(domain, tag)
+        last_evaluated_key = {"tag_key": {"S": tag_key}, "slug": {"S": start_slug}} if start_slug is not None else None
+        for model in cls.query(tag_key, limit=limit, page_size=limit, last_evaluated_key=last_evaluated_key):
+            yield model.slug
@@ -0,0 +1,55 @@
+import random
+from typing import Iterator, Optional
+
+from pynamodb.exceptions import TransactWriteError
+
+from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink, DelibirdLinkInactiveStatus
+from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel, LIMITED_SHARD, SHARD_COUNT
+from store.link_store import LinkStore
+
+
+class DynamoDBLinkStore(LinkStore):
+    """
+    DynamoDBのリンク・カウンター・ドメインのメタ情報のテーブルを使用する保存先。
+    条件なしの使用回数はランダムなシャードへ、条件付きの使用回数はLIMITED_SHARDへ加算する。
+    """
+
+    def get_link(self, domain: str, slug: str, consistent_read: bool = False) -> Optional[DelibirdLink]:
+        return DelibirdLinkTableModel.get_from_request(domain, slug, consistent_read=consistent_read)
+
+    def put_link(self, model: DelibirdLinkTableModel) -> bool:
+        try:
+            model.create()
+        except TransactWriteError as e:
+            reasons = e.cancellation_reasons or []
+            if reasons and (reasons[0] is not None) and (reasons[0].code == "ConditionalCheckFailed"):
+                return False
+            raise e
+        return True
+
+    def query_links(self, domain: str, start_slug: Optional[str] = None, limit: Optional[int] = None,
+                    consistent_read: bool = False) -> Iterator[DelibirdLinkTableModel]:
+        last_evaluated_key = {"domain": {"S": domain}, "slug": {"S": start_slug}} if start_slug is not None else None
+        return DelibirdLinkTableModel.query(hash_key=domain, limit=limit, last_evaluated_key=last_evaluated_key,
+                                            consistent_read=consistent_read)
+
+    def load_uses(self, domain: str, slug: str, consistent_read: bool = True) -> tuple[int, int]:
+        shard_uses = DelibirdLinkCounterTableModel.get_link_uses(domain, slug, consistent_read=consistent_read)
+        return sum(v for k, v in shard_uses.items() if k != LIMITED_SHARD), shard_uses.get(LIMITED_SHARD, 0)
+
+    def add_uses(self, domain: str, slug: str, count: int) -> None:
+        DelibirdLinkCounterTableModel.add_uses(domain, slug, random.randrange(SHARD_COUNT), count)
+
+    def increment_uses(self, domain: str, slug: str, limit: int) -> Optional[int]:
+        return DelibirdLinkCounterTableModel.increment_limited(domain, slug, limit)
+
+    def mark_max_uses_exceeded(self, domain: str, slug: str, max_uses: int) -> bool:
+        return DelibirdLinkTableModel.mark_inactive(domain, slug, DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED,
+                                                    condition=(DelibirdLinkTableModel.max_uses == max_uses))
+
+    def get_cache_version(self, domain: str) -> int:
+        return DelibirdDomainMetaTableModel.get_cache_version(domain)
+
+    def bump_cache_version(self, domain: str) -> int:
+        return DelibirdDomainMetaTableModel.bump_cache_version(domain)
@@ -0,0 +1,355 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Collection, Iterable, Iterator, Optional, Union
+
+from ddb.models.delibird_link import DelibirdLink
+from store.link_store import get_link_store
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+logger = setup_logger("delibird.link_snapshot", logging.INFO)
+
+# デプロイに含めるスナップショット({domain}.snap)のディレクトリ (既定はレイヤーのpython/link_snapshots)
+LINK_SNAPSHOT_DIR = str(get_env_var("LINK_SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "link_snapshots"))
+# 管理画面の書き込みで再構築したスナップショットを版数ごとに保存するS3のバケット (空の場合は再構築しない)
+LINK_SNAPSHOT_BUCKET = str(get_env_var("LINK_SNAPSHOT_BUCKET", ""))
+LINK_SNAPSHOT_PREFIX = str(get_env_var("LINK_SNAPSHOT_PREFIX", "link-snapshots/"))
+# S3から取得したスナップショットの保存先 (コンテナ内でmmapする)
+_DOWNLOAD_DIR = str(get_env_var("LINK_SNAPSHOT_DOWNLOAD_DIR", "/tmp/delibird-link-snapshots"))
+# 現在の版数のスナップショットが見つからなかった場合に、再度取得を試みるまでの秒数
+_RETRY_SECONDS = float(get_env_var("LINK_SNAPSHOT_RETRY_SECONDS", 30))
+# 差分で再構築する変更されたリンク数の上限 (超える場合はドメイン全体を読み込み直す)
+_MAX_INCREMENTAL_SLUGS = int(get_env_var("LINK_SNAPSHOT_MAX_INCREMENTAL_SLUGS", 100))
+# 関数内でドメイン全体から再構築するリンク数の上限 (超える場合は再構築せず、tools/build_link_snapshot.pyで構築する)
+_MAX_REBUILD_LINKS = int(get_env_var("LINK_SNAPSHOT_MAX_REBUILD_LINKS", 100000))
+
+_MAGIC = b"DLBSNAP1"
+# ヘッダー: マジック, 版数(構築時のドメインのキャッシュの版数), リンク数, ドメインの長さ, 文字列プールの長さ
+_HEADER = struct.Struct("<8sQIII")
+# 索引の要素(slugの昇順): slug・遷移先・クエリの許可リストの文字列プール内の位置と長さ, ステータスコード, フラグ
+_ENTRY = struct.Struct("<IIIIIIHH")
+# 二分探索で読み込む索引の要素の先頭 (slugの位置と長さ)
+_ENTRY_SLUG = struct.Struct("<II")
+_FLAG_QUERY_OMIT = 1
+_FLAG_CACHEABLE = 2
+# クエリの許可リストの区切り文字 (含むキーがあるリンクはスナップショットの対象外とする)
+_WHITELIST_SEPARATOR = "\0"
+
+_SnapshotBuffer = Union[mmap.mmap, bytes]
+
+
+@dataclass(frozen=True)
+class LinkSnapshotEntry:
+    """スナップショットに含めるリンク (リクエストごとの判定が不要な、設定値のみでリダイレクトできるリンク)"""
+    slug: str
+    origin: str
+    status: int
+    query_omit: bool
+    query_whitelist: tuple[str, ...]
+    cacheable: bool
+
+    @staticmethod
+    def from_link(link: DelibirdLink) -> Optional["LinkSnapshotEntry"]:
+        """スナップショットの対象のリンクの場合のみ要素を返す (無効・有効期限・パスフレーズ・最大使用回数のあるリンクは対象外)"""
+        if (link.disabled or (link.inactive_status is not None) or (link.expiration_date is not None) or link.is_protected()
+                or (link.max_uses is not None)):
+            return None
+        if any(_WHITELIST_SEPARATOR in key for key in link.query_whitelist):
+            return None
+        return LinkSnapshotEntry(slug=link.link_slug, origin=link.link_origin, status=int(link.status), query_omit=link.query_omit,
+                                 query_whitelist=tuple(sorted(link.query_whitelist)), cacheable=link.cacheable)
+
+    def to_link(self, domain: str) -> DelibirdLink:
+        return DelibirdLink(
+            _model=None,
+            domain=domain,
+            link_slug=self.slug,
+            link_origin=self.origin,
+            status=HTTPStatus(self.status),
+            query_omit=self.query_omit,
+            query_whitelist=set(self.query_whitelist),
+            cacheable=self.cacheable,
+        )
+
+
+def encode_link_snapshot(domain: str, version: int, entries: Iterable[LinkSnapshotEntry]) -> bytes:
+    """ドメインのリンクをヘッダー・slugの昇順の索引・文字列プールからなるバイナリに変換する"""
+    domain_bytes = domain.encode()
+    pool = bytearray()
+    index = bytearray()
+
+    def add(value: str) -> tuple[int, int]:
+        encoded = value.encode()
+        offset = len(pool)
+        pool.extend(encoded)
+        return offset, len(encoded)
+
+    # slugはUTF-8のバイト列の順で並べ、検索時もバイト列で比較する
+    sorted_entries = sorted(entries, key=lambda e: e.slug.encode())
+    for entry in sorted_entries:
+        flags = (_FLAG_QUERY_OMIT if entry.query_omit else 0) | (_FLAG_CACHEABLE if entry.cacheable else 0)
+        index.extend(_ENTRY.pack(*add(entry.slug), *add(entry.origin), *add(_WHITELIST_SEPARATOR.join(entry.query_whitelist)),
+                                 entry.status, flags))
+    header = _HEADER.pack(_MAGIC, version, len(sorted_entries), len(domain_bytes), len(pool))
+    return b"".join((header, domain_bytes, index, pool))
+
+
+def relabel_link_snapshot(data: bytes, version: int) -> bytes:
+    """リンクが変更されていないスナップショットの版数のみを書き換える"""
+    relabeled = bytearray(data)
+    struct.pack_into("<Q", relabeled, len(_MAGIC), version)
+    return bytes(relabeled)
+
+
+def write_link_snapshot(path: Union[str, Path], data: bytes) -> None:
+    """スナップショットを一時ファイルに書き込んでから置き換える (読み込み中のプロセスは置き換え前のファイルを参照し続ける)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary_path.write_bytes(data)
+    os.replace(temporary_path, path)
+
+
+class LinkSnapshot:
+    """
+    1つのドメインのスナップショット。索引と文字列プールはmmapしたファイルを直接参照し、読み込み時に展開しない。
+    slugは索引の二分探索で検索し、見つかったリンクの文字列のみをデコードする。
+    """
+
+    def __init__(self, buffer: _SnapshotBuffer):
+        magic, self.version, self._count, domain_length, pool_length = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("Invalid link snapshot.")
+        self._index_offset = _HEADER.size + domain_length
+        self._pool_offset = self._index_offset + self._count * _ENTRY.size
+        if len(buffer) != self._pool_offset + pool_length:
+            raise ValueError("Truncated link snapshot.")
+        self.domain = bytes(buffer[_HEADER.size:self._index_offset]).decode()
+        self._buffer = buffer
+
+    @staticmethod
+    def open(path: Union[str, Path]) -> "LinkSnapshot":
+        with open(path, "rb") as f:
+            # ファイルを閉じてもマッピングは有効なまま残る
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return LinkSnapshot(buffer)
+        except Exception:
+            buffer.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._pool_offset + offset
+        return self._buffer[start:start + length]
+
+    def _entry(self, position: int) -> LinkSnapshotEntry:
+        (slug_offset, slug_length, origin_offset, origin_length, whitelist_offset, whitelist_length, status,
+         flags) = _ENTRY.unpack_from(self._buffer, self._index_offset + position * _ENTRY.size)
+        whitelist = self._string(whitelist_offset, whitelist_length).decode()
+        return LinkSnapshotEntry(
+            slug=self._string(slug_offset, slug_length).decode(),
+            origin=self._string(origin_offset, origin_length).decode(),
+            status=status,
+            query_omit=bool(flags & _FLAG_QUERY_OMIT),
+            query_whitelist=tuple(whitelist.split(_WHITELIST_SEPARATOR)) if whitelist else (),
+            cacheable=bool(flags & _FLAG_CACHEABLE),
+        )
+
+    def find(self, slug: str) -> Optional[LinkSnapshotEntry]:
+        target = slug.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            slug_offset, slug_length = _ENTRY_SLUG.unpack_from(self._buffer, self._index_offset + middle * _ENTRY.size)
+            candidate = self._string(slug_offset, slug_length)
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return self._entry(middle)
+        return None
+
+    def entries(self) -> Iterator[LinkSnapshotEntry]:
+        for position in range(self._count):
+            yield self._entry(position)
+
+
+def _snapshot_key(domain: str, version: int) -> str:
+    return f"{LINK_SNAPSHOT_PREFIX}{domain}/{version}.snap"
+
+
+def _s3():
+    # S3のクライアントは、スナップショットを取得・保存するコンテナでのみ初期化する
+    import boto3
+
+    return boto3.client("s3")
+
+
+def _is_not_found(e: Exception) -> bool:
+    response = getattr(e, "response", None) or {}
+    return response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound")
+
+
+def download_link_snapshot(domain: str, version: int) -> Optional[bytes]:
+    """LINK_SNAPSHOT_BUCKETから版数のスナップショットを読み込む。存在しない場合はNoneを返す"""
+    try:
+        return _s3().get_object(Bucket=LINK_SNAPSHOT_BUCKET, Key=_snapshot_key(domain, version))["Body"].read()
+    except Exception as e:
+        if _is_not_found(e):
+            return None
+        raise e
+
+
+def upload_link_snapshot(domain: str, version: int, data: bytes) -> None:
+    """LINK_SNAPSHOT_BUCKETに版数のスナップショットを保存する (版数ごとに別のキーのため、同時に再構築しても上書きされない)"""
+    _s3().put_object(Bucket=LINK_SNAPSHOT_BUCKET, Key=_snapshot_key(domain, version), Body=data,
+                     ContentType="application/octet-stream")
+
+
+def build_link_snapshot_entries(domain: str, max_links: Optional[int] = None) -> Iterator[LinkSnapshotEntry]:
+    """
+    保存先からドメインの全てのリンクを強い整合性で読み込み、スナップショットの対象のリンクを返す。
+    版数はリンクより先に読み込むこと(スナップショットの内容が版数の時点より古くならないようにする)。
+    """
+    for count, model in enumerate(get_link_store().query_links(domain, consistent_read=True), 1):
+        if (max_links is not None) and (count > max_links):
+            raise OverflowError(f"Domain: {domain} has more than {max_links} links.")
+        if (entry := LinkSnapshotEntry.from_link(DelibirdLink.from_model(model))) is not None:
+            yield entry
+
+
+def refresh_link_snapshot(domain: str, version: int, changed_slugs: Collection[str] = ()) -> None:
+    """
+    ドメインのキャッシュの版数をversionに更新した書き込みの後に呼び出し、versionのスナップショットをLINK_SNAPSHOT_BUCKETに保存する。
+    直前の版数のスナップショットがある場合は、changed_slugs(更新したリンク)のみを読み込み直して差分で再構築する。
+    作成したリンクは、スナップショットになくても保存先から読み込まれるため、次にドメイン全体から構築するまで追加しない。
+    失敗した場合は、リダイレクトは次の版数のスナップショットが保存されるまで保存先から読み込む。
+    """
+    if not LINK_SNAPSHOT_BUCKET:
+        return
+    started_at = time.perf_counter()
+    try:
+        base = download_link_snapshot(domain, version - 1) if len(changed_slugs) <= _MAX_INCREMENTAL_SLUGS else None
+        if (base is not None) and (not changed_slugs):
+            method, data = "relabel", relabel_link_snapshot(base, version)
+        elif base is not None:
+            entries = {entry.slug: entry for entry in LinkSnapshot(base).entries()}
+            for slug in changed_slugs:
+                link = get_link_store().get_link(domain, slug, consistent_read=True)
+                if (link is not None) and ((entry := LinkSnapshotEntry.from_link(link)) is not None):
+                    entries[slug] = entry
+                else:
+                    entries.pop(slug, None)
+            method, data = "incremental", encode_link_snapshot(domain, version, entries.values())
+        else:
+            method, data = "full", encode_link_snapshot(domain, version, build_link_snapshot_entries(domain, _MAX_REBUILD_LINKS))
+        upload_link_snapshot(domain, version, data)
+    except Exception:
+        logger.exception(f"Failed to refresh link snapshot for domain: {domain}, version: {version}")
+        return
+    logger.info(f"Refreshed link snapshot for domain: {domain}, version: {version}, method: {method}, size: {len(data)}, "
+                f"elapsed: {time.perf_counter() - started_at:.3f}s")
+
+
+class LinkSnapshots:
+    """
+    リダイレクトで使用するドメインごとのスナップショット。ドメインのキャッシュの版数と一致するスナップショットのみを使用し、
+    一致しない場合はデプロイに含めたファイル、LINK_SNAPSHOT_BUCKETの順に現在の版数のスナップショットを探す。
+    """
+
+    def __init__(self, directory: str, bucket: str, download_dir: str, retry_seconds: float):
+        self._directory = Path(directory)
+        self._bucket = bucket
+        self._download_dir = Path(download_dir)
+        self._retry_seconds = retry_seconds
+
+        self._snapshots: dict[str, LinkSnapshot] = {}
+        # ドメイン -> (見つからなかった版数, 確認した時刻)
+        self._missing: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._bucket) or self._directory.is_dir()
+
+    def get(self, domain: str, slug: str, version: int) -> Optional[DelibirdLink]:
+        """
+        スナップショットからリンクを取得する。スナップショットにないリンク(対象外・スナップショットの後に作成したリンクを含む)や、
+        現在の版数のスナップショットがない場合はNoneを返し、呼び出し側で保存先から読み込む。
+        """
+        snapshot = self._snapshots.get(domain)
+        if (snapshot is None) or (snapshot.version != version):
+            if (snapshot := self._load(domain, version)) is None:
+                return None
+        entry = snapshot.find(slug)
+        return entry.to_link(domain) if entry is not None else None
+
+    def _load(self, domain: str, version: int) -> Optional[LinkSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(domain)
+            if (snapshot is not None) and (snapshot.version == version):
+                return snapshot
+            missing = self._missing.get(domain)
+            now = time.monotonic()
+            if (missing is not None) and (missing[0] == version) and (now - missing[1] < self._retry_seconds):
+                return None
+
+            try:
+                snapshot = self._open_packaged(domain, version)
+                if snapshot is None:
+                    snapshot = self._open_downloaded(domain, version)
+            except Exception:
+                logger.exception(f"Failed to load link snapshot for domain: {domain}, version: {version}")
+                snapshot = None
+            if snapshot is None:
+                self._missing[domain] = (version, now)
+                return None
+
+            # 置き換え前のスナップショットは、参照中のリクエストが終わった後にマッピングごと解放される
+            self._snapshots[domain] = snapshot
+            self._missing.pop(domain, None)
+            logger.info(f"Loaded link snapshot for domain: {domain}, version: {version}, links: {len(snapshot)}")
+            return snapshot
+
+    def _open_packaged(self, domain: str, version: int) -> Optional[LinkSnapshot]:
+        path = self._directory / f"{domain}.snap"
+        if not path.is_file():
+            return None
+        snapshot = LinkSnapshot.open(path)
+        if snapshot.version != version:
+            logger.debug(f"Packaged link snapshot of domain: {domain} is stale (version: {snapshot.version}, current: {version}).")
+            return None
+        return snapshot
+
+    def _open_downloaded(self, domain: str, version: int) -> Optional[LinkSnapshot]:
+        if not self._bucket:
+            return None
+        path = self._download_dir / f"{domain}-{version}.snap"
+        if not path.is_file():
+            if (data := download_link_snapshot(domain, version)) is None:
+                return None
+            write_link_snapshot(path, data)
+            # 古い版数のファイルは削除する (マッピング済みのファイルは、削除しても解放されるまで参照できる)
+            for stale in self._download_dir.glob(f"{domain}-*.snap"):
+                if stale != path:
+                    stale.unlink(missing_ok=True)
+        return LinkSnapshot.open(path)
+
+
+link_snapshots = LinkSnapshots(
+    directory=LINK_SNAPSHOT_DIR,
+    bucket=LINK_SNAPSHOT_BUCKET,
+    download_dir=_DOWNLOAD_DIR,
+    retry_seconds=_RETRY_SECONDS
+)
@@ -0,0 +1,93 @@
+import functools
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional, TYPE_CHECKING
+
+from util.environment_util import get_env_var
+
+if TYPE_CHECKING:
+    from ddb.models.delibird_link import DelibirdLink, DelibirdLinkTableModel
+
+STORE_BACKEND_DYNAMODB = "dynamodb"
+STORE_BACKEND_SQLITE = "sqlite"
+STORE_BACKEND_MEMORY = "memory"
+STORE_BACKENDS = (STORE_BACKEND_DYNAMODB, STORE_BACKEND_SQLITE, STORE_BACKEND_MEMORY)
+
+# リンク・nonceの保存先 ("dynamodb": DynamoDBのテーブル, "sqlite": ローカルのSQLiteのファイル, "memory": プロセス内のメモリ)
+STORE_BACKEND = str(get_env_var("STORE_BACKEND", STORE_BACKEND_DYNAMODB))
+STORE_SQLITE_PATH = str(get_env_var("STORE_SQLITE_PATH", "/tmp/delibird.sqlite3"))
+
+if STORE_BACKEND not in STORE_BACKENDS:
+    raise ValueError(f"Invalid STORE_BACKEND: {STORE_BACKEND}")
+
+
+class LinkStore(ABC):
+    """
+    リダイレクトで使用するリンク・使用回数・キャッシュの版数の保存先。
+    リンクのアイテムはどの保存先でもDelibirdLinkTableModelで表し、DynamoDB以外の保存先ではシリアライズした属性をそのまま保持する。
+    """
+
+    @abstractmethod
+    def get_link(self, domain: str, slug: str, consistent_read: bool = False) -> Optional["DelibirdLink"]:
+        """リンクを取得する。存在しない場合はNoneを返す"""
+
+    @abstractmethod
+    def put_link(self, model: "DelibirdLinkTableModel") -> bool:
+        """リンクを作成する(条件付きの書き込み)。同じslugのリンクが既に存在する場合はFalseを返す"""
+
+    @abstractmethod
+    def query_links(self, domain: str, start_slug: Optional[str] = None, limit: Optional[int] = None,
+                    consistent_read: bool = False) -> Iterator["DelibirdLinkTableModel"]:
+        """ドメイン内のリンクをslugの昇順で、start_slugの次から最大limit件読み込む"""
+
+    @abstractmethod
+    def load_uses(self, domain: str, slug: str, consistent_read: bool = True) -> tuple[int, int]:
+        """リンクの(add_usesで加算された使用回数, increment_usesで加算された使用回数)を返す"""
+
+    @abstractmethod
+    def add_uses(self, domain: str, slug: str, count: int) -> None:
+        """最大使用回数のないリンクの使用回数を、条件なしで加算する"""
+
+    @abstractmethod
+    def increment_uses(self, domain: str, slug: str, limit: int) -> Optional[int]:
+        """
+        increment_usesで加算された使用回数がlimit未満の場合のみ1回の条件付き更新でインクリメントし、更新後の値を返す。
+        条件を満たさない場合はNoneを返す。
+        """
+
+    @abstractmethod
+    def mark_max_uses_exceeded(self, domain: str, slug: str, max_uses: int) -> bool:
+        """
+        最大使用回数に達したリンクに無効な理由を記録する。最大使用回数がmax_usesのままで、理由が未記録の場合のみ記録する。
+        記録しなかった場合はFalseを返す。
+        """
+
+    @abstractmethod
+    def get_cache_version(self, domain: str) -> int:
+        """ドメインのキャッシュの版数 (リンクキャッシュの無効化に使用する)"""
+
+    @abstractmethod
+    def bump_cache_version(self, domain: str) -> int:
+        """ドメインのキャッシュの版数をインクリメントし、更新後の値を返す"""
+
+
+def serialize_new_link(model: "DelibirdLinkTableModel") -> dict:
+    """DynamoDB以外の保存先で作成するリンクのアイテムを、DynamoDBと同じく版数・無効化された日時を設定してシリアライズする"""
+    from util.date_util import get_jst_datetime_now
+
+    if model.disabled and (model.disabled_at is None):
+        model.disabled_at = get_jst_datetime_now()
+    model.version = 1
+    return model.serialize()
+
+
+@functools.cache
+def get_link_store() -> LinkStore:
+    """STORE_BACKENDのリンクの保存先を返す (プロセスで1つ。選択されたバックエンドのモジュールのみ読み込む)"""
+    if STORE_BACKEND == STORE_BACKEND_SQLITE:
+        from store.sqlite_store import SQLiteLinkStore, sqlite_database
+        return SQLiteLinkStore(sqlite_database())
+    if STORE_BACKEND == STORE_BACKEND_MEMORY:
+        from store.memory_store import MemoryLinkStore
+        return MemoryLinkStore()
+    from store.dynamodb_store import DynamoDBLinkStore
+    return DynamoDBLinkStore()
@@ -0,0 +1,107 @@
+import dataclasses
+import threading
+from datetime import datetime
+from typing import Iterator, Optional
+
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink, DelibirdLinkInactiveStatus
+from store.link_store import LinkStore, serialize_new_link
+from store.nonce_store import NonceStore, DelibirdNonce
+
+
+class MemoryLinkStore(LinkStore):
+    """プロセス内のメモリに保持する保存先 (テスト用。プロセスの終了で失われ、ワーカー間でも共有されない)"""
+
+    def __init__(self):
+        # (domain, slug) -> シリアライズしたアイテム (取得ごとに新しいモデルを生成し、呼び出し側の変更が保存先に影響しないようにする)
+        self._items: dict[tuple[str, str], dict] = {}
+        # (domain, slug) -> [条件なしの使用回数, 条件付きの使用回数]
+        self._uses: dict[tuple[str, str], list[int]] = {}
+        self._cache_versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_link(self, domain: str, slug: str, consistent_read: bool = False) -> Optional[DelibirdLink]:
+        with self._lock:
+            item = self._items.get((domain, slug))
+        return DelibirdLink.from_model(DelibirdLinkTableModel.from_raw_data(item)) if item is not None else None
+
+    def put_link(self, model: DelibirdLinkTableModel) -> bool:
+        key = (model.domain, model.slug)
+        with self._lock:
+            if key in self._items:
+                return False
+            self._items[key] = serialize_new_link(model)
+        return True
+
+    def query_links(self, domain: str, start_slug: Optional[str] = None, limit: Optional[int] = None,
+                    consistent_read: bool = False) -> Iterator[DelibirdLinkTableModel]:
+        with self._lock:
+            items = sorted((slug, item) for (d, slug), item in self._items.items()
+                           if (d == domain) and ((start_slug is None) or (slug > start_slug)))
+        for slug, item in items[:limit]:
+            yield DelibirdLinkTableModel.from_raw_data(item)
+
+    def load_uses(self, domain: str, slug: str, consistent_read: bool = True) -> tuple[int, int]:
+        with self._lock:
+            unlimited, limited = self._uses.get((domain, slug), (0, 0))
+        return unlimited, limited
+
+    def add_uses(self, domain: str, slug: str, count: int) -> None:
+        with self._lock:
+            self._uses.setdefault((domain, slug), [0, 0])[0] += count
+
+    def increment_uses(self, domain: str, slug: str, limit: int) -> Optional[int]:
+        with self._lock:
+            uses = self._uses.setdefault((domain, slug), [0, 0])
+            if uses[1] >= limit:
+                return None
+            uses[1] += 1
+            return uses[1]
+
+    def mark_max_uses_exceeded(self, domain: str, slug: str, max_uses: int) -> bool:
+        key = (domain, slug)
+        with self._lock:
+            if (item := self._items.get(key)) is None:
+                return False
+            model = DelibirdLinkTableModel.from_raw_data(item)
+            if (model.inactive_status is not None) or (model.max_uses != max_uses):
+                return False
+            model.inactive_status = DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED.name
+            self._items[key] = model.serialize()
+        return True
+
+    def get_cache_version(self, domain: str) -> int:
+        with self._lock:
+            return self._cache_versions.get(domain, 0)
+
+    def bump_cache_version(self, domain: str) -> int:
+        with self._lock:
+            self._cache_versions[domain] = self._cache_versions.get(domain, 0) + 1
+            return self._cache_versions[domain]
+
+
+class MemoryNonceStore(NonceStore):
+    """プロセス内のメモリに保持するnonceの保存先 (テスト用。期限切れのnonceは削除しない)"""
+
+    def __init__(self):
+        self._nonces: dict[str, DelibirdNonce] = {}
+        self._lock = threading.Lock()
+
+    def put_nonce(self, nonce: DelibirdNonce) -> bool:
+        with self._lock:
+            if nonce.nonce in self._nonces:
+                return False
+            self._nonces[nonce.nonce] = dataclasses.replace(nonce)
+        return True
+
+    def get_nonce(self, nonce: str) -> Optional[DelibirdNonce]:
+        with self._lock:
+            stored = self._nonces.get(nonce)
+            return dataclasses.replace(stored) if stored is not None else None
+
+    def mark_used(self, nonce: str, used_at: datetime) -> bool:
+        with self._lock:
+            stored = self._nonces.get(nonce)
+            if (stored is None) or (stored.used_at is not None):
+                return False
+            stored.used_at = used_at
+        return True
@@ -0,0 +1,58 @@
+import functools
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from store.link_store import STORE_BACKEND, STORE_BACKEND_SQLITE, STORE_BACKEND_MEMORY
+from util.date_util import get_jst_datetime_now
+
+
+@dataclass
+class DelibirdNonce:
+    """認証ページで発行したnonce (リクエストの対象と期限・使用済みの日時)"""
+    nonce: str
+    domain: str
+    slug: str
+    expired_timestamp: int
+    used_at: Optional[datetime] = None
+
+    def is_active(self) -> bool:
+        if self.used_at is not None:
+            # 使用済み
+            return False
+        if self.expired_timestamp <= get_jst_datetime_now().timestamp():
+            # 期限切れ
+            return False
+        return True
+
+
+class NonceStore(ABC):
+    """認証ページのnonceの保存先"""
+
+    @abstractmethod
+    def put_nonce(self, nonce: DelibirdNonce) -> bool:
+        """nonceを保存する(条件付きの書き込み)。同じnonceが既に存在する場合はFalseを返す"""
+
+    @abstractmethod
+    def get_nonce(self, nonce: str) -> Optional[DelibirdNonce]:
+        """nonceを取得する。存在しない場合はNoneを返す"""
+
+    @abstractmethod
+    def mark_used(self, nonce: str, used_at: datetime) -> bool:
+        """保存されたnonceを使用済みにする(条件付きの更新)。存在しない・既に使用済みの場合はFalseを返す"""
+
+
+@functools.cache
+def get_nonce_store(dynamodb_store: Callable[[], NonceStore]) -> NonceStore:
+    """
+    STORE_BACKENDのnonceの保存先を返す (プロセスで1つ)。
+    nonceのテーブルモデルは関数ごとに定義されるため、DynamoDBの保存先は呼び出し側から渡す。
+    """
+    if STORE_BACKEND == STORE_BACKEND_SQLITE:
+        from store.sqlite_store import SQLiteNonceStore, sqlite_database
+        return SQLiteNonceStore(sqlite_database())
+    if STORE_BACKEND == STORE_BACKEND_MEMORY:
+        from store.memory_store import MemoryNonceStore
+        return MemoryNonceStore()
+    return dynamodb_store()
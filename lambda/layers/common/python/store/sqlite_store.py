@@ -0,0 +1,192 @@
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink, DelibirdLinkInactiveStatus
+from store.link_store import LinkStore, STORE_SQLITE_PATH, serialize_new_link
+from store.nonce_store import NonceStore, DelibirdNonce
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+logger = setup_logger("delibird.sqlite_store", logging.INFO)
+
+# 書き込みのロックを待機する秒数 (他のプロセス・スレッドが書き込み中の場合)
+_BUSY_TIMEOUT_SECONDS = float(get_env_var("STORE_SQLITE_BUSY_TIMEOUT_SECONDS", 5))
+# 期限切れのnonceを削除する間隔 (DynamoDBのTTLの代わり)
+_NONCE_PURGE_INTERVAL_SECONDS = 60
+# 接続ごとにキャッシュする準備済みの文 (このモジュールの文が全て収まる数)
+_CACHED_STATEMENTS = 64
+
+_SCHEMA = (
+    # リンクのアイテムはDelibirdLinkTableModelをシリアライズした属性(DynamoDBの型付きのJSON)をそのまま保持する
+    "CREATE TABLE IF NOT EXISTS links (domain TEXT NOT NULL, slug TEXT NOT NULL, item TEXT NOT NULL, "
+    "PRIMARY KEY (domain, slug)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS link_uses (domain TEXT NOT NULL, slug TEXT NOT NULL, "
+    "unlimited_uses INTEGER NOT NULL DEFAULT 0, limited_uses INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (domain, slug)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS domain_meta (domain TEXT NOT NULL PRIMARY KEY, cache_version INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS nonces (nonce TEXT NOT NULL PRIMARY KEY, domain TEXT NOT NULL, slug TEXT NOT NULL, "
+    "expired_timestamp INTEGER NOT NULL, used_at TEXT) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS nonces_expired_timestamp ON nonces (expired_timestamp)",
+)
+
+# 条件付きの書き込みは、全て1つの文(条件を満たす場合のみ書き込む)で行う
+_GET_LINK = "SELECT item FROM links WHERE domain = ? AND slug = ?"
+_PUT_LINK = "INSERT INTO links (domain, slug, item) VALUES (?, ?, ?) ON CONFLICT (domain, slug) DO NOTHING"
+_QUERY_LINKS = "SELECT item FROM links WHERE domain = ? AND slug > ? ORDER BY slug LIMIT ?"
+_MARK_MAX_USES_EXCEEDED = (
+    "UPDATE links SET item = json_set(item, '$.inactive_status', json_object('S', ?)) "
+    "WHERE domain = ? AND slug = ? AND json_extract(item, '$.inactive_status') IS NULL "
+    "AND CAST(json_extract(item, '$.max_uses.N') AS INTEGER) = ?"
+)
+_LOAD_USES = "SELECT unlimited_uses, limited_uses FROM link_uses WHERE domain = ? AND slug = ?"
+_ADD_USES = (
+    "INSERT INTO link_uses (domain, slug, unlimited_uses) VALUES (?, ?, ?) "
+    "ON CONFLICT (domain, slug) DO UPDATE SET unlimited_uses = unlimited_uses + excluded.unlimited_uses"
+)
+_INCREMENT_USES = (
+    "INSERT INTO link_uses (domain, slug, limited_uses) VALUES (?, ?, 1) "
+    "ON CONFLICT (domain, slug) DO UPDATE SET limited_uses = limited_uses + 1 WHERE limited_uses < ? RETURNING limited_uses"
+)
+_GET_CACHE_VERSION = "SELECT cache_version FROM domain_meta WHERE domain = ?"
+_BUMP_CACHE_VERSION = (
+    "INSERT INTO domain_meta (domain, cache_version) VALUES (?, 1) "
+    "ON CONFLICT (domain) DO UPDATE SET cache_version = cache_version + 1 RETURNING cache_version"
+)
+_PUT_NONCE = ("INSERT INTO nonces (nonce, domain, slug, expired_timestamp, used_at) VALUES (?, ?, ?, ?, ?) "
+              "ON CONFLICT (nonce) DO NOTHING")
+_GET_NONCE = "SELECT domain, slug, expired_timestamp, used_at FROM nonces WHERE nonce = ?"
+_MARK_NONCE_USED = "UPDATE nonces SET used_at = ? WHERE nonce = ? AND used_at IS NULL"
+_PURGE_NONCES = "DELETE FROM nonces WHERE expired_timestamp <= ?"
+
+
+class SQLiteDatabase:
+    """
+    SQLiteのファイルへのスレッドごとの接続 (WALモード)。読み込みは書き込みと並行して行われ、書き込みはファイル単位で直列化される。
+    接続はプロセスのfork後に生成し直す。各文は自動コミットされ、準備済みの文は接続ごとにキャッシュされて再利用される。
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._path, timeout=_BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                     cached_statements=_CACHED_STATEMENTS)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WALモードでは、コミットごとのfsyncを省略してもデータベースの整合性は保たれる (電源断時に直前のコミットのみ失われうる)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if self._schema_pid != os.getpid():
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+                self._schema_pid = os.getpid()
+                logger.info(f"Opened SQLite store: {self._path}")
+        return connection
+
+    def connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.connection = self._connect()
+            self._local.pid = pid
+        return self._local.connection
+
+    def execute(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+
+
+@functools.cache
+def sqlite_database() -> SQLiteDatabase:
+    """STORE_SQLITE_PATHのデータベース (リンクとnonceの保存先で共有する)"""
+    return SQLiteDatabase(STORE_SQLITE_PATH)
+
+
+class SQLiteLinkStore(LinkStore):
+    """ローカルのSQLiteのファイルに保持する保存先 (1台のサーバーでのセルフホスト用。複数のワーカープロセスで共有できる)"""
+
+    def __init__(self, database: SQLiteDatabase):
+        self._database = database
+
+    def get_link(self, domain: str, slug: str, consistent_read: bool = False) -> Optional[DelibirdLink]:
+        row = self._database.execute(_GET_LINK, (domain, slug)).fetchone()
+        if row is None:
+            return None
+        return DelibirdLink.from_model(DelibirdLinkTableModel.from_raw_data(json.loads(row[0])))
+
+    def put_link(self, model: DelibirdLinkTableModel) -> bool:
+        item = json.dumps(serialize_new_link(model), ensure_ascii=False, separators=(",", ":"))
+        return self._database.execute(_PUT_LINK, (model.domain, model.slug, item)).rowcount == 1
+
+    def query_links(self, domain: str, start_slug: Optional[str] = None, limit: Optional[int] = None,
+                    consistent_read: bool = False) -> Iterator[DelibirdLinkTableModel]:
+        # LIMITに負の値を指定すると上限なしになる
+        rows = self._database.execute(_QUERY_LINKS, (domain, start_slug or "", limit if limit is not None else -1)).fetchall()
+        for (item,) in rows:
+            yield DelibirdLinkTableModel.from_raw_data(json.loads(item))
+
+    def load_uses(self, domain: str, slug: str, consistent_read: bool = True) -> tuple[int, int]:
+        row = self._database.execute(_LOAD_USES, (domain, slug)).fetchone()
+        return (int(row[0]), int(row[1])) if row is not None else (0, 0)
+
+    def add_uses(self, domain: str, slug: str, count: int) -> None:
+        self._database.execute(_ADD_USES, (domain, slug, count))
+
+    def increment_uses(self, domain: str, slug: str, limit: int) -> Optional[int]:
+        if limit <= 0:
+            return None
+        # 全ての行を読み込んで文を完了させる (RETURNINGの文は完了するまで書き込みのロックを保持する)
+        rows = self._database.execute(_INCREMENT_USES, (domain, slug, limit)).fetchall()
+        return int(rows[0][0]) if rows else None
+
+    def mark_max_uses_exceeded(self, domain: str, slug: str, max_uses: int) -> bool:
+        status = DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED.name
+        return self._database.execute(_MARK_MAX_USES_EXCEEDED, (status, domain, slug, max_uses)).rowcount == 1
+
+    def get_cache_version(self, domain: str) -> int:
+        row = self._database.execute(_GET_CACHE_VERSION, (domain,)).fetchone()
+        return int(row[0]) if row is not None else 0
+
+    def bump_cache_version(self, domain: str) -> int:
+        return int(self._database.execute(_BUMP_CACHE_VERSION, (domain,)).fetchall()[0][0])
+
+
+class SQLiteNonceStore(NonceStore):
+    """ローカルのSQLiteのファイルに保持するnonceの保存先。期限切れのnonceは保存時に定期的に削除する"""
+
+    def __init__(self, database: SQLiteDatabase):
+        self._database = database
+        self._purged_at = 0.0
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        if now - self._purged_at < _NONCE_PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        try:
+            self._database.execute(_PURGE_NONCES, (int(time.time()),))
+        except sqlite3.Error:
+            logger.exception("Failed to purge expired nonces.")
+
+    def put_nonce(self, nonce: DelibirdNonce) -> bool:
+        self._purge_expired()
+        used_at = nonce.used_at.isoformat() if nonce.used_at is not None else None
+        cursor = self._database.execute(_PUT_NONCE, (nonce.nonce, nonce.domain, nonce.slug, nonce.expired_timestamp, used_at))
+        return cursor.rowcount == 1
+
+    def get_nonce(self, nonce: str) -> Optional[DelibirdNonce]:
+        row = self._database.execute(_GET_NONCE, (nonce,)).fetchone()
+        if row is None:
+            return None
+        domain, slug, expired_timestamp, used_at = row
+        return DelibirdNonce(nonce=nonce, domain=domain, slug=slug, expired_timestamp=int(expired_timestamp),
+                             used_at=datetime.fromisoformat(used_at) if used_at is not None else None)
+
+    def mark_used(self, nonce: str, used_at: datetime) -> bool:
+        return self._database.execute(_MARK_NONCE_USED, (used_at.isoformat(), nonce)).rowcount == 1
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Collection
+from urllib.parse import quote
+
+from util.date_util import get_jst_datetime_now
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+logger = setup_logger("delibird.cdn_purge", logging.INFO)
+
+# パージの方法 ("cloudfront": CloudFrontの無効化, "file": ローカルのファイル(JSON Lines)に記録, "none": パージしない)
+_HOOK = str(get_env_var("CDN_PURGE_HOOK", "none"))
+_FILE_PATH = str(get_env_var("CDN_PURGE_FILE", "/tmp/delibird-cdn-purge.jsonl"))
+# ドメインごとのCloudFrontのディストリビューションID ({"link.example.com": "E1234567890ABC"})
+_DISTRIBUTIONS: dict[str, str] = get_env_var("CDN_PURGE_DISTRIBUTIONS", {})
+# 1回のパージで指定するパスの上限 (超える場合はドメイン全体をパージする)
+_MAX_PATHS = int(get_env_var("CDN_PURGE_MAX_PATHS", 10))
+_LINK_PREFIX = os.environ.get("LINK_PREFIX", "")
+
+
+def _purge_paths(slugs: Collection[str]) -> list[str]:
+    """slugのリダイレクト(クエリパラメータ違いを含む)をパージするパスを返す"""
+    prefix = f"/{_LINK_PREFIX}" if _LINK_PREFIX else ""
+    if len(slugs) > _MAX_PATHS:
+        return [f"{prefix}/*"]
+    return [f"{prefix}/{quote(slug)}*" for slug in sorted(slugs)]
+
+
+def _purge_cloudfront(domain: str, paths: list[str]) -> None:
+    distribution_id = _DISTRIBUTIONS.get(domain)
+    if distribution_id is None:
+        logger.debug(f"No CloudFront distribution for domain: {domain}, skip purge.")
+        return
+    # CloudFrontのクライアントは、パージを行うコンテナでのみ初期化する
+    import boto3
+
+    boto3.client("cloudfront").create_invalidation(
+        DistributionId=distribution_id,
+        InvalidationBatch={"Paths": {"Quantity": len(paths), "Items": paths}, "CallerReference": str(uuid.uuid4())},
+    )
+
+
+def _purge_file(domain: str, paths: list[str]) -> None:
+    with open(_FILE_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"domain": domain, "paths": paths, "purged_at": get_jst_datetime_now().isoformat()}) + "\n")
+
+
+def purge_links(domain: str, slugs: Collection[str]) -> None:
+    """共有キャッシュ(CDN)に保存されたリンクのリダイレクトをパージする。失敗した場合はキャッシュの期限切れを待つ"""
+    if (_HOOK == "none") or (not slugs):
+        return
+    paths = _purge_paths(slugs)
+    started_at = time.perf_counter()
+    try:
+        match _HOOK:
+            case "cloudfront":
+                _purge_cloudfront(domain, paths)
+            case "file":
+                _purge_file(domain, paths)
+            case _:
+                logger.error(f"Unknown CDN purge hook: {_HOOK}")
+                return
+    except Exception:
+        logger.exception(f"Failed to purge CDN cache for domain: {domain}, paths: {paths}")
+        return
+    logger.info(f"Purged CDN cache for domain: {domain}, paths: {paths}, elapsed: {time.perf_counter() - started_at:.3f}s")
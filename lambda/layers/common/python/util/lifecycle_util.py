@@ -0,0 +1,148 @@
+import functools
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger
+
+_RUNTIME_API: Optional[str] = os.environ.get("AWS_LAMBDA_RUNTIME_API")
+_EXTENSION_ENABLED = bool(get_env_var("LIFECYCLE_EXTENSION_ENABLED", True))
+_EXTENSION_NAME = "delibird-after-invocation"
+_EXTENSION_API_PATH = "/2020-01-01/extension"
+
+logger = setup_logger("delibird.lifecycle", logging.INFO)
+# プロセス内で登録されたフック (drain_after_invocationで使用)
+_REGISTERED_HOOKS: list["_AfterInvocationHooks"] = []
+# drain_after_invocationが呼び出されたか (プロセスの終了前)
+_draining = threading.Event()
+
+
+class _AfterInvocationHooks:
+    """
+    Lambdaハンドラーの呼び出しが完了した後(レスポンスの返却後)に、登録されたコールバックを実行する。
+
+    Lambda上では同じプロセス内で動作する拡張機能(internal extension)としてExtensions APIに登録し、
+    INVOKEイベントごとにハンドラーの完了を待ってからコールバックを実行する。
+    Lambdaは拡張機能が次のイベントを要求するまでコンテナを凍結しないため、バッファされた書き込みが凍結で失われない。
+    (コールバックの実行時間はレスポンスのレイテンシには含まれないが、呼び出しの実行時間には含まれる)
+    Extensions APIが使用できない環境(ローカルなど)では、呼び出しの完了ごとにバックグラウンドのスレッドで実行する(凍結で失われる可能性がある)。
+    """
+
+    def __init__(self, callbacks: tuple[Callable[[], object], ...]):
+        self._callbacks = callbacks
+        self._invocation_completed = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._scheduled = False
+        if not (_EXTENSION_ENABLED and _RUNTIME_API and self._start_extension()):
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="delibird-after-invocation")
+        _REGISTERED_HOOKS.append(self)
+
+    def _start_extension(self) -> bool:
+        try:
+            connection = http.client.HTTPConnection(_RUNTIME_API)
+            connection.request("POST", f"{_EXTENSION_API_PATH}/register", body=json.dumps({"events": ["INVOKE"]}),
+                               headers={"Lambda-Extension-Name": _EXTENSION_NAME})
+            response = connection.getresponse()
+            response.read()
+            extension_id = response.getheader("Lambda-Extension-Identifier")
+            if (response.status != 200) or (not extension_id):
+                raise RuntimeError(f"Extension registration returned {response.status}.")
+        except Exception:
+            logger.warning("Failed to register the after-invocation extension. Falling back to background threads.",
+                           exc_info=True)
+            return False
+        threading.Thread(target=self._run_extension, args=(connection, extension_id), name=_EXTENSION_NAME,
+                         daemon=True).start()
+        return True
+
+    def _run_extension(self, connection: http.client.HTTPConnection, extension_id: str) -> None:
+        try:
+            while True:
+                # 次のイベントまでブロックする (呼び出しのない間はコンテナごと凍結される)
+                connection.request("GET", f"{_EXTENSION_API_PATH}/event/next",
+                                   headers={"Lambda-Extension-Identifier": extension_id})
+                response = connection.getresponse()
+                event = json.loads(response.read())
+                if event.get("eventType") != "INVOKE":
+                    self._run_callbacks()
+                    return
+                deadline_ms = event.get("deadlineMs")
+                self._invocation_completed.wait(max(deadline_ms / 1000 - time.time(), 0) if deadline_ms else None)
+                self._invocation_completed.clear()
+                self._run_callbacks()
+        except Exception:
+            # Extensions APIとの通信に失敗した場合、Lambdaは実行環境をエラーとして再起動する
+            logger.exception("After-invocation extension stopped.")
+
+    def _run_callbacks(self) -> None:
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("After-invocation callback %s failed.", getattr(callback, "__qualname__", callback))
+
+    def _run_scheduled_callbacks(self) -> None:
+        with self._lock:
+            self._scheduled = False
+        self._run_callbacks()
+
+    def complete(self) -> None:
+        if self._executor is None:
+            self._invocation_completed.set()
+            return
+        # 実行待ちのコールバックがある場合は、その実行にまとめる
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.submit(self._run_scheduled_callbacks)
+
+    def drain(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._run_callbacks()
+
+
+def drain_after_invocation() -> None:
+    """
+    Lambda以外で常駐するプロセス(server/standalone_server.py)の終了前に呼び出し、
+    実行中のコールバックの完了を待ってから全てのコールバックをもう1度実行して、バッファされた書き込みを完了させる。
+    """
+    _draining.set()
+    for hooks in _REGISTERED_HOOKS:
+        hooks.drain()
+
+
+def is_draining() -> bool:
+    """
+    プロセスの終了前の実行か(drain_after_invocationが呼び出されたか)を返す。
+    間隔を空けて書き込むバッファを持つコールバックは、この場合は保持している内容を全て書き込むこと。
+    """
+    return _draining.is_set()
+
+
+def after_invocation(*callbacks: Callable[[], object]) -> Callable:
+    """
+    Lambdaハンドラーの呼び出しが完了するたびに、レスポンスの返却後(コンテナの凍結前)にcallbacksを順に実行するデコレーター。
+    拡張機能の登録は初期化フェーズで行う必要があるため、モジュールの読み込み時にハンドラーへ適用すること。
+    """
+    hooks = _AfterInvocationHooks(callbacks)
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                hooks.complete()
+
+        return wrapper
+
+    return decorator
@@ -1,16 +1,24 @@
+import functools
+import json
 import logging
 import os
+import random
 import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
 
-_FORMAT = '%(levelname)s %(asctime)s [%(name)s - %(funcName)s] %(message)s'
-_HANDLER = logging.StreamHandler(sys.stdout)
-_HANDLER.setLevel(logging.DEBUG)
-_HANDLER.setFormatter(logging.Formatter(_FORMAT))
-_HANDLER.addFilter(lambda record: record.levelno < logging.ERROR)
+from util.environment_util import get_env_var
 
-_ERROR_HANDLER = logging.StreamHandler(sys.stderr)
-_ERROR_HANDLER.setLevel(logging.ERROR)
-_ERROR_HANDLER.setFormatter(logging.Formatter(_FORMAT))
+_IS_DEV = (os.environ.get("DELIBIRD_ENV") == "dev")
+# ロガーのレベル (これより低いレベルはLogRecord自体を生成しない)
+_LOG_LEVEL: int = logging.getLevelNamesMapping()[str(get_env_var("LOG_LEVEL", "DEBUG" if _IS_DEV else "INFO")).upper()]
+# 呼び出しがエラーにならなかった場合に出力する割合 (レベル名ごと。指定のないレベルは全て出力する)
+_SAMPLE_RATES: dict[str, float] = {
+    "DEBUG": 1.0 if _IS_DEV else 0.0,
+    "INFO": 1.0 if _IS_DEV else 0.01,
+    **get_env_var("LOG_SAMPLE_RATES", {}),
+}
 
 """
 _LOG_FILE = Path(os.environ.get("DELIBIRD_LOG", str(Path(__file__).parent.parent.parent / "log" / "application.log"))).resolve()
@@ -26,18 +34,143 @@ _LOG_FILE_HANDLER.setFormatter(logging.Formatter(_FORMAT))
 """
 
 
-def setup_logger(name: str, level: int = logging.DEBUG):
+class _JsonFormatter(logging.Formatter):
+    """LogRecordを1行のJSONへ変換する。メッセージの%書式の展開は、出力が決まったこの時点まで遅延される"""
+
+    def format(self, record: logging.LogRecord, fields: Optional[dict[str, Any]] = None) -> str:
+        document = {
+            "level": record.levelname,
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "function": record.funcName,
+            "message": record.getMessage(),
+            **(fields or {}),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+class _InvocationLogHandler(logging.Handler):
+    """
+    Lambdaの呼び出し中に記録されたログをメモリ上にためておき、呼び出しの終了時に1回の書き込みで標準出力へ出力する。
+    呼び出しがエラーになった場合(ERROR以上のログ・例外・5xxのレスポンス)は全てのログを、
+    それ以外の場合はレベルごとのサンプリング率で呼び出し単位に選ばれたログのみを出力する。
+    呼び出しの外(初期化フェーズ)やバックグラウンドのスレッドで記録されたログは、その場で出力する。
+    """
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.formatter = _JsonFormatter()
+        self._thread_id: Optional[int] = None
+        self._buffer: list[logging.LogRecord | str] = []
+        self._has_error = False
+        self._sampling = True
+        self._sample_point = 0.0
+        self._fields: dict[str, Any] = {}
+
+    def begin(self, sampling: bool) -> None:
+        self._thread_id = threading.get_ident()
+        self._buffer = []
+        self._has_error = False
+        self._sampling = sampling
+        self._sample_point = random.random()
+        self._fields = {}
+
+    def set_fields(self, fields: dict[str, Any]) -> None:
+        self._fields.update(fields)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if threading.get_ident() != self._thread_id:
+            self._write([self.format(record)])
+            return
+        self._buffer.append(record)
+        if record.levelno >= logging.ERROR:
+            self._has_error = True
+
+    def write_line(self, line: str) -> None:
+        if threading.get_ident() != self._thread_id:
+            self._write([line])
+        else:
+            # サンプリングの対象にしない行 (EMFのメトリクスなど)
+            self._buffer.append(line)
+
+    def end(self, failed: bool) -> None:
+        keep_all = failed or self._has_error or (not self._sampling)
+        lines = []
+        try:
+            for item in self._buffer:
+                if isinstance(item, str):
+                    lines.append(item)
+                elif keep_all or (self._sample_point < _SAMPLE_RATES.get(item.levelname, 1.0)):
+                    lines.append(self.formatter.format(item, self._fields))
+        finally:
+            self._thread_id = None
+            self._buffer = []
+            self._fields = {}
+        if lines:
+            self._write(lines)
+
+    def _write(self, lines: list[str]) -> None:
+        try:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+        except Exception:
+            self.handleError(None)
+
+
+_HANDLER = _InvocationLogHandler()
+
+
+def setup_logger(name: str, level: Optional[int] = None):
     logger: logging.Logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(_LOG_LEVEL if level is None else max(level, _LOG_LEVEL))
     logger.addHandler(_HANDLER)
-    logger.addHandler(_ERROR_HANDLER)
+    # Lambdaのランタイムがルートロガーに設定するハンドラーで二重に出力されないようにする
+    logger.propagate = False
     # logger.addHandler(_LOG_FILE_HANDLER)
     return logger
 
 
 def setup_dev_logger():
-    if os.environ.get("DELIBIRD_ENV") != "dev":
+    if not _IS_DEV:
         return
     log_pynamodb = logging.getLogger("pynamodb")
     log_pynamodb.setLevel(logging.DEBUG)
     log_pynamodb.addHandler(_HANDLER)
+    log_pynamodb.propagate = False
+
+
+def set_log_fields(**fields: Any) -> None:
+    """呼び出し中に出力する全てのログへ、構造化されたフィールド(ドメイン・slugなど)を追加する"""
+    _HANDLER.set_fields(fields)
+
+
+def write_log_line(line: str) -> None:
+    """整形済みの1行(JSON)を、呼び出しのログと同じ書き込みでサンプリングせずに出力する"""
+    _HANDLER.write_line(line)
+
+
+def buffer_invocation_logs(sampling: bool = True) -> Callable:
+    """
+    Lambdaハンドラーの呼び出しごとにログをバッファし、終了時に1回の書き込みで出力するデコレーター。
+    sampling=Falseの場合は、エラーの有無にかかわらず全てのログを出力する(管理画面の操作ログなど)。
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            _HANDLER.begin(sampling)
+            failed = True
+            try:
+                response = handler(event, context)
+                status_code = response.get("statusCode") if isinstance(response, dict) else None
+                failed = (status_code is None) or (status_code >= 500)
+                return response
+            finally:
+                _HANDLER.end(failed)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,124 @@
+import functools
+import json
+import threading
+import time
+from http import HTTPStatus
+from typing import Callable, Optional
+
+from util.environment_util import get_env_var
+from util.logger_util import write_log_line
+
+_ENABLED = bool(get_env_var("STAGE_METRICS_ENABLED", True))
+_NAMESPACE = str(get_env_var("METRICS_NAMESPACE", "Delibird"))
+_UNKNOWN_DIMENSION = "unknown"
+
+
+def classify_outcome(status_code: Optional[int]) -> str:
+    """レスポンスのステータスコードから、メトリクスのoutcomeディメンションの値を返す"""
+    if status_code is None:
+        return "error"
+    status = HTTPStatus(status_code)
+    if status.is_redirection:
+        return "redirect"
+    if status is HTTPStatus.UNAUTHORIZED:
+        return "protected"
+    if status is HTTPStatus.NOT_FOUND:
+        return "404"
+    if status.is_success:
+        return "success"
+    return "error"
+
+
+class StageTimer:
+    """
+    1回の呼び出しの処理段階(ステージ)ごとの所要時間とDynamoDB呼び出し回数を記録し、
+    CloudWatch Embedded Metric Format(EMF)のJSONとして標準出力へ出力する。
+    mark()は前回のmark()(または呼び出しの開始)からの経過時間を、指定したステージの所要時間として記録する。
+    """
+
+    def __init__(self, service: str, *, final_stage: str = "response"):
+        self._service = service
+        self._final_stage = final_stage
+        self._thread_id: Optional[int] = None
+        self._started_ns = 0
+        self._last_mark_ns = 0
+        self._stage_ns: dict[str, int] = {}
+        self._stage_ddb_calls: dict[str, int] = {}
+        self._ddb_calls = 0
+        self._domain = _UNKNOWN_DIMENSION
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._started_ns = self._last_mark_ns = time.perf_counter_ns()
+        self._stage_ns = {}
+        self._stage_ddb_calls = {}
+        self._ddb_calls = 0
+        self._domain = _UNKNOWN_DIMENSION
+
+    def set_domain(self, domain: str) -> None:
+        self._domain = domain
+
+    def mark(self, stage: str) -> None:
+        if not _ENABLED:
+            return
+        now = time.perf_counter_ns()
+        self._stage_ns[stage] = self._stage_ns.get(stage, 0) + (now - self._last_mark_ns)
+        if self._ddb_calls:
+            self._stage_ddb_calls[stage] = self._stage_ddb_calls.get(stage, 0) + self._ddb_calls
+            self._ddb_calls = 0
+        self._last_mark_ns = now
+
+    def record_ddb_call(self, *_args, **_kwargs) -> None:
+        # バックグラウンドのスレッド(使用回数の書き込みなど)からの呼び出しは、リクエストの処理に含めない
+        if threading.get_ident() == self._thread_id:
+            self._ddb_calls += 1
+
+    def emit(self, outcome: str) -> None:
+        if not _ENABLED:
+            return
+        self.mark(self._final_stage)
+        metrics = {f"{stage}_ms": ns / 1e6 for stage, ns in self._stage_ns.items()}
+        metrics["total_ms"] = (self._last_mark_ns - self._started_ns) / 1e6
+        metrics["ddb_calls"] = sum(self._stage_ddb_calls.values())
+
+        properties = json.dumps({
+            "service": self._service,
+            "domain": self._domain,
+            "outcome": outcome,
+            **metrics,
+            # ステージごとのDynamoDB呼び出し回数はメトリクスにせず、ログの検索用に出力する
+            "ddb_calls_by_stage": self._stage_ddb_calls,
+        }, separators=(",", ":"))
+        # 呼び出しのログと同じ書き込みで出力する (サンプリングの対象外)
+        write_log_line(f'{{"_aws":{{"Timestamp":{int(time.time() * 1000)},'
+                       f'"CloudWatchMetrics":{_metric_declaration(tuple(metrics))}}},{properties[1:]}')
+
+
+@functools.cache
+def _metric_declaration(metric_names: tuple[str, ...]) -> str:
+    # メトリクスの定義は通過したステージの組み合わせごとに同じため、シリアライズした結果を再利用する
+    return json.dumps([{
+        "Namespace": _NAMESPACE,
+        "Dimensions": [["service", "domain", "outcome"]],
+        "Metrics": [{"Name": name, "Unit": "Count" if name == "ddb_calls" else "Milliseconds"} for name in metric_names],
+    }], separators=(",", ":"))
+
+
+def emit_stage_metrics(timer: StageTimer) -> Callable:
+    """Lambdaハンドラーの呼び出しごとにStageTimerを初期化し、レスポンスのステータスコードに応じたoutcomeでメトリクスを出力するデコレーター"""
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            timer.start()
+            status_code = None
+            try:
+                response = handler(event, context)
+                status_code = response.get("statusCode") if isinstance(response, dict) else None
+                return response
+            finally:
+                timer.emit(classify_outcome(status_code))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,62 @@
+import functools
+from typing import Any, Callable, Optional
+
+
+class CaseInsensitiveDict(dict):
+    """キーを小文字に正規化して保持する辞書 (HTTPヘッダー用)"""
+
+    def __init__(self, data: Optional[dict[str, Any]] = None):
+        super().__init__((k.lower(), v) for k, v in (data or {}).items())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return super().get(key.lower(), default)
+
+    def __getitem__(self, key: str) -> Any:
+        return super().__getitem__(key.lower())
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and super().__contains__(key.lower())
+
+
+class DelibirdRequest:
+    """
+    各ページが使用するリクエスト情報のみを保持する軽量なリクエスト。
+    API Gatewayのプロキシイベント(REST API)から生成し、aws_lambda_powertoolsのAPIGatewayProxyEventと同じ属性名で参照できる。
+    """
+    __slots__ = ("http_method", "headers", "path_parameters", "resolved_query_string_parameters", "body")
+
+    def __init__(self, http_method: str, headers: dict[str, str], path_parameters: dict[str, str],
+                 resolved_query_string_parameters: dict[str, list[str]], body: Optional[str]):
+        self.http_method = http_method
+        self.headers = CaseInsensitiveDict(headers)
+        self.path_parameters = path_parameters
+        self.resolved_query_string_parameters = resolved_query_string_parameters
+        self.body = body
+
+    @classmethod
+    def from_apigateway_event(cls, event: dict[str, Any]) -> "DelibirdRequest":
+        single_value = {k: v.split(",") for k, v in (event.get("queryStringParameters") or {}).items()}
+        multi_value = event.get("multiValueQueryStringParameters") or {}
+        return cls(
+            http_method=event["httpMethod"],
+            headers=event.get("headers") or {},
+            path_parameters=event.get("pathParameters") or {},
+            # 複数値のクエリパラメータを優先し、単一値で不足分を補う
+            resolved_query_string_parameters={**single_value, **multi_value},
+            body=event.get("body"),
+        )
+
+
+def apigateway_event(handler: Callable[[DelibirdRequest, Any], Any]) -> Callable[[dict[str, Any], Any], Any]:
+    """
+    Lambdaハンドラーが受け取ったAPI GatewayのイベントをDelibirdRequestに変換するデコレーター。
+    DelibirdRequestを直接受け取った場合(server/standalone_server.pyなど)は、そのまま渡す。
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event: dict[str, Any] | DelibirdRequest, context: Any):
+        if isinstance(event, DelibirdRequest):
+            return handler(event, context)
+        return handler(DelibirdRequest.from_apigateway_event(event), context)
+
+    return wrapper
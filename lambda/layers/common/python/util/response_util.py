@@ -1,3 +1,4 @@
+import functools
 import html
 import json
 import os
@@ -5,17 +6,21 @@ from http import HTTPStatus
 from typing import Optional
 
 from util.environment_util import get_env_var
-from util.static_resource_util import load_static_html
 
 _IS_DEV = (os.environ.get("DELIBIRD_ENV") == "dev")
 _COMMIT_HASH = str(get_env_var("COMMIT_HASH", "")) if _IS_DEV else ""
 STATIC_FOOTER: Optional[str] = html.escape(get_env_var("STATIC_FOOTER", ""))
 
 
+@functools.cache
 def _load_error_html(status: HTTPStatus) -> tuple[Optional[str], bool]:
+    # コンテキストがSTATIC_FOOTERのみで変化しないため、ステータスごとにコンテナ内で1度だけ描画する
     if not (status.is_client_error or status.is_server_error):
         raise ValueError("Status code must be a client error (4xx) or server error (5xx).")
 
+    # テンプレートエンジン(jinja2)はエラーページの初回描画時まで読み込まない
+    from util.static_resource_util import load_static_html
+
     # 該当するステータスコードのHTMLを探す
     html_content = load_static_html(
         f"error/{status.value}.html",
@@ -25,8 +30,9 @@ def _load_error_html(status: HTTPStatus) -> tuple[Optional[str], bool]:
 
 
 def _build_csp_header(*, use_css: bool = False, use_bootstrap: bool = False, use_bootstrap_icons: bool = False, use_self_api: bool = False,
-                      style_nonce: str = None, script_nonce: str = None) -> str:
+                      use_self_script: bool = False, style_nonce: str = None, script_nonce: str = None) -> str:
     script_origin = [
+        "'self'" if use_self_script else None,
         "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/" if use_bootstrap else None,
         f"'nonce-{script_nonce}'" if script_nonce else None
     ]
@@ -69,12 +75,14 @@ def _build_csp_header(*, use_css: bool = False, use_bootstrap: bool = False, use
 
 def _generate_response_headers(content_type: str = None, *,
                                use_css: bool = False, use_bootstrap: bool = False, use_bootstrap_icons: bool = False, use_self_api: bool = False,
-                               style_nonce: str = None, script_nonce: str = None) -> dict[str, str]:
+                               use_self_script: bool = False, style_nonce: str = None, script_nonce: str = None,
+                               cache_max_age: Optional[int] = None, shared_cache_max_age: Optional[int] = None,
+                               stale_while_revalidate: int = 0) -> dict[str, str]:
     headers = {
         "Content-Type": content_type or "application/json;charset=utf-8",
         "Content-Security-Policy": _build_csp_header(
             use_css=use_css, use_bootstrap=use_bootstrap, use_bootstrap_icons=use_bootstrap_icons, use_self_api=use_self_api,
-            style_nonce=style_nonce, script_nonce=script_nonce),
+            use_self_script=use_self_script, style_nonce=style_nonce, script_nonce=script_nonce),
         "Cache-Control": "private, no-cache, no-store, max-age=0, must-revalidate",
         "Pragma": "no-cache",
         "Referrer-Policy": "same-origin",
@@ -83,6 +91,14 @@ def _generate_response_headers(content_type: str = None, *,
         "X-Robots-Tag": "noindex, nofollow",
         "Strict-Transport-Security": "max-age=31536000; preload",
     }
+    if cache_max_age is not None:
+        # 利用者ごとのデータを含まない(ドメインごとに同一の)レスポンスのみ、ブラウザでのキャッシュを許可する
+        headers["Cache-Control"] = f"private, max-age={cache_max_age}"
+        del headers["Pragma"]
+    elif shared_cache_max_age is not None:
+        # 共有キャッシュ(CDN)のみに保存させ、ブラウザには毎回CDNへリクエストさせる (アクセスログから使用回数を集計するため)
+        headers["Cache-Control"] = f"public, max-age=0, s-maxage={shared_cache_max_age}, stale-while-revalidate={stale_while_revalidate}"
+        del headers["Pragma"]
 
     if _IS_DEV:
         # 開発環境(local)用にCORS許可
@@ -111,27 +127,35 @@ def error_response(status: HTTPStatus, force_json: bool = False):
 
 def success_response(status: HTTPStatus, body: str | dict, content_type: str = None, *,
                      use_css: bool = False, use_bootstrap: bool = False, use_bootstrap_icons: bool = False, use_self_api: bool = False,
-                     style_nonce: str = None, script_nonce: str = None):
+                     use_self_script: bool = False, style_nonce: str = None, script_nonce: str = None, cache_max_age: Optional[int] = None):
     return {
         "statusCode": status.value,
         "headers": _generate_response_headers(
             content_type,
             use_css=use_css, use_bootstrap=use_bootstrap, use_bootstrap_icons=use_bootstrap_icons, use_self_api=use_self_api,
-            style_nonce=style_nonce, script_nonce=script_nonce),
+            use_self_script=use_self_script, style_nonce=style_nonce, script_nonce=script_nonce, cache_max_age=cache_max_age),
         "body": body if isinstance(body, str) else json.dumps(body),
     }
 
 
-def redirect_response(redirect_url: str, status: HTTPStatus = HTTPStatus.FOUND):
+@functools.cache
+def _redirect_response_headers(shared_cache_max_age: Optional[int], stale_while_revalidate: int) -> dict[str, str]:
+    # リダイレクトのレスポンスヘッダーはLocation以外変化しないため、キャッシュの設定ごとにコンテナ内で1度だけ生成する
+    headers = _generate_response_headers(shared_cache_max_age=shared_cache_max_age, stale_while_revalidate=stale_while_revalidate)
+    del headers["Content-Type"]
+    return headers
+
+
+def redirect_response(redirect_url: str, status: HTTPStatus = HTTPStatus.FOUND, *,
+                      shared_cache_max_age: Optional[int] = None, stale_while_revalidate: int = 0):
+    """リダイレクトのレスポンスを返す。shared_cache_max_ageを指定した場合は、共有キャッシュ(CDN)への保存を許可する"""
     if not status.is_redirection:
         raise ValueError(f"Status code {status} is not a redirection status.")
-    headers = _generate_response_headers()
-    del headers["Content-Type"]
 
     return {
         "statusCode": status.value,
         "headers": {
-            **headers,
+            **_redirect_response_headers(shared_cache_max_age, stale_while_revalidate),
             "Location": redirect_url
         },
         "body": ""
@@ -0,0 +1,46 @@
+import base64
+import hashlib
+import hmac
+import json
+from typing import Any
+
+_TOKEN_SEPARATOR = "."
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(message: str, key: bytes) -> str:
+    return _b64encode(hmac.new(key, message.encode("ascii"), hashlib.sha256).digest())
+
+
+def encode_signed_token(payload: dict[str, Any], key: bytes) -> str:
+    """payloadをURLセーフな文字列にエンコードし、HMAC-SHA256の署名を付与する"""
+    if not key:
+        raise ValueError("Signing key is required.")
+    message = _b64encode(json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    return f"{message}{_TOKEN_SEPARATOR}{_signature(message, key)}"
+
+
+def decode_signed_token(token: str, key: bytes) -> dict[str, Any]:
+    """署名を検証してpayloadを返す。改ざんされている場合や形式が不正な場合はValueErrorを送出する"""
+    if not key:
+        raise ValueError("Signing key is required.")
+    message, separator, signature = token.partition(_TOKEN_SEPARATOR)
+    if (not separator) or (not message) or (not signature) or (not token.isascii()):
+        raise ValueError("Invalid token format.")
+    if not hmac.compare_digest(signature, _signature(message, key)):
+        raise ValueError("Invalid token signature.")
+
+    try:
+        payload = json.loads(_b64decode(message))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid token payload.") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid token payload.")
+    return payload
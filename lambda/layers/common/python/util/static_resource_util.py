@@ -2,7 +2,7 @@ import os
 from pathlib import Path
 from typing import Optional, Any
 
-from jinja2 import Template
+from jinja2 import Environment, ChoiceLoader, ModuleLoader, PrefixLoader, FileSystemLoader, TemplateNotFound
 
 from util.logger_util import setup_logger
 
@@ -10,16 +10,38 @@ logger = setup_logger("static_resource_util")
 
 _IS_DEV = (os.environ.get("DELIBIRD_ENV") == "dev")
 _STATIC_RESOURCE_DIR = Path(os.environ.get("STATIC_RESOURCE_DIR", str(Path(__file__).parent.parent.parent.parent.parent / "static"))).resolve()
-_FUNCTION_RESOURCE_DIR = Path("/var/task")  # https://docs.aws.amazon.com/ja_jp/lambda/latest/dg/python-package.html
+_FUNCTION_RESOURCE_DIR = Path(os.environ.get("FUNCTION_RESOURCE_DIR", "/var/task")).resolve()  # https://docs.aws.amazon.com/ja_jp/lambda/latest/dg/python-package.html
+# レイヤーのビルド時にプリコンパイルされたテンプレート(lambda/layers/common/compile_templates.py)
+_COMPILED_TEMPLATE_DIR = Path(os.environ.get("COMPILED_TEMPLATE_DIR", str(_STATIC_RESOURCE_DIR.parent / "compiled_templates")))
 
+# テンプレート名のプレフィックス (compile_templates.pyと一致させること)
+_STATIC_TEMPLATE_PREFIX = "static"
+_FUNCTION_TEMPLATE_PREFIX = "function"
 
-def _load_html(path: Path, template_contexts: dict[str, Any] = None) -> Optional[str]:
-    if not path.is_file():
-        logger.warning(f"Static resource {path} is not file.")
+
+def _create_template_environment() -> Environment:
+    loaders = []
+    if _COMPILED_TEMPLATE_DIR.is_dir():
+        loaders.append(ModuleLoader(str(_COMPILED_TEMPLATE_DIR)))
+    loaders.append(PrefixLoader({
+        _STATIC_TEMPLATE_PREFIX: FileSystemLoader(str(_STATIC_RESOURCE_DIR)),
+        _FUNCTION_TEMPLATE_PREFIX: FileSystemLoader(str(_FUNCTION_RESOURCE_DIR)),
+    }))
+    # コンパイル済みテンプレートはコンテナ内でキャッシュされ、開発環境以外ではファイルの更新を確認しない
+    return Environment(loader=ChoiceLoader(loaders), auto_reload=_IS_DEV, cache_size=-1)
+
+
+_TEMPLATE_ENVIRONMENT = _create_template_environment()
+
+
+def _load_html(template_name: str, template_contexts: dict[str, Any] = None) -> Optional[str]:
+    try:
+        template = _TEMPLATE_ENVIRONMENT.get_template(template_name)
+    except TemplateNotFound:
+        logger.warning(f"Static resource {template_name} is not file.")
         return None
 
     try:
-        template = Template(path.read_text())
         result = template.render(template_contexts or {})
     except Exception as e:
         logger.warning("Unexpected error occurred while generating HTML body.", exc_info=e)
@@ -33,12 +55,25 @@ def load_static_html(relative_path: str, template_contexts: dict[str, Any] = Non
     if not os.path.commonprefix([str(_STATIC_RESOURCE_DIR), str(file_path)]) == str(_STATIC_RESOURCE_DIR):
         raise ValueError("Invalid relative path; attempts to access outside the static resource directory.")
 
-    return _load_html(file_path, template_contexts)
+    return _load_html(f"{_STATIC_TEMPLATE_PREFIX}/{file_path.relative_to(_STATIC_RESOURCE_DIR).as_posix()}", template_contexts)
 
 
-def load_function_html(relative_path: str, template_contexts: dict[str, Any] = None) -> Optional[str]:
+def _resolve_function_resource(relative_path: str) -> Path:
     file_path = (_FUNCTION_RESOURCE_DIR / relative_path).resolve()
     if not os.path.commonprefix([str(_FUNCTION_RESOURCE_DIR), str(file_path)]) == str(_FUNCTION_RESOURCE_DIR):
         raise ValueError("Invalid relative path; attempts to access outside the function resource directory.")
+    return file_path
 
-    return _load_html(file_path, template_contexts)
+
+def load_function_html(relative_path: str, template_contexts: dict[str, Any] = None) -> Optional[str]:
+    file_path = _resolve_function_resource(relative_path)
+    return _load_html(f"{_FUNCTION_TEMPLATE_PREFIX}/{file_path.relative_to(_FUNCTION_RESOURCE_DIR).as_posix()}", template_contexts)
+
+
+def load_function_resource(relative_path: str) -> Optional[str]:
+    """関数のリソース(テンプレートではないスクリプトなど)をそのまま読み込む"""
+    try:
+        return _resolve_function_resource(relative_path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        logger.warning(f"Function resource {relative_path} is not file.")
+        return None
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from ddb.connection import DelibirdTableMeta
+from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLinkInactiveStatus
+from store.link_snapshot import refresh_link_snapshot
+from util.date_util import get_jst_datetime_now
+from util.environment_util import get_env_var
+from util.logger_util import setup_logger, setup_dev_logger, buffer_invocation_logs
+
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
+
+logger = setup_logger("link_sweeper")
+setup_dev_logger()
+
+# GSIへの反映の遅延で読み込めなかったリンクを次回のスイープで拾うため、確認済みの日時をこの秒数だけ戻して記録する
+_INDEX_LAG_SECONDS = float(get_env_var("LINK_SWEEPER_INDEX_LAG_SECONDS", 60))
+
+_M = DelibirdLinkTableModel
+
+
+def _retire(model: DelibirdLinkTableModel) -> bool:
+    # スイープ中に有効期限が変更されたリンクには記録しない
+    return _M.mark_inactive(model.domain, model.slug, DelibirdLinkInactiveStatus.EXPIRED,
+                            condition=(_M.expiration_date == model.expiration_date))
+
+
+def _sweep_domain(meta: DelibirdDomainMetaTableModel) -> int:
+    """
+    前回のスイープ以降に有効期限が過ぎたリンクを有効期限のインデックスから読み込み、有効期限切れを記録する。
+    記録したリンクがある場合は、リダイレクト側のキャッシュを無効化する。記録したリンク数を返す。
+    """
+    domain = meta.domain
+    now = get_jst_datetime_now()
+    if meta.expiry_swept_at is None:
+        range_key_condition = _M.expiration_date <= now
+    else:
+        range_key_condition = _M.expiration_date.between(meta.expiry_swept_at, now)
+    models = _M.expiration_index.query(domain, range_key_condition=range_key_condition,
+                                       filter_condition=_M.inactive_status.does_not_exist(),
+                                       attributes_to_get=[_M.domain.attr_name, _M.slug.attr_name, _M.expiration_date.attr_name])
+
+    with ThreadPoolExecutor(max_workers=DelibirdTableMeta.max_pool_connections) as executor:
+        retired = sum(executor.map(_retire, models))
+
+    DelibirdDomainMetaTableModel(domain).update(
+        actions=[DelibirdDomainMetaTableModel.expiry_swept_at.set(now - timedelta(seconds=_INDEX_LAG_SECONDS))])
+    if retired:
+        # キャッシュされたリンクは記録前の値のため、ドメイン単位で無効化する
+        version = DelibirdDomainMetaTableModel.bump_cache_version(domain)
+        # 有効期限のあるリンクはスナップショットに含まれないため、スナップショットは版数のみを更新する
+        refresh_link_snapshot(domain, version)
+    logger.info(f"Swept expired links for domain: {domain}, retired: {retired}")
+    return retired
+
+
+# スイープの結果はサンプリングせずに出力する
+@buffer_invocation_logs(sampling=False)
+def lambda_handler(event: dict, context: "LambdaContext"):
+    """EventBridgeのスケジュールで定期的に呼び出され、全ドメインの有効期限が過ぎたリンクに有効期限切れを記録する"""
+    results: dict[str, int] = {}
+    failed: list[str] = []
+    for meta in DelibirdDomainMetaTableModel.scan(attributes_to_get=[DelibirdDomainMetaTableModel.domain.attr_name,
+                                                                     DelibirdDomainMetaTableModel.expiry_swept_at.attr_name]):
+        try:
+            results[meta.domain] = _sweep_domain(meta)
+        except Exception:
+            # 確認済みの日時は更新されないため、次回のスイープで再試行される
+            logger.exception(f"Failed to sweep expired links for domain: {meta.domain}")
+            failed.append(meta.domain)
+
+    logger.info(f"Swept expired links, domains: {len(results)}, retired: {sum(results.values())}, failed: {failed}")
+    return {"retired": results, "failed": failed}
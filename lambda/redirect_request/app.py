@@ -1,34 +1,64 @@
 from http import HTTPStatus
-
-from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent, event_source
-from aws_lambda_powertools.utilities.typing import LambdaContext
-
-from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLinkInactiveStatus
+from typing import TYPE_CHECKING
+
+from ddb.click_events import click_event_recorder
+from ddb.connection import prewarm_connections, probe_connections, on_dynamodb_call
+from ddb.link_cache import link_cache
+from ddb.link_counter import link_uses_counter
+from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLink, DelibirdLinkInactiveStatus
+from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel
 from models.delibird_nonce import DelibirdNonceTableModel
-from protected_util import protected_response, NONCE_QUERY_KEY, CHALLENGE_QUERY_KEY
-from query import queried_origin
-from util.logger_util import setup_logger, setup_dev_logger
-from util.parse_util import parse_request_path, parse_origin, parse_domain, parse_query
-from util.response_util import redirect_response, error_response
+from redirect_plan import get_redirect_plan
+from store.link_store import STORE_BACKEND, STORE_BACKEND_DYNAMODB
+from util.lifecycle_util import after_invocation
+from util.logger_util import setup_logger, setup_dev_logger, set_log_fields, buffer_invocation_logs
+from util.metrics_util import StageTimer, emit_stage_metrics
+from util.parse_util import parse_request_path, parse_domain, parse_query
+from util.request_util import DelibirdRequest, apigateway_event
+from util.response_util import error_response
+
+if TYPE_CHECKING:
+    from aws_lambda_powertools.utilities.typing import LambdaContext
 
 logger = setup_logger("redirect_request")
 setup_dev_logger()
 
-
-@event_source(data_class=APIGatewayProxyEvent)
-def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
+# リクエスト時のTLSハンドシェイク・認証情報の解決を避けるため、初期化フェーズで各テーブルへの接続を確立しておく
+# (リンク・nonceの保存先がDynamoDB以外の場合、これらのテーブルには接続しない)
+_TABLE_MODELS = (DelibirdLinkTableModel, DelibirdDomainMetaTableModel, DelibirdLinkCounterTableModel, DelibirdNonceTableModel) \
+    if STORE_BACKEND == STORE_BACKEND_DYNAMODB else ()
+prewarm_connections(*_TABLE_MODELS)
+
+# 処理段階ごとの所要時間・DynamoDB呼び出し回数を、呼び出しごとにEMF形式で出力する
+_stage_timer = StageTimer("redirect_request")
+on_dynamodb_call(_stage_timer.record_ddb_call, *_TABLE_MODELS)
+
+
+# 使用回数とクリックイベントの書き込みは、レスポンスの返却後・コンテナの凍結前に完了させる
+@after_invocation(link_uses_counter.flush, click_event_recorder.flush)
+# ログは呼び出しごとにバッファし、エラー時は全て・それ以外はサンプリングして1回の書き込みで出力する
+# (メッセージは%書式で渡し、出力されるログのみ文字列を組み立てる。ドメインとslugは構造化フィールドとして付与する)
+@buffer_invocation_logs()
+@emit_stage_metrics(_stage_timer)
+@probe_connections(*_TABLE_MODELS)
+@apigateway_event
+def lambda_handler(event: DelibirdRequest, context: "LambdaContext"):
     try:
         # parse domain
         domain: str = parse_domain(event.headers.get("Host", ""))
         # parse path
         request_path: str = parse_request_path(event.path_parameters.get("path", ""))
     except ValueError as e:
-        logger.info(f"Get Invalid request: {e}")
+        logger.info("Get Invalid request: %s", e)
         return error_response(HTTPStatus.NOT_FOUND)
     except Exception:
-        logger.exception(f"Failed to parse request.")
+        logger.exception("Failed to parse request.")
         return error_response(HTTPStatus.NOT_FOUND)
-    logger.info(f"Parsed Domain: {domain}, Parsed Request Path: {request_path}")
+    set_log_fields(domain=domain, slug=request_path)
+    logger.debug("Parsed request.")
+    _stage_timer.set_domain(domain)
+    _stage_timer.mark("parse")
 
     # pathがない場合 "/"にアクセスされた場合は、NOT_FOUNDを返す
     if not request_path:
@@ -37,68 +67,87 @@ def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
 
     # pathからリンク情報を取得
     try:
-        link = DelibirdLinkTableModel.get_from_request(domain, request_path)
+        link = link_cache.get(domain, request_path)
+        # 認証ページを表示する前に上限超過を判定するため、パスフレーズ付きかつ最大使用回数のあるリンクのみ最新の使用回数を読み込む
+        # (それ以外のリンクは、使用回数のインクリメント時の条件付き更新で上限を判定する。上限超過が記録されたリンクは読み込まない)
+        if (link is not None) and (link.max_uses is not None) and (link.inactive_status is None) and link.is_protected():
+            link.load_uses()
     except Exception:
-        logger.exception(
-            f"Failed to fetch delibird link data for domain: {domain}, slug: {request_path}, Table: {DelibirdLinkTableModel.Meta.table_name}")
+        logger.exception("Failed to fetch delibird link data. Store: %s", STORE_BACKEND)
         return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
-    interrupt_origin = None
+    _stage_timer.mark("link_fetch")
 
     ## リンクが存在しない場合
+    # (存在しないslugへのリクエストはクリックイベントを記録しない。ランダムなパスのスキャンで記録が増え続けないようにする)
     if link is None:
-        logger.info(f"Link(domain: {domain}, slug: {request_path}) does not exist or has been disabled.")
+        logger.info("Link does not exist or has been disabled.")
         return error_response(HTTPStatus.NOT_FOUND)
 
+    response = _respond_link(event, domain, request_path, link)
+    # クリックイベントはバッファへの追加のみ行う (書き込みはafter_invocationで行う)
+    click_event_recorder.record(event, domain, request_path, response["statusCode"])
+    return response
+
+
+def _respond_link(event: DelibirdRequest, domain: str, request_path: str, link: DelibirdLink) -> dict:
+    """取得したリンクについて、リダイレクト・認証ページ・エラーのいずれかのレスポンスを返す"""
+    interrupt_origin = None
+
     ## リンクが無効な場合
     active, inactive_reason = link.check_active()
     if not active:
         inactive_status = inactive_reason.status
         if inactive_status is DelibirdLinkInactiveStatus.DISABLED:
             # 明示的に無効化されている場合
-            logger.info(f"Link(domain: {domain}, slug: {request_path}) is inactive. Reason: {inactive_reason}")
+            logger.info("Link is inactive. Reason: %s", inactive_reason)
             return error_response(HTTPStatus.NOT_FOUND)
 
         elif inactive_status is DelibirdLinkInactiveStatus.EXPIRED:
             # 有効期限切れの場合
             if not link.expired_origin:
-                logger.info(f"Link(domain: {domain}, slug: {request_path}) is expired at {link.expiration_date}.")
+                logger.info("Link is expired at %s.", link.expiration_date)
                 return error_response(HTTPStatus.NOT_FOUND)
             # リンク期限切れでexpired_originがあれば、そちらにリダイレクトする
             interrupt_origin = link.expired_origin
 
         elif inactive_status is DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED:
             # 最大使用回数超過の場合
-            logger.info(f"Link(domain: {domain}, slug: {request_path}) has reached max uses: {link.uses} / {link.max_uses}.")
+            logger.info("Link has reached max uses: %s / %s.", link.uses, link.max_uses)
             return error_response(HTTPStatus.NOT_FOUND)
 
         else:
-            logger.error(f"Link(domain: {domain}, slug: {request_path}) is not active. Unknown reason: {inactive_reason}")
+            logger.error("Link is not active. Unknown reason: %s", inactive_reason)
             return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
-    logger.info(f"Link(domain: {domain}, slug: {request_path}) is active. Current uses: {link.uses} / Max uses: {link.max_uses or "unlimited"}")
+    logger.debug("Link is active. Current uses: %s / Max uses: %s", link.uses, link.max_uses or "unlimited")
 
     # ステータスコードがリダイレクト系でない場合はInternal Server Errorを返す
     if not link.status.is_redirection:
-        logger.error(f"Link(domain: {domain}, slug: {request_path}) has invalid status code: {link.status}")
+        logger.error("Link has invalid status code: %s", link.status)
         return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+    _stage_timer.mark("check_active")
 
     # リンクがパスフレーズ付きの場合
     if link.is_protected():
+        # 認証ページ用のモジュール(テンプレート・nonceテーブル)は、コールドスタートを軽くするためパスフレーズ付きリンクでのみ読み込む
+        from protected_util import protected_response, verify_request_nonce, redeem_request_nonce, NONCE_QUERY_KEY, CHALLENGE_QUERY_KEY
+
         ## nonceかchallengeがなかったら、未認証として認証ページを表示する。
         if (NONCE_QUERY_KEY not in event.resolved_query_string_parameters) and (CHALLENGE_QUERY_KEY not in event.resolved_query_string_parameters):
-            logger.info(f"Link(domain: {domain}, slug: {request_path}) requires challenge.")
+            logger.info("Link requires challenge.")
             try:
                 return protected_response(domain, request_path)
             except Exception:
-                logger.exception(f"Failed to generate protected response for domain: {domain}, slug: {request_path}")
+                logger.exception("Failed to generate protected response.")
                 return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
         try:
-            ## (nonceとchallengeがあったら、) まずnonceを取り出してDBと突合(存在確認・期限内・未使用・nonceの対象リクエストか)
+            ## (nonceとchallengeがあったら、) まずnonceを取り出して検証(期限内・未使用・nonceの対象リクエストか)
             nonce: str = parse_query(event.resolved_query_string_parameters, NONCE_QUERY_KEY, expected_single_value=True, allow_notfound=True)
             if not nonce:
                 return protected_response(domain, request_path, "認証に失敗しました。もう一度お試しください。")
-            nonce_model = DelibirdNonceTableModel.get(nonce)
-            if (not nonce_model.is_active()) or (nonce_model.domain != domain) or (nonce_model.slug != request_path):
-                # nonceが無効 or 使用済 or 期限切れ or ドメインやslugが不一致
+            verified_nonce = verify_request_nonce(nonce, domain, request_path)
+            if verified_nonce is None:
+                # nonceが存在しない or 無効 or 使用済 or 期限切れ or ドメインやslugが不一致
+                logger.info("Invalid nonce.")
                 return protected_response(domain, request_path, "認証に失敗しました。もう一度お試しください。")
 
             ## 問題ないnonceの場合、challengeの確認
@@ -107,63 +156,65 @@ def lambda_handler(event: APIGatewayProxyEvent, context: LambdaContext):
                 # challengeが無効
                 return protected_response(domain, request_path, "認証に失敗しました。もう一度お試しください。")
             if not link.validate_challenge(nonce, challenge):
-                logger.info(f"Invalid challenge for domain: {domain}, slug: {request_path}")
-                nonce_model.mark_used()  # not successでもok
+                logger.info("Invalid challenge.")
+                redeem_request_nonce(verified_nonce)  # not successでもok
                 return protected_response(domain, request_path, "パスワードが正しくありません。")
 
             # チャレンジ成功 -> nonce消込
             try:
-                nonce_use_success, nonce_used_at = nonce_model.mark_used()
+                nonce_use_success, nonce_used_at = redeem_request_nonce(verified_nonce)
             except Exception:
-                logger.exception(f"Failed to mark nonce as used for domain: {domain}, slug: {request_path}")
+                logger.exception("Failed to mark nonce as used.")
                 return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
             if not nonce_use_success:
                 # nonceがぎりぎり期限切れになった場合 or 競合リクエストで使用された場合
-                logger.info(f"Failed to mark nonce as used for domain: {domain}, slug: {request_path}")
+                logger.info("Failed to mark nonce as used.")
                 return protected_response(domain, request_path, "認証に失敗しました。もう一度お試しください。")
 
-        except DelibirdNonceTableModel.DoesNotExist:
-            # nonceがDB上に存在しない
-            logger.info(f"Invalid nonce for domain: {domain}, slug: {request_path}")
-            return protected_response(domain, request_path, "認証に失敗しました。もう一度お試しください。")
         except Exception:
-            logger.exception(f"Failed to parse challenge for domain: {domain}, slug: {request_path}")
+            logger.exception("Failed to parse challenge.")
             return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+        _stage_timer.mark("nonce")
 
-    # リダイレクト先URLの決定
+    # リダイレクト先URLの決定 (リダイレクト計画はキャッシュされたリンクごとに1度だけ構築される)
     origin_candidate = interrupt_origin or link.link_origin
     try:
         # リンク先URLの妥当性確認
-        origin = parse_origin(origin_candidate)
+        plan = get_redirect_plan(link, origin_candidate,
+                                 (NONCE_QUERY_KEY, CHALLENGE_QUERY_KEY) if link.is_protected() else ())
     except Exception:
         # 不正なURLがデータベースに保存されている場合はInternal Server Errorを返す
-        logger.exception(f"Invalid URL stored in link_origin for domain: {domain}, slug: {request_path}, URL: {origin_candidate}")
+        logger.exception("Invalid URL stored in link_origin. URL: %s", origin_candidate)
         return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
 
     # クエリパラメータの付与
+    origin = plan.origin
     if not link.query_omit:
-        logger.info(f"Link(domain: {domain}, slug: {request_path}) has disabled query omission. Appending query parameters.")
+        logger.debug("Link has disabled query omission. Appending query parameters.")
         try:
-            origin = queried_origin(origin, event.resolved_query_string_parameters, link.query_whitelist,
-                                    {NONCE_QUERY_KEY, CHALLENGE_QUERY_KEY} if link.is_protected() else set())
+            origin = plan.build_url(event.resolved_query_string_parameters)
         except ValueError:
-            logger.exception(f"Invalid query parameters for domain: {domain}, slug: {request_path}, URL: {origin}")
+            logger.exception("Invalid query parameters. URL: %s", origin)
             return error_response(HTTPStatus.BAD_REQUEST)
         except Exception:
-            logger.exception(f"Failed to append query parameters for domain: {domain}, slug: {request_path}, URL: {origin}")
+            logger.exception("Failed to append query parameters. URL: %s", origin)
             return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+    _stage_timer.mark("build_origin")
 
     # リンクの使用回数をインクリメント
     try:
         update_success = link.increment_uses()
     except Exception:
-        logger.exception(f"Failed to increment uses for domain: {domain}, slug: {request_path}")
+        logger.exception("Failed to increment uses.")
         return error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+    _stage_timer.mark("increment_uses")
 
     if not update_success:
         # 最大使用回数が競合リクエストで超過した場合
-        logger.info(f"Link(domain: {domain}, slug: {request_path}) failed to increment uses due to max uses condition.")
+        logger.info("Link failed to increment uses due to max uses condition.")
         return error_response(HTTPStatus.NOT_FOUND)
 
-    logger.info(f"Redirect to {origin} for domain: {domain}, slug: {request_path} (status: {link.status})")
-    return redirect_response(origin, link.status)
+    # 共有キャッシュ(CDN)に保存されたリダイレクトの使用回数は、CDNのアクセスログから反映する (tools/reconcile_cdn_uses.py)
+    shared_cache = link.is_shared_cacheable()
+    logger.info("Redirect to %s (status: %s, shared cache: %s)", origin, link.status, shared_cache)
+    return plan.response(origin, shared_cache=shared_cache)
@@ -4,20 +4,18 @@ from typing import Optional
 
 from pynamodb.attributes import UnicodeAttribute, NumberAttribute
 from pynamodb.constants import NULL
-from pynamodb.exceptions import UpdateError
+from pynamodb.exceptions import UpdateError, PutError
 from pynamodb.expressions.operand import Path
 from pynamodb.models import Model
 
+from ddb.connection import DelibirdTableMeta
 from ddb.datetime_attribute import DateTimeAttribute
-from util.date_util import get_jst_datetime_now
-
-_REGION = os.environ["AWS_REGION"]
+from store.nonce_store import NonceStore, DelibirdNonce
 
 
 class DelibirdNonceTableModel(Model):
-    class Meta:
+    class Meta(DelibirdTableMeta):
         table_name = os.environ["NONCE_TABLE_NAME"]
-        region = _REGION
 
     nonce = UnicodeAttribute(hash_key=True)
     expired_timestamp = NumberAttribute(null=False)
@@ -26,29 +24,38 @@ class DelibirdNonceTableModel(Model):
     slug = UnicodeAttribute(null=False)
     used_at = DateTimeAttribute(null=True, default=None)
 
-    def is_active(self) -> bool:
-        if self.used_at is not None:
-            # 使用済み
-            return False
-        if self.expired_timestamp <= get_jst_datetime_now().timestamp():
-            # 期限切れ
-            return False
+
+class DynamoDBNonceStore(NonceStore):
+    """DynamoDBのnonceのテーブルを使用する保存先"""
+
+    def put_nonce(self, nonce: DelibirdNonce) -> bool:
+        model = DelibirdNonceTableModel(nonce.nonce, domain=nonce.domain, slug=nonce.slug,
+                                        expired_timestamp=nonce.expired_timestamp, used_at=nonce.used_at)
+        try:
+            model.save(condition=DelibirdNonceTableModel.nonce.does_not_exist())
+        except PutError as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                return False
+            raise e
         return True
 
-    def mark_used(self) -> tuple[bool, Optional[datetime]]:
-        if not self.is_active():
-            # usedな状態でmark_usedされていないか、呼び出し時点で期限切れしていないか
-            return False, None
+    def get_nonce(self, nonce: str) -> Optional[DelibirdNonce]:
+        try:
+            model = DelibirdNonceTableModel.get(nonce)
+        except DelibirdNonceTableModel.DoesNotExist:
+            return None
+        return DelibirdNonce(nonce=model.nonce, domain=model.domain, slug=model.slug,
+                             expired_timestamp=int(model.expired_timestamp), used_at=model.used_at)
 
-        now = get_jst_datetime_now()
+    def mark_used(self, nonce: str, used_at: datetime) -> bool:
         try:
-            self.update(
-                actions=[DelibirdNonceTableModel.used_at.set(now)],
-                condition=(DelibirdNonceTableModel.used_at.does_not_exist()) |
-                          (Path(DelibirdNonceTableModel.used_at).is_type(NULL))
+            DelibirdNonceTableModel(nonce).update(
+                actions=[DelibirdNonceTableModel.used_at.set(used_at)],
+                condition=(DelibirdNonceTableModel.nonce.exists()) & (
+                        (DelibirdNonceTableModel.used_at.does_not_exist()) | (Path(DelibirdNonceTableModel.used_at).is_type(NULL)))
             )
         except UpdateError as e:
             if e.cause_response_code == "ConditionalCheckFailedException":
-                return False, None
+                return False
             raise e
-        return True, now
+        return True
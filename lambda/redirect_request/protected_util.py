@@ -1,17 +1,47 @@
 import os
-from datetime import timedelta
+from dataclasses import dataclass
+from datetime import timedelta, datetime
 from http import HTTPStatus
+from typing import Optional
 
-from models.delibird_nonce import DelibirdNonceTableModel
+from models.delibird_nonce import DynamoDBNonceStore
+from store.nonce_store import DelibirdNonce, get_nonce_store
 from util.date_util import get_jst_datetime_now
+from util.environment_util import get_env_var
 from util.nonce_util import create_nonce
 from util.response_util import success_response, STATIC_FOOTER
+from util.signature_util import encode_signed_token, decode_signed_token
 from util.static_resource_util import load_function_html
 
 NONCE_QUERY_KEY = "n"
 CHALLENGE_QUERY_KEY = "c"
 
+# table: 発行時にnonceをDBへ保存する / stateless: HMAC署名付きのトークンを発行し、使用時のみDBへ記録する
+NONCE_MODE_TABLE = "table"
+NONCE_MODE_STATELESS = "stateless"
+
 _NONCE_LIFETIME_SECONDS = int(os.environ["NONCE_LIFETIME_SECONDS"])
+_NONCE_MODE = str(get_env_var("NONCE_MODE", NONCE_MODE_TABLE))
+_NONCE_SIGNING_KEY = str(get_env_var("NONCE_SIGNING_KEY", "")).encode("utf-8")
+_STATELESS_NONCE_PREFIX = "stateless#"
+_STATELESS_NONCE_ID_BYTE_LENGTH = 16
+
+if _NONCE_MODE not in (NONCE_MODE_TABLE, NONCE_MODE_STATELESS):
+    raise ValueError(f"Invalid NONCE_MODE: {_NONCE_MODE}")
+if (_NONCE_MODE == NONCE_MODE_STATELESS) and (not _NONCE_SIGNING_KEY):
+    raise ValueError("NONCE_SIGNING_KEY is required when NONCE_MODE is stateless.")
+
+_nonce_store = get_nonce_store(DynamoDBNonceStore)
+
+
+@dataclass
+class VerifiedRequestNonce:
+    nonce: str
+    domain: str
+    slug: str
+    expired_timestamp: int
+    # 発行時に保存されたnonceか (Falseの場合は、使用時に使用済みとして保存する)
+    _stored: bool = False
 
 
 def protected_response(domain: str, slug: str, error_message: str = ""):
@@ -34,12 +64,57 @@ def protected_response(domain: str, slug: str, error_message: str = ""):
 
 
 def _create_protected_request_nonce(domain: str, slug: str) -> str:
-    nonce = create_nonce()
+    expired_timestamp = int((get_jst_datetime_now() + timedelta(seconds=_NONCE_LIFETIME_SECONDS)).timestamp())
 
-    model = DelibirdNonceTableModel(nonce)
-    model.domain = domain
-    model.slug = slug
-    model.expired_timestamp = int((get_jst_datetime_now() + timedelta(seconds=_NONCE_LIFETIME_SECONDS)).timestamp())
-    model.save(condition=DelibirdNonceTableModel.nonce.does_not_exist())
+    if _NONCE_MODE == NONCE_MODE_STATELESS:
+        # 認証ページの表示ではDBへ書き込まない
+        return encode_signed_token({
+            "d": domain,
+            "s": slug,
+            "e": expired_timestamp,
+            "n": create_nonce(_STATELESS_NONCE_ID_BYTE_LENGTH)
+        }, _NONCE_SIGNING_KEY)
 
+    nonce = create_nonce()
+    if not _nonce_store.put_nonce(DelibirdNonce(nonce=nonce, domain=domain, slug=slug, expired_timestamp=expired_timestamp)):
+        raise ValueError("Nonce already exists.")
     return nonce
+
+
+def verify_request_nonce(nonce: str, domain: str, slug: str) -> Optional[VerifiedRequestNonce]:
+    """nonceが有効(期限内・未使用・対象のリクエスト)であれば返す。nonceの使用は記録しない"""
+    if _NONCE_MODE == NONCE_MODE_STATELESS:
+        try:
+            payload = decode_signed_token(nonce, _NONCE_SIGNING_KEY)
+            verified = VerifiedRequestNonce(nonce=_STATELESS_NONCE_PREFIX + str(payload["n"]), domain=str(payload["d"]),
+                                            slug=str(payload["s"]), expired_timestamp=int(payload["e"]))
+        except (ValueError, KeyError, TypeError):
+            return None
+        # 使用済みかどうかは、使用時の条件付き書き込みで判定する
+        if verified.expired_timestamp <= get_jst_datetime_now().timestamp():
+            return None
+    else:
+        stored = _nonce_store.get_nonce(nonce)
+        if (stored is None) or (not stored.is_active()):
+            return None
+        verified = VerifiedRequestNonce(nonce=stored.nonce, domain=stored.domain, slug=stored.slug,
+                                        expired_timestamp=stored.expired_timestamp, _stored=True)
+
+    if (verified.domain != domain) or (verified.slug != slug):
+        return None
+    return verified
+
+
+def redeem_request_nonce(verified: VerifiedRequestNonce) -> tuple[bool, Optional[datetime]]:
+    """nonceを使用済みにする(1回の条件付き書き込み)。既に使用済み・期限切れの場合はFalseを返す"""
+    now = get_jst_datetime_now()
+    if verified.expired_timestamp <= now.timestamp():
+        # 検証後に期限切れになった場合
+        return False, None
+    if verified._stored:
+        success = _nonce_store.mark_used(verified.nonce, now)
+    else:
+        # DBに保存されていない(ステートレスな)nonceは、使用済みとして条件付きで保存する
+        success = _nonce_store.put_nonce(DelibirdNonce(nonce=verified.nonce, domain=verified.domain, slug=verified.slug,
+                                                       expired_timestamp=verified.expired_timestamp, used_at=now))
+    return (True, now) if success else (False, None)
@@ -7,12 +7,8 @@ _MAX_QUERY_VALUE_LENGTH = int(os.environ["MAX_QUERY_VALUE_LENGTH"])
 _MAX_TOTAL_QUERY_PARAMS = int(os.environ["MAX_TOTAL_QUERY_PARAMS"])
 
 
-def queried_origin(origin: str, data: dict[str, list[str]], query_whitelist: set[str], query_blacklist: set[str]) -> str:
-    """クエリパラメータを付与したURLを返す"""
-    parsed_url = urlparse(origin)
-    existing_query_pairs = [(k, v) for k, v in parse_qsl(parsed_url.query, strict_parsing=True)]
-
-    # 新しいクエリパラメータの検証とフィルタリング
+def validated_query_pairs(data: dict[str, list[str]]) -> list[tuple[str, str]]:
+    """リクエストのクエリパラメータを検証し、(キー, 値)のリストにして返す"""
     if ((new_query_length := len(data)) > _MAX_TOTAL_QUERY_PARAMS) or (
             (new_query_length := sum(len(v) for v in data.values())) > _MAX_TOTAL_QUERY_PARAMS):
         raise ValueError(f"Amount of new query parameters exceeds limit: count={new_query_length}")
@@ -26,6 +22,16 @@ def queried_origin(origin: str, data: dict[str, list[str]], query_whitelist: set
             if len(v) > _MAX_QUERY_VALUE_LENGTH:
                 raise ValueError(f"Query parameter value length exceeds limit: length={len(v)}")
             new_query_pairs.append((k, v))
+    return new_query_pairs
+
+
+def queried_origin(origin: str, data: dict[str, list[str]], query_whitelist: set[str], query_blacklist: set[str]) -> str:
+    """クエリパラメータを付与したURLを返す"""
+    parsed_url = urlparse(origin)
+    existing_query_pairs = [(k, v) for k, v in parse_qsl(parsed_url.query, strict_parsing=True)]
+
+    # 新しいクエリパラメータの検証とフィルタリング
+    new_query_pairs = validated_query_pairs(data)
 
     query_pairs = existing_query_pairs + new_query_pairs
     if len(query_whitelist) > 0:
@@ -0,0 +1,76 @@
+from http import HTTPStatus
+from typing import Iterable, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+from ddb.models.delibird_link import DelibirdLink
+from query import validated_query_pairs
+from util.environment_util import get_env_var
+from util.parse_util import parse_origin
+from util.response_util import redirect_response
+
+# 共有キャッシュ(CDN)に保存させるリンク(DelibirdLink.is_shared_cacheable)の、CDNでのキャッシュ期間と期限切れ後に使用できる期間(秒)
+# (0の場合は全てのリンクでキャッシュさせない)
+_SHARED_CACHE_MAX_AGE = int(get_env_var("REDIRECT_SHARED_CACHE_MAX_AGE", 300))
+_STALE_WHILE_REVALIDATE = int(get_env_var("REDIRECT_STALE_WHILE_REVALIDATE", 60))
+
+
+class RedirectPlan:
+    """
+    リダイレクト先URLごとに1度だけ構築するリダイレクトの実行計画。
+    URLの検証・分解と、URLに含まれるクエリパラメータのパース・フィルタリングを構築時に済ませておき、
+    リクエストごとには受け取ったクエリパラメータの検証・結合のみを行う。
+    """
+    __slots__ = ("origin", "status", "_query_omit", "_query_whitelist", "_query_blacklist",
+                 "_base_url", "_fragment", "_existing_query", "_existing_query_error")
+
+    def __init__(self, origin: str, status: HTTPStatus, *, query_omit: bool,
+                 query_whitelist: Iterable[str] = (), query_blacklist: Iterable[str] = ()):
+        # 不正なURLの場合はValueErrorを送出する
+        self.origin: str = parse_origin(origin)
+        self.status: HTTPStatus = status
+        self._query_omit = query_omit
+        self._query_whitelist = frozenset(query_whitelist)
+        self._query_blacklist = frozenset(query_blacklist)
+
+        parsed_url = urlparse(self.origin)
+        self._base_url = urlunparse((parsed_url.scheme, parsed_url.netloc, parsed_url.path, parsed_url.params, "", ""))
+        self._fragment = f"#{parsed_url.fragment}" if parsed_url.fragment else ""
+        self._existing_query: str = ""
+        self._existing_query_error: Optional[ValueError] = None
+        try:
+            self._existing_query = urlencode(self._filter(parse_qsl(parsed_url.query, strict_parsing=True)))
+        except ValueError as e:
+            # クエリパラメータを付与しない場合はURLをそのまま使用するため、付与する場合のみエラーとする
+            self._existing_query_error = e
+
+    def _filter(self, query_pairs: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+        return [(k, v) for k, v in query_pairs
+                if ((not self._query_whitelist) or (k in self._query_whitelist)) and (k not in self._query_blacklist)]
+
+    def build_url(self, query_data: dict[str, list[str]]) -> str:
+        """リクエストのクエリパラメータを付与したリダイレクト先URLを返す。クエリパラメータが不正な場合はValueErrorを送出する"""
+        if self._query_omit:
+            return self.origin
+        if self._existing_query_error is not None:
+            raise ValueError(f"Invalid query parameters in origin: {self._existing_query_error}")
+
+        new_query = urlencode(self._filter(validated_query_pairs(query_data))) if query_data else ""
+        query = f"{self._existing_query}&{new_query}" if (self._existing_query and new_query) else (self._existing_query or new_query)
+        return f"{self._base_url}?{query}{self._fragment}" if query else f"{self._base_url}{self._fragment}"
+
+    def response(self, url: str, shared_cache: bool = False):
+        """リダイレクトのレスポンスを返す。shared_cacheの場合は、共有キャッシュ(CDN)への保存を許可するヘッダーを付与する"""
+        if shared_cache and (_SHARED_CACHE_MAX_AGE > 0):
+            return redirect_response(url, self.status, shared_cache_max_age=_SHARED_CACHE_MAX_AGE,
+                                     stale_while_revalidate=_STALE_WHILE_REVALIDATE)
+        return redirect_response(url, self.status)
+
+
+def get_redirect_plan(link: DelibirdLink, origin: str, query_blacklist: Iterable[str] = ()) -> RedirectPlan:
+    """リンクのリダイレクト計画を返す。キャッシュされたリンクでは、リダイレクト先URLごとに構築済みの計画を再利用する"""
+    plan = link._redirect_plans.get(origin)
+    if plan is None:
+        plan = RedirectPlan(origin, link.status, query_omit=link.query_omit,
+                            query_whitelist=link.query_whitelist, query_blacklist=query_blacklist)
+        link._redirect_plans[origin] = plan
+    return plan
@@ -2,6 +2,26 @@ output "link_table" {
   value = aws_dynamodb_table.link_table
 }
 
+output "link_tag_table" {
+  value = aws_dynamodb_table.link_tag
+}
+
 output "link_nonce_table" {
   value = aws_dynamodb_table.link_nonce
 }
+
+output "domain_meta_table" {
+  value = aws_dynamodb_table.domain_meta
+}
+
+output "link_counter_table" {
+  value = aws_dynamodb_table.link_counter
+}
+
+output "click_event_table" {
+  value = aws_dynamodb_table.click_event
+}
+
+output "click_rollup_table" {
+  value = aws_dynamodb_table.click_rollup
+}
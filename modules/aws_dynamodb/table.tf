@@ -16,6 +16,52 @@ resource "aws_dynamodb_table" "link_table" {
     name = "slug"
     type = "S"
   }
+
+  attribute {
+    name = "expiration_date"
+    type = "S"
+  }
+
+  attribute {
+    name = "disabled_at"
+    type = "S"
+  }
+
+  # Sparse: only links with an expiration date
+  global_secondary_index {
+    name            = "domain-expiration_date-index"
+    hash_key        = "domain"
+    range_key       = "expiration_date"
+    projection_type = "ALL"
+  }
+
+  # Sparse: only disabled links
+  global_secondary_index {
+    name            = "domain-disabled_at-index"
+    hash_key        = "domain"
+    range_key       = "disabled_at"
+    projection_type = "ALL"
+  }
+}
+
+resource "aws_dynamodb_table" "link_tag" {
+  name         = "Delibird-${var.environment}-DelibirdLinkTagTable"
+  billing_mode = "PAY_PER_REQUEST"
+
+  deletion_protection_enabled = true
+
+  hash_key  = "tag_key"
+  range_key = "slug"
+
+  attribute {
+    name = "tag_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "slug"
+    type = "S"
+  }
 }
 
 resource "aws_dynamodb_table" "link_nonce" {
@@ -36,3 +82,82 @@ resource "aws_dynamodb_table" "link_nonce" {
     enabled        = true
   }
 }
+
+resource "aws_dynamodb_table" "domain_meta" {
+  name         = "Delibird-${var.environment}-DelibirdDomainMetaTable"
+  billing_mode = "PAY_PER_REQUEST"
+
+  deletion_protection_enabled = true
+
+  hash_key = "domain"
+
+  attribute {
+    name = "domain"
+    type = "S"
+  }
+}
+
+resource "aws_dynamodb_table" "link_counter" {
+  name         = "Delibird-${var.environment}-DelibirdLinkCounterTable"
+  billing_mode = "PAY_PER_REQUEST"
+
+  deletion_protection_enabled = true
+
+  # {domain}#{slug}#{shard} (シャードごとにパーティションを分ける)
+  hash_key = "counter_key"
+
+  attribute {
+    name = "counter_key"
+    type = "S"
+  }
+}
+
+resource "aws_dynamodb_table" "click_event" {
+  name         = "Delibird-${var.environment}-DelibirdClickEventTable"
+  billing_mode = "PAY_PER_REQUEST"
+
+  deletion_protection_enabled = true
+
+  hash_key  = "link_key"
+  range_key = "event_key"
+
+  attribute {
+    name = "link_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "event_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expired_timestamp"
+    enabled        = true
+  }
+}
+
+resource "aws_dynamodb_table" "click_rollup" {
+  name         = "Delibird-${var.environment}-DelibirdClickRollupTable"
+  billing_mode = "PAY_PER_REQUEST"
+
+  deletion_protection_enabled = true
+
+  hash_key  = "link_key"
+  range_key = "day"
+
+  attribute {
+    name = "link_key"
+    type = "S"
+  }
+
+  attribute {
+    name = "day"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expired_timestamp"
+    enabled        = true
+  }
+}
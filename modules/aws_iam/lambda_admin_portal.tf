@@ -26,6 +26,7 @@ resource "aws_iam_role_policy" "lambda_admin_portal" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:Query",
           "dynamodb:PutItem", ## FIXME
         ]
@@ -33,6 +34,26 @@ resource "aws_iam_role_policy" "lambda_admin_portal" {
           var.ddb_link_table.arn,
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query",
+        ]
+        Resource = [
+          "${var.ddb_link_table.arn}/index/*",
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem",
+        ]
+        Resource = [
+          var.ddb_link_tag_table.arn,
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
@@ -50,17 +71,99 @@ resource "aws_iam_role_policy" "lambda_admin_portal" {
               "status",
               "max_uses",
               "disabled",
+              "disabled_at",
               "memo",
               "tag",
               "expiration_date",
               "expired_origin",
               "passphrase",
               "query_omit",
-              "query_whitelist"
+              "query_whitelist",
+              "version",
+              "inactive_status",
+              "cacheable"
             ]
           }
         }
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:UpdateItem",
+        ]
+        Resource = [
+          var.ddb_domain_meta_table.arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchGetItem",
+        ]
+        Resource = [
+          var.ddb_link_counter_table.arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query",
+        ]
+        Resource = [
+          var.ddb_click_rollup_table.arn,
+        ]
+      },
+    ]
+  })
+}
+
+# リンクの更新時に、共有キャッシュ(CDN)に保存されたリダイレクトをパージする
+resource "aws_iam_role_policy" "lambda_admin_portal_cdn_purge" {
+  count = length(var.cdn_distribution_arns) > 0 ? 1 : 0
+
+  role = aws_iam_role.lambda_admin_portal.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "cloudfront:CreateInvalidation",
+        ]
+        Resource = var.cdn_distribution_arns
+      },
+    ]
+  })
+}
+
+# リンクの更新時に、リンクのスナップショットを再構築する
+resource "aws_iam_role_policy" "lambda_admin_portal_link_snapshot" {
+  count = var.link_snapshot_bucket_arn != "" ? 1 : 0
+
+  role = aws_iam_role.lambda_admin_portal.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+        ]
+        Resource = [
+          "${var.link_snapshot_bucket_arn}/*",
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket",
+        ]
+        Resource = [
+          var.link_snapshot_bucket_arn,
+        ]
+      },
     ]
   })
 }
@@ -0,0 +1,112 @@
+resource "aws_iam_role" "lambda_link_sweeper" {
+  name = "DelibirdLambdaLinkSweeperRole-${var.environment}"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Sid    = ""
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        }
+      },
+    ]
+  })
+}
+
+# Inline Policy
+resource "aws_iam_role_policy" "lambda_link_sweeper" {
+  role = aws_iam_role.lambda_link_sweeper.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query",
+        ]
+        Resource = [
+          "${var.ddb_link_table.arn}/index/domain-expiration_date-index",
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:UpdateItem",
+        ]
+        Resource = [
+          var.ddb_link_table.arn,
+        ]
+        Condition = {
+          "ForAllValues:StringEquals" = {
+            "dynamodb:Attributes" = [
+              "domain",
+              "slug",
+              "expiration_date",
+              "inactive_status"
+            ]
+          }
+        }
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Scan",
+          "dynamodb:UpdateItem",
+        ]
+        Resource = [
+          var.ddb_domain_meta_table.arn,
+        ]
+      },
+    ]
+  })
+}
+
+# 有効期限切れを記録した後に、リンクのスナップショットの版数を更新する
+# (直前の版数のスナップショットがない場合は、ドメインのリンクを読み込んで再構築する)
+resource "aws_iam_role_policy" "lambda_link_sweeper_link_snapshot" {
+  count = var.link_snapshot_bucket_arn != "" ? 1 : 0
+
+  role = aws_iam_role.lambda_link_sweeper.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+        ]
+        Resource = [
+          "${var.link_snapshot_bucket_arn}/*",
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket",
+        ]
+        Resource = [
+          var.link_snapshot_bucket_arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query",
+        ]
+        Resource = [
+          var.ddb_link_table.arn,
+        ]
+      },
+    ]
+  })
+}
+
+# Managed Policy
+resource "aws_iam_role_policy_attachment" "lambda_link_sweeper_basic_execution" {
+  role       = aws_iam_role.lambda_link_sweeper.name
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+}
@@ -32,6 +32,7 @@ resource "aws_iam_role_policy" "lambda_redirect_request" {
         ]
       },
       {
+        # 最大使用回数の超過を記録する
         Effect = "Allow"
         Action = [
           "dynamodb:UpdateItem",
@@ -44,12 +45,51 @@ resource "aws_iam_role_policy" "lambda_redirect_request" {
             "dynamodb:Attributes" = [
               "domain",
               "slug",
-              "uses",
               "max_uses",
+              "inactive_status"
             ]
           }
         }
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+        ]
+        Resource = [
+          var.ddb_domain_meta_table.arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem", # 初期化時の接続の事前確立に使用
+          "dynamodb:BatchGetItem",
+          "dynamodb:UpdateItem",
+        ]
+        Resource = [
+          var.ddb_link_counter_table.arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchWriteItem",
+        ]
+        Resource = [
+          var.ddb_click_event_table.arn,
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+        ]
+        Resource = [
+          var.ddb_click_rollup_table.arn,
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
@@ -81,6 +121,37 @@ resource "aws_iam_role_policy" "lambda_redirect_request" {
   })
 }
 
+# 現在の版数のリンクのスナップショットを読み込む
+resource "aws_iam_role_policy" "lambda_redirect_request_link_snapshot" {
+  count = var.link_snapshot_bucket_arn != "" ? 1 : 0
+
+  role = aws_iam_role.lambda_redirect_request.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+        ]
+        Resource = [
+          "${var.link_snapshot_bucket_arn}/*",
+        ]
+      },
+      {
+        # 存在しないスナップショットをAccessDeniedではなくNoSuchKeyとして判定する
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket",
+        ]
+        Resource = [
+          var.link_snapshot_bucket_arn,
+        ]
+      },
+    ]
+  })
+}
+
 # Managed Policy
 resource "aws_iam_role_policy_attachment" "lambda_redirect_request_basic_execution" {
   role       = aws_iam_role.lambda_redirect_request.name
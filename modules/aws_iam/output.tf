@@ -5,3 +5,7 @@ output "role_lambda_redirect_request" {
 output "role_lambda_admin_portal" {
   value = aws_iam_role.lambda_admin_portal
 }
+
+output "role_lambda_link_sweeper" {
+  value = aws_iam_role.lambda_link_sweeper
+}
@@ -10,6 +10,13 @@ variable "ddb_link_table" {
   })
 }
 
+variable "ddb_link_tag_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
 variable "ddb_link_nonce_table" {
   type = object({
     name = string
@@ -17,6 +24,34 @@ variable "ddb_link_nonce_table" {
   })
 }
 
+variable "ddb_domain_meta_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_link_counter_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_click_event_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_click_rollup_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
 variable "lambda_redirect_request" {
   type = object({
     name = string
@@ -30,3 +65,15 @@ variable "lambda_admin_portal" {
     arn  = string
   })
 }
+
+variable "cdn_distribution_arns" {
+  description = "ARNs of the CloudFront distributions purged by the admin portal when cacheable links change (CDN_PURGE_HOOK = \"cloudfront\")"
+  type        = list(string)
+  default     = []
+}
+
+variable "link_snapshot_bucket_arn" {
+  description = "ARN of the S3 bucket of the link snapshots rebuilt on link changes (LINK_SNAPSHOT_BUCKET). Empty disables the access."
+  type        = string
+  default     = ""
+}
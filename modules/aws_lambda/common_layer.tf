@@ -8,13 +8,19 @@ locals {
 # ビルドスクリプトを実行してLayerをビルド
 resource "null_resource" "build_common_layer" {
   triggers = {
-    requirements = filemd5("${local.layer_source_dir}/python/requirements.txt")
-    build_script = filemd5("${local.layer_source_dir}/build.sh")
+    requirements   = filemd5("${local.layer_source_dir}/python/requirements.txt")
+    build_script   = filemd5("${local.layer_source_dir}/build.sh")
+    compile_script = filemd5("${local.layer_source_dir}/compile_templates.py")
     # カスタムコードの変更を検出
     custom_code = sha256(join("", [
       for f in fileset("${local.layer_source_dir}/python", "**/*.py") :
       filesha256("${local.layer_source_dir}/python/${f}")
     ]))
+    # デプロイに含めるリンクのスナップショット (tools/build_link_snapshot.pyで構築する)
+    link_snapshots = sha256(join("", [
+      for f in fileset("${local.layer_source_dir}/python", "link_snapshots/*.snap") :
+      filesha256("${local.layer_source_dir}/python/${f}")
+    ]))
     static_files = sha256(join("", [
       for f in fileset("${local.static_resource_dir}", "**/*") :
       filesha256("${local.static_resource_dir}/${f}")
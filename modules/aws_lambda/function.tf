@@ -34,6 +34,21 @@ resource "null_resource" "build_admin_portal" {
   }
 }
 
+resource "null_resource" "build_link_sweeper" {
+  triggers = {
+    files = sha256(join("", [
+      for f in fileset("${local.lambda_dir}/link_sweeper", "**/*") :
+      filesha256("${local.lambda_dir}/link_sweeper/${f}")
+    ]))
+    build_script = filesha256("${local.lambda_dir}/build.sh")
+  }
+
+  provisioner "local-exec" {
+    command     = "chmod +x ${local.lambda_dir}/build.sh && LAMBDA_NAME=link_sweeper BUILD_OUTPUT_DIR=${path.root}/.build ${local.lambda_dir}/build.sh"
+    working_dir = path.root
+  }
+}
+
 data "archive_file" "redirect_request" {
   type        = "zip"
   source_dir  = "${path.root}/.build/redirect_request"
@@ -50,6 +65,14 @@ data "archive_file" "admin_portal" {
   depends_on = [null_resource.build_admin_portal]
 }
 
+data "archive_file" "link_sweeper" {
+  type        = "zip"
+  source_dir  = "${path.root}/.build/link_sweeper"
+  output_path = "${path.root}/.build/link_sweeper.zip"
+
+  depends_on = [null_resource.build_link_sweeper]
+}
+
 resource "aws_lambda_function" "redirect_request" {
   function_name                  = "Delibird-${var.environment}-RedirectRequestFunction"
   role                           = var.role_redirect_request.arn
@@ -66,16 +89,20 @@ resource "aws_lambda_function" "redirect_request" {
 
   environment {
     variables = {
-      DELIBIRD_ENV           = var.environment
-      ENV_VAR                = var.environment_var
-      LINK_TABLE_NAME        = var.ddb_link_table.name
-      NONCE_TABLE_NAME       = var.ddb_link_nonce_table.name
-      NONCE_LIFETIME_SECONDS = var.protected_link_request_nonce_lifetime
-      STATIC_RESOURCE_DIR    = "/opt/delibird/static"
-      ALLOWED_DOMAIN         = join(",", var.allowed_domain)
-      MAX_QUERY_KEY_LENGTH   = "100"
-      MAX_QUERY_VALUE_LENGTH = "2000"
-      MAX_TOTAL_QUERY_PARAMS = "50"
+      DELIBIRD_ENV            = var.environment
+      ENV_VAR                 = var.environment_var
+      LINK_TABLE_NAME         = var.ddb_link_table.name
+      NONCE_TABLE_NAME        = var.ddb_link_nonce_table.name
+      DOMAIN_META_TABLE_NAME  = var.ddb_domain_meta_table.name
+      LINK_COUNTER_TABLE_NAME = var.ddb_link_counter_table.name
+      CLICK_EVENT_TABLE_NAME  = var.ddb_click_event_table.name
+      CLICK_ROLLUP_TABLE_NAME = var.ddb_click_rollup_table.name
+      NONCE_LIFETIME_SECONDS  = var.protected_link_request_nonce_lifetime
+      STATIC_RESOURCE_DIR     = "/opt/delibird/static"
+      ALLOWED_DOMAIN          = join(",", var.allowed_domain)
+      MAX_QUERY_KEY_LENGTH    = "100"
+      MAX_QUERY_VALUE_LENGTH  = "2000"
+      MAX_TOTAL_QUERY_PARAMS  = "50"
     }
   }
 
@@ -104,12 +131,48 @@ resource "aws_lambda_function" "admin_portal" {
 
   environment {
     variables = {
-      DELIBIRD_ENV        = var.environment
-      ENV_VAR             = var.environment_var
-      LINK_TABLE_NAME     = var.ddb_link_table.name
-      STATIC_RESOURCE_DIR = "/opt/delibird/static"
-      LINK_PREFIX         = var.link_prefix
-      ALLOWED_DOMAIN      = join(",", var.allowed_domain)
+      DELIBIRD_ENV            = var.environment
+      ENV_VAR                 = var.environment_var
+      LINK_TABLE_NAME         = var.ddb_link_table.name
+      LINK_TAG_TABLE_NAME     = var.ddb_link_tag_table.name
+      DOMAIN_META_TABLE_NAME  = var.ddb_domain_meta_table.name
+      LINK_COUNTER_TABLE_NAME = var.ddb_link_counter_table.name
+      CLICK_ROLLUP_TABLE_NAME = var.ddb_click_rollup_table.name
+      STATIC_RESOURCE_DIR     = "/opt/delibird/static"
+      LINK_PREFIX             = var.link_prefix
+      ALLOWED_DOMAIN          = join(",", var.allowed_domain)
+    }
+  }
+
+  tracing_config {
+    mode = "Active"
+  }
+
+  logging_config {
+    log_format = "JSON"
+  }
+}
+
+resource "aws_lambda_function" "link_sweeper" {
+  function_name = "Delibird-${var.environment}-LinkSweeperFunction"
+  role          = var.role_link_sweeper.arn
+  handler       = "app.lambda_handler"
+  runtime       = var.runtime
+  timeout       = var.link_sweeper_timeout
+  memory_size   = var.memory_size
+  architectures = var.architectures
+  layers        = [aws_lambda_layer_version.common.arn]
+
+  filename         = data.archive_file.link_sweeper.output_path
+  source_code_hash = data.archive_file.link_sweeper.output_base64sha256
+
+  environment {
+    variables = {
+      DELIBIRD_ENV            = var.environment
+      ENV_VAR                 = var.environment_var
+      LINK_TABLE_NAME         = var.ddb_link_table.name
+      DOMAIN_META_TABLE_NAME  = var.ddb_domain_meta_table.name
+      LINK_COUNTER_TABLE_NAME = var.ddb_link_counter_table.name
     }
   }
 
@@ -5,3 +5,7 @@ output "lambda_redirect_request" {
 output "lambda_admin_portal" {
   value = aws_lambda_function.admin_portal
 }
+
+output "lambda_link_sweeper" {
+  value = aws_lambda_function.link_sweeper
+}
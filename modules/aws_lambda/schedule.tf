@@ -0,0 +1,18 @@
+# 有効期限が過ぎたリンクを定期的に記録する
+resource "aws_cloudwatch_event_rule" "link_sweeper" {
+  name                = "Delibird-${var.environment}-LinkSweeperSchedule"
+  schedule_expression = var.link_sweeper_schedule
+}
+
+resource "aws_cloudwatch_event_target" "link_sweeper" {
+  rule = aws_cloudwatch_event_rule.link_sweeper.name
+  arn  = aws_lambda_function.link_sweeper.arn
+}
+
+resource "aws_lambda_permission" "link_sweeper" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.link_sweeper.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.link_sweeper.arn
+}
@@ -34,6 +34,13 @@ variable "ddb_link_table" {
   })
 }
 
+variable "ddb_link_tag_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
 variable "ddb_link_nonce_table" {
   type = object({
     name = string
@@ -41,6 +48,34 @@ variable "ddb_link_nonce_table" {
   })
 }
 
+variable "ddb_domain_meta_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_link_counter_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_click_event_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "ddb_click_rollup_table" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
 variable "role_redirect_request" {
   type = object({
     name = string
@@ -55,6 +90,25 @@ variable "role_admin_portal" {
   })
 }
 
+variable "role_link_sweeper" {
+  type = object({
+    name = string
+    arn  = string
+  })
+}
+
+variable "link_sweeper_schedule" {
+  description = "Schedule expression of the expired link sweeper"
+  type        = string
+  default     = "rate(5 minutes)"
+}
+
+variable "link_sweeper_timeout" {
+  description = "Expired link sweeper function timeout in seconds"
+  type        = number
+  default     = 300
+}
+
 variable "link_prefix" {
   type = string
 }
@@ -0,0 +1,336 @@
+"""
+リダイレクト(redirect_request)・管理画面(admin_portal)の関数を、Lambdaの代わりに常駐するHTTPサーバーで実行するスタンドアロンサーバー。
+
+マスタープロセスが待ち受けのソケットを開き、--workersの数のワーカープロセスをforkする。
+各ワーカーはfork後に関数(lambda/{function}/app.py)を読み込み、共有されたソケットから接続を受け付けて1件ずつ処理する
+(Lambdaのコンテナと同じく、リクエストは同時に1件のみ処理される)。
+リクエストはAPI Gatewayのイベントを経由せずにDelibirdRequestへ変換してlambda_handlerを呼び出すため、
+リンクのキャッシュ・DynamoDBへの接続・構築済みのリダイレクト計画などは、ワーカーごとにリクエスト間で再利用される。
+
+- SIGHUP: 新しいワーカーを起動してから古いワーカーを終了する(コード・設定の再読み込み)。起動中の接続は待ち受けのキューで待機する
+- SIGTERM / SIGINT: 処理中のリクエストとバッファされた書き込み(使用回数・クリックイベント)を完了してから終了する
+- 異常終了したワーカーは起動し直す
+
+環境変数はLambdaの関数と同じもの(テーブル名・ENV_VAR・ALLOWED_DOMAINなど)を設定すること。
+管理画面は認証を行わないため、認証を行うリバースプロキシの背後でのみ公開すること。
+
+Usage:
+    python server/standalone_server.py --function redirect_request --port 8080 --workers 4 \\
+        [--path-prefix dev] [--keep-alive-timeout 5] [--graceful-timeout 30]
+"""
+import argparse
+import base64
+import os
+import re
+import selectors
+import signal
+import socket
+import sys
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+_REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+_LAYER_DIR = _REPOSITORY_DIR / "lambda" / "layers" / "common" / "python"
+FUNCTIONS = ("redirect_request", "admin_portal")
+# 管理画面のパス ({path_prefix}/admin/{path})
+_ADMIN_PATH = "admin"
+# API Gatewayのペイロードの上限に合わせる
+_MAX_BODY_BYTES = 10 * 1024 * 1024
+_HOST_PORT_PATTERN = re.compile(r":\d+$")
+# キープアライブを使用しない場合に、リクエストの受信を待つ時間 (遅いクライアントがワーカーを占有し続けないようにする)
+_REQUEST_TIMEOUT_SECONDS = 10.0
+# 起動直後に異常終了した場合は、設定の誤りとして再起動せずにサーバーを終了する
+_FAIL_FAST_SECONDS = 1.0
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a Delibird function as a pre-forked HTTP server.")
+    parser.add_argument("--function", choices=FUNCTIONS, default="redirect_request")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--path-prefix", default="", help="Path prefix of the links (LINK_PREFIX of the admin portal).")
+    parser.add_argument("--keep-alive-timeout", type=float, default=0,
+                        help="Seconds an idle connection is kept open (0: close after each response). "
+                             "A worker serves one connection at a time, so keep it short.")
+    parser.add_argument("--graceful-timeout", type=float, default=30, help="Seconds to wait for workers to finish on shutdown.")
+    parser.add_argument("--backlog", type=int, default=1024)
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be positive.")
+    return args
+
+
+def route(function: str, path_prefix: str, path: str) -> Optional[str]:
+    """リクエストのパスから、関数のパスパラメータ(path)を返す。関数の対象外のパスの場合はNoneを返す"""
+    path = unquote(path)
+    prefix = f"/{path_prefix.strip('/')}" if path_prefix.strip("/") else ""
+    if prefix:
+        if (path != prefix) and (not path.startswith(f"{prefix}/")):
+            return None
+        path = path[len(prefix):]
+    path = path.lstrip("/")
+    is_admin = (path == _ADMIN_PATH) or path.startswith(f"{_ADMIN_PATH}/")
+    if function == "admin_portal":
+        return path[len(_ADMIN_PATH):].lstrip("/") if is_admin else None
+    return None if is_admin else path
+
+
+class _Worker:
+    """共有された待ち受けのソケットから接続を受け付け、関数のlambda_handlerで1件ずつ処理するワーカープロセス"""
+
+    def __init__(self, function: str, listener: socket.socket, args: argparse.Namespace):
+        self._function = function
+        self._listener = listener
+        self._args = args
+        self._stopping = False
+
+    def _stop(self, *_args) -> None:
+        self._stopping = True
+
+    def _load(self) -> Callable[[Any, Any], dict]:
+        function_dir = _REPOSITORY_DIR / "lambda" / self._function
+        sys.path[:0] = [str(_LAYER_DIR), str(function_dir)]
+        os.environ.setdefault("FUNCTION_RESOURCE_DIR", str(function_dir))
+        import app
+
+        return app.lambda_handler
+
+    def _handler_class(self, handler: Callable[[Any, Any], dict]) -> type[BaseHTTPRequestHandler]:
+        from util.logger_util import setup_logger
+        from util.request_util import DelibirdRequest
+        from util.response_util import error_response
+
+        logger = setup_logger("standalone_server")
+        worker = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            server_version = "Delibird"
+            # キープアライブ中に次のリクエストを待つ時間 (超えた場合は接続を閉じる)
+            timeout = worker._args.keep_alive_timeout or _REQUEST_TIMEOUT_SECONDS
+            disable_nagle_algorithm = True
+
+            def log_message(self, *_args) -> None:
+                # リクエストのログは関数が出力する
+                pass
+
+            def _read_body(self) -> Optional[str]:
+                if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                    raise _RequestError(HTTPStatus.LENGTH_REQUIRED)
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > _MAX_BODY_BYTES:
+                    raise _RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                if length <= 0:
+                    return None
+                try:
+                    return self.rfile.read(length).decode("utf-8")
+                except UnicodeDecodeError:
+                    raise _RequestError(HTTPStatus.BAD_REQUEST)
+
+            def _handle(self) -> None:
+                if (not worker._args.keep_alive_timeout) or worker._stopping:
+                    self.close_connection = True
+                split = urlsplit(self.path)
+                path = route(worker._function, worker._args.path_prefix, split.path)
+                try:
+                    body = self._read_body()
+                except (_RequestError, ValueError) as e:
+                    # 読み込めなかった本文が次のリクエストとして解釈されないように、接続を閉じる
+                    self.close_connection = True
+                    return self._send(error_response(e.status if isinstance(e, _RequestError) else HTTPStatus.BAD_REQUEST, force_json=True))
+                if path is None:
+                    return self._send(error_response(HTTPStatus.NOT_FOUND))
+
+                # API Gatewayと同じく、Hostヘッダーにはポートを含めない
+                headers = {**dict(self.headers.items()), "Host": _HOST_PORT_PATTERN.sub("", self.headers.get("Host", ""))}
+                request = DelibirdRequest(
+                    http_method=self.command,
+                    headers=headers,
+                    path_parameters={"path": path} if path else {},
+                    resolved_query_string_parameters=parse_qs(split.query, keep_blank_values=True),
+                    body=body,
+                )
+                try:
+                    response = handler(request, None)
+                except Exception:
+                    logger.exception("Unhandled error in lambda_handler.")
+                    response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR)
+                self._send(response)
+
+            def _send(self, response: dict) -> None:
+                body = response.get("body") or ""
+                data = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+                self.send_response(response["statusCode"])
+                for key, value in (response.get("headers") or {}).items():
+                    self.send_header(key, value)
+                for key, values in (response.get("multiValueHeaders") or {}).items():
+                    for value in values:
+                        self.send_header(key, value)
+                self.send_header("Content-Length", str(len(data)))
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(data)
+
+            do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = _handle
+
+        return RequestHandler
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        request_handler = self._handler_class(self._load())
+        from util.lifecycle_util import drain_after_invocation
+
+        server = SimpleNamespace()
+        selector = selectors.DefaultSelector()
+        selector.register(self._listener, selectors.EVENT_READ)
+        while not self._stopping:
+            if not selector.select(timeout=0.5):
+                continue
+            try:
+                connection, address = self._listener.accept()
+            except (BlockingIOError, InterruptedError):
+                # 他のワーカーが先に受け付けた場合
+                continue
+            connection.setblocking(True)
+            try:
+                request_handler(connection, address, server)
+            except Exception:
+                # 接続の途中で切断された場合など
+                pass
+            finally:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                connection.close()
+
+        selector.close()
+        self._listener.close()
+        # 使用回数・クリックイベントなどのバッファされた書き込みを完了してから終了する
+        drain_after_invocation()
+        return 0
+
+
+class _RequestError(Exception):
+    def __init__(self, status: HTTPStatus):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+class _Master:
+    """ワーカープロセスを起動・監視し、シグナルに応じて再起動・終了する"""
+
+    def __init__(self, args: argparse.Namespace):
+        self._args = args
+        self._listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+        self._listener.setblocking(False)
+        # pid -> (世代, 起動した時刻)
+        self._workers: dict[int, tuple[int, float]] = {}
+        self._generation = 0
+        self._reload_requested = False
+        self._stop_requested = False
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _Worker(self._args.function, self._listener, self._args).run()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self._workers[pid] = (self._generation, time.monotonic())
+
+    def _signal(self, pids: list[int], signum: int) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reload(self) -> None:
+        old_workers = list(self._workers)
+        self._generation += 1
+        for _ in range(self._args.workers):
+            self._spawn()
+        self._signal(old_workers, signal.SIGTERM)
+        print(f"Reloaded {self._args.function}: generation {self._generation}.", file=sys.stderr)
+
+    def _reap(self) -> int:
+        """終了したワーカーを回収し、現在の世代のワーカーが異常終了した場合は起動し直す。起動直後の異常終了の場合は1を返す"""
+        while self._workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._workers.clear()
+                break
+            if pid == 0:
+                break
+            generation, started_at = self._workers.pop(pid, (None, 0.0))
+            exit_code = os.waitstatus_to_exitcode(status)
+            if (generation != self._generation) or self._stop_requested:
+                continue
+            print(f"Worker {pid} exited with {exit_code}.", file=sys.stderr)
+            if (exit_code != 0) and (time.monotonic() - started_at < _FAIL_FAST_SECONDS):
+                return 1
+            self._spawn()
+        return 0
+
+    def _shutdown(self) -> None:
+        self._signal(list(self._workers), signal.SIGTERM)
+        deadline = time.monotonic() + self._args.graceful_timeout
+        while self._workers and (time.monotonic() < deadline):
+            self._reap()
+            time.sleep(0.1)
+        # 終了しなかったワーカーは強制終了する
+        self._signal(list(self._workers), signal.SIGKILL)
+        for pid in list(self._workers):
+            os.waitpid(pid, 0)
+        self._workers.clear()
+
+    def run(self) -> int:
+        def request_reload(*_args) -> None:
+            self._reload_requested = True
+
+        def request_stop(*_args) -> None:
+            self._stop_requested = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        for _ in range(self._args.workers):
+            self._spawn()
+        print(f"Serving {self._args.function} on {self._args.host}:{self._listener.getsockname()[1]} "
+              f"with {self._args.workers} workers.", file=sys.stderr)
+
+        code = 0
+        while not self._stop_requested:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            if (code := self._reap()) != 0:
+                print("A worker failed on startup, shutting down.", file=sys.stderr)
+                break
+            time.sleep(0.2)
+        self._shutdown()
+        self._listener.close()
+        return code
+
+
+def main() -> int:
+    return _Master(_parse_args()).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+リンクの保存先(メモリ・SQLite)が、LinkStoreの同じ契約を満たすことを確認するテスト。
+
+Usage:
+    python -m unittest discover -s tests
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import Optional
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+os.environ.setdefault("ENV_VAR", json.dumps({}))
+# テーブルモデルの定義に必要な環境変数 (DynamoDBには接続しない)
+for _name in ("AWS_REGION", "LINK_TABLE_NAME", "LINK_TAG_TABLE_NAME", "LINK_COUNTER_TABLE_NAME", "DOMAIN_META_TABLE_NAME"):
+    os.environ.setdefault(_name, "local")
+sys.path.insert(0, str(_LAYER_DIR))
+
+from ddb.models.delibird_link import DelibirdLinkTableModel, DelibirdLinkInactiveStatus  # noqa: E402
+from store.link_store import LinkStore  # noqa: E402
+from store.memory_store import MemoryLinkStore  # noqa: E402
+from store.sqlite_store import SQLiteDatabase, SQLiteLinkStore  # noqa: E402
+from util.date_util import get_jst_datetime_now  # noqa: E402
+
+_DOMAIN = "link.example.com"
+_OTHER_DOMAIN = "other.example.com"
+
+
+def _link_model(slug: str, domain: str = _DOMAIN, origin: Optional[str] = None, max_uses: Optional[int] = None) -> DelibirdLinkTableModel:
+    return DelibirdLinkTableModel(domain=domain, slug=slug, created_at=get_jst_datetime_now(),
+                                  origin=origin or f"https://example.com/{slug}", status=302, disabled=False,
+                                  query_omit=True, max_uses=max_uses)
+
+
+class _LinkStoreContract:
+    """全ての保存先で共通の振る舞い (サブクラスでunittest.TestCaseと組み合わせ、create_storeを実装する)"""
+
+    def create_store(self) -> LinkStore:
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.create_store()
+
+    def test_put_link_does_not_overwrite_existing_link(self):
+        self.assertTrue(self.store.put_link(_link_model("a")))
+        self.assertFalse(self.store.put_link(_link_model("a", origin="https://example.com/other")))
+        self.assertTrue(self.store.put_link(_link_model("a", domain=_OTHER_DOMAIN)))
+
+        link = self.store.get_link(_DOMAIN, "a")
+        self.assertEqual(link.link_origin, "https://example.com/a")
+        self.assertEqual(link._model.version, 1)
+        self.assertIsNone(self.store.get_link(_DOMAIN, "missing"))
+
+    def test_query_links_in_slug_order(self):
+        for slug in ("c", "a", "d", "b"):
+            self.store.put_link(_link_model(slug))
+        self.store.put_link(_link_model("a0", domain=_OTHER_DOMAIN))
+
+        def slugs(**kwargs) -> list[str]:
+            return [model.slug for model in self.store.query_links(_DOMAIN, **kwargs)]
+
+        self.assertEqual(slugs(), ["a", "b", "c", "d"])
+        self.assertEqual(slugs(start_slug="b"), ["c", "d"])
+        self.assertEqual(slugs(limit=2), ["a", "b"])
+        self.assertEqual(slugs(start_slug="a", limit=2), ["b", "c"])
+        self.assertEqual(slugs(start_slug="d"), [])
+
+    def test_increment_uses_stops_at_limit(self):
+        self.assertEqual([self.store.increment_uses(_DOMAIN, "a", limit=2) for _ in range(3)], [1, 2, None])
+        self.assertIsNone(self.store.increment_uses(_DOMAIN, "b", limit=0))
+        self.assertEqual(self.store.load_uses(_DOMAIN, "a"), (0, 2))
+        self.assertEqual(self.store.load_uses(_DOMAIN, "b"), (0, 0))
+
+    def test_add_uses_is_counted_apart_from_limited_uses(self):
+        self.store.add_uses(_DOMAIN, "a", 5)
+        self.store.add_uses(_DOMAIN, "a", 2)
+        self.assertEqual(self.store.increment_uses(_DOMAIN, "a", limit=1), 1)
+        self.assertEqual(self.store.load_uses(_DOMAIN, "a"), (7, 1))
+        self.assertEqual(self.store.load_uses(_OTHER_DOMAIN, "a"), (0, 0))
+
+    def test_mark_max_uses_exceeded_only_once_for_same_max_uses(self):
+        self.store.put_link(_link_model("limited", max_uses=3))
+        self.store.put_link(_link_model("unlimited"))
+
+        self.assertFalse(self.store.mark_max_uses_exceeded(_DOMAIN, "limited", 2))
+        self.assertIsNone(self.store.get_link(_DOMAIN, "limited").inactive_status)
+        self.assertTrue(self.store.mark_max_uses_exceeded(_DOMAIN, "limited", 3))
+        self.assertFalse(self.store.mark_max_uses_exceeded(_DOMAIN, "limited", 3))
+        self.assertFalse(self.store.mark_max_uses_exceeded(_DOMAIN, "unlimited", 3))
+        self.assertFalse(self.store.mark_max_uses_exceeded(_DOMAIN, "missing", 3))
+
+        link = self.store.get_link(_DOMAIN, "limited")
+        self.assertEqual(link.inactive_status, DelibirdLinkInactiveStatus.MAX_USES_EXCEEDED)
+        self.assertEqual(link.link_origin, "https://example.com/limited")
+        self.assertIsNone(self.store.get_link(_DOMAIN, "unlimited").inactive_status)
+
+    def test_bump_cache_version_per_domain(self):
+        self.assertEqual(self.store.get_cache_version(_DOMAIN), 0)
+        self.assertEqual([self.store.bump_cache_version(_DOMAIN) for _ in range(2)], [1, 2])
+        self.assertEqual(self.store.get_cache_version(_DOMAIN), 2)
+        self.assertEqual(self.store.get_cache_version(_OTHER_DOMAIN), 0)
+
+
+class MemoryLinkStoreTest(_LinkStoreContract, unittest.TestCase):
+    def create_store(self) -> LinkStore:
+        return MemoryLinkStore()
+
+
+class SQLiteLinkStoreTest(_LinkStoreContract, unittest.TestCase):
+    def create_store(self) -> LinkStore:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "delibird.sqlite3")
+        self.database = SQLiteDatabase(self.path)
+        return SQLiteLinkStore(self.database)
+
+    def test_reopened_database_keeps_links_and_uses(self):
+        self.store.put_link(_link_model("a", max_uses=1))
+        self.store.increment_uses(_DOMAIN, "a", limit=1)
+        self.store.bump_cache_version(_DOMAIN)
+
+        reopened = SQLiteLinkStore(SQLiteDatabase(self.path))
+        self.assertEqual(reopened.get_link(_DOMAIN, "a").max_uses, 1)
+        self.assertIsNone(reopened.increment_uses(_DOMAIN, "a", limit=1))
+        self.assertEqual(reopened.get_cache_version(_DOMAIN), 1)
+
+    def test_increment_uses_from_threads_never_exceeds_limit(self):
+        results: list[Optional[int]] = []
+        lock = threading.Lock()
+
+        def increment():
+            for _ in range(20):
+                value = self.store.increment_uses(_DOMAIN, "a", limit=50)
+                with lock:
+                    results.append(value)
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        succeeded = sorted(value for value in results if value is not None)
+        self.assertEqual(succeeded, list(range(1, 51)))
+        self.assertEqual(self.store.load_uses(_DOMAIN, "a"), (0, 50))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+    def test_forked_process_opens_its_own_connection(self):
+        # fork前に接続を確立し、子プロセスが親の接続を引き継がずに新しい接続で書き込むことを確認する
+        self.store.put_link(_link_model("a"))
+        parent_connection = self.database.connection()
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                ok = (self.database.connection() is not parent_connection) \
+                    and (self.store.increment_uses(_DOMAIN, "a", limit=10) == 1) and (self.store.bump_cache_version(_DOMAIN) == 1)
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(self.store.load_uses(_DOMAIN, "a"), (0, 1))
+        self.assertEqual(self.store.get_cache_version(_DOMAIN), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+既存のリンクから、管理画面の絞り込みに使用するインデックスを作成するツール。
+
+タグのインデックス(タグのテーブル)と無効化された日時(disabled_at)は、リンクの作成・更新と同じトランザクションで書き込まれる。
+書き込みを導入する前から存在するリンクを反映するため、デプロイ後に1度実行する (何度実行しても良い)。
+有効期限のインデックスはリンクテーブルのGSIのため、DynamoDBによって自動で作成される。
+ただし、以前の更新で有効期限にNULLが書き込まれたリンクはGSIに含められないため、NULLの属性を削除する。
+実行中に管理画面からリンクのタグを変更しないこと (削除されたタグのインデックスが残る場合がある)。
+
+Usage:
+    python tools/build_link_indexes.py --region ap-northeast-1 \\
+        --link-table Delibird-dev-DelibirdLinkTable \\
+        --link-tag-table Delibird-dev-DelibirdLinkTagTable \\
+        [--domain link.example.com] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build the tag index and the disabled index of existing links.")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--link-table", required=True)
+    parser.add_argument("--link-tag-table", required=True)
+    parser.add_argument("--domain", default=None, help="Build only the given domain.")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["AWS_REGION"] = args.region
+    os.environ["LINK_TABLE_NAME"] = args.link_table
+    os.environ["LINK_TAG_TABLE_NAME"] = args.link_tag_table
+    # リンクテーブルのモデルが読み込むカウンターテーブルには書き込まない
+    os.environ.setdefault("LINK_COUNTER_TABLE_NAME", "")
+    os.environ.setdefault("ENV_VAR", "{}")
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from pynamodb.constants import NULL
+    from pynamodb.exceptions import UpdateError
+    from pynamodb.expressions.operand import Path as AttributePath
+
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+    from ddb.models.delibird_link_tag import DelibirdLinkTagTableModel
+    from util.date_util import get_jst_datetime_now
+
+    attributes = [DelibirdLinkTableModel.domain.attr_name, DelibirdLinkTableModel.slug.attr_name, DelibirdLinkTableModel.tag.attr_name,
+                  DelibirdLinkTableModel.disabled.attr_name, DelibirdLinkTableModel.disabled_at.attr_name]
+    if args.domain:
+        models = DelibirdLinkTableModel.query(hash_key=args.domain, attributes_to_get=attributes)
+    else:
+        models = DelibirdLinkTableModel.scan(attributes_to_get=attributes)
+
+    links, tags, disabled_links = 0, 0, 0
+    with DelibirdLinkTagTableModel.batch_write() as batch:
+        for model in models:
+            links += 1
+            for tag in sorted(model.tag or ()):
+                tags += 1
+                if not args.dry_run:
+                    batch.save(DelibirdLinkTagTableModel.of(model.domain, tag, model.slug))
+
+            if model.disabled and (model.disabled_at is None):
+                disabled_links += 1
+                print(f"{model.domain}/{model.slug}: set disabled_at")
+                if args.dry_run:
+                    continue
+                # 実行中に有効化されたリンクには設定しない
+                try:
+                    model.update(actions=[DelibirdLinkTableModel.disabled_at.set(get_jst_datetime_now())],
+                                 condition=(DelibirdLinkTableModel.disabled == True) & DelibirdLinkTableModel.disabled_at.does_not_exist())
+                except UpdateError as e:
+                    if e.cause_response_code != "ConditionalCheckFailedException":
+                        raise e
+
+    null_expiration = AttributePath(DelibirdLinkTableModel.expiration_date).is_type(NULL)
+    if args.domain:
+        null_models = DelibirdLinkTableModel.query(hash_key=args.domain, filter_condition=null_expiration, attributes_to_get=attributes)
+    else:
+        null_models = DelibirdLinkTableModel.scan(filter_condition=null_expiration, attributes_to_get=attributes)
+    null_links = 0
+    for model in null_models:
+        null_links += 1
+        print(f"{model.domain}/{model.slug}: remove null expiration_date")
+        if args.dry_run:
+            continue
+        # 実行中に有効期限が設定されたリンクは変更しない
+        try:
+            model.update(actions=[DelibirdLinkTableModel.expiration_date.remove()], condition=null_expiration)
+        except UpdateError as e:
+            if e.cause_response_code != "ConditionalCheckFailedException":
+                raise e
+
+    print(f"links: {links}, tags: {tags}, disabled links without disabled_at: {disabled_links}, "
+          f"links with null expiration_date: {null_links}" + (" (dry run)" if args.dry_run else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+ドメインのリンクのスナップショット(リダイレクトの関数がDBより先に参照する、mmapで読み込むバイナリ)を構築するツール。
+
+有効期限・パスフレーズ・最大使用回数のない有効なリンクのみを含み、ドメインのキャッシュの版数を記録する。
+--outputのディレクトリに{domain}.snapとして書き込み、共通レイヤーのpython/link_snapshots(既定)に置くとデプロイに含まれる。
+--bucketを指定すると、管理画面の書き込みで差分を再構築する起点として、LINK_SNAPSHOT_BUCKETにも版数ごとに保存する。
+リダイレクトはドメインのキャッシュの版数と一致するスナップショットのみを使用するため、リンクを変更した後は再構築が必要になる。
+
+Usage:
+    python tools/build_link_snapshot.py --region ap-northeast-1 \\
+        --link-table Delibird-dev-DelibirdLinkTable --link-counter-table Delibird-dev-DelibirdLinkCounterTable \\
+        --domain-meta-table Delibird-dev-DelibirdDomainMetaTable [--shards 8] \\
+        --domain link.example.com [--domain ...] [--output lambda/layers/common/python/link_snapshots] \\
+        [--bucket delibird-link-snapshots] [--prefix link-snapshots/]
+    python tools/build_link_snapshot.py --sqlite-path /var/lib/delibird/delibird.sqlite3 \\
+        --domain link.example.com --output /var/lib/delibird/link_snapshots
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+_REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+_LAYER_DIR = _REPOSITORY_DIR / "lambda" / "layers" / "common" / "python"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build memory-mapped link snapshots of domains for the redirect function.")
+    parser.add_argument("--domain", action="append", required=True, help="Domain to build (repeatable).")
+    parser.add_argument("--output", default=str(_LAYER_DIR / "link_snapshots"),
+                        help="Directory of the snapshot files (LINK_SNAPSHOT_DIR of the redirect function).")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--link-table", default=None)
+    parser.add_argument("--link-counter-table", default=None)
+    parser.add_argument("--domain-meta-table", default=None)
+    parser.add_argument("--shards", type=int, default=8, help="Number of counter shards (LINK_COUNTER_SHARDS).")
+    parser.add_argument("--sqlite-path", default=None, help="Build from the SQLite link store instead of DynamoDB.")
+    parser.add_argument("--bucket", default=None, help="Also upload the snapshots to this bucket (LINK_SNAPSHOT_BUCKET).")
+    parser.add_argument("--prefix", default="link-snapshots/", help="Key prefix in the bucket (LINK_SNAPSHOT_PREFIX).")
+    args = parser.parse_args()
+    if (args.sqlite_path is None) and not all((args.region, args.link_table, args.link_counter_table, args.domain_meta_table)):
+        parser.error("--region, --link-table, --link-counter-table and --domain-meta-table are required without --sqlite-path.")
+    return args
+
+
+def main() -> int:
+    args = _parse_args()
+    env_var = {"LINK_SNAPSHOT_BUCKET": args.bucket or "", "LINK_SNAPSHOT_PREFIX": args.prefix, "LINK_COUNTER_SHARDS": args.shards}
+    if args.sqlite_path is not None:
+        env_var |= {"STORE_BACKEND": "sqlite", "STORE_SQLITE_PATH": args.sqlite_path}
+    os.environ["ENV_VAR"] = json.dumps(env_var)
+    # テーブルモデルの定義に必要な環境変数 (SQLiteの場合はDynamoDBには接続しない)
+    for name, value in (("AWS_REGION", args.region), ("LINK_TABLE_NAME", args.link_table),
+                        ("LINK_COUNTER_TABLE_NAME", args.link_counter_table), ("DOMAIN_META_TABLE_NAME", args.domain_meta_table)):
+        os.environ[name] = value or os.environ.get(name, "local")
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from store.link_snapshot import build_link_snapshot_entries, encode_link_snapshot, upload_link_snapshot, write_link_snapshot
+    from store.link_store import get_link_store
+
+    for domain in args.domain:
+        started_at = time.perf_counter()
+        # 版数をリンクより先に読み込み、構築中に変更されたリンクがあってもスナップショットが版数の時点より古くならないようにする
+        version = get_link_store().get_cache_version(domain)
+        entries = list(build_link_snapshot_entries(domain))
+        data = encode_link_snapshot(domain, version, entries)
+        path = Path(args.output) / f"{domain}.snap"
+        write_link_snapshot(path, data)
+        if args.bucket:
+            upload_link_snapshot(domain, version, data)
+        print(f"{domain}: version {version}, {len(entries)} links, {len(data)} bytes -> {path}"
+              f"{f' (uploaded to s3://{args.bucket})' if args.bucket else ''}, {time.perf_counter() - started_at:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
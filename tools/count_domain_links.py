@@ -0,0 +1,72 @@
+"""
+ドメインごとのリンク数・無効化されたリンク数を数え、ドメインのメタデータへ設定するツール。
+
+管理画面のリンク数は、リンクの作成・更新時にドメインのメタデータへ加算される。
+加算を導入する前から存在するリンクを反映するため、デプロイ後に1度実行する。
+数えた値で上書きするため、実行中に管理画面からリンクを作成・更新しないこと(再実行で修正される)。
+
+Usage:
+    python tools/count_domain_links.py --region ap-northeast-1 \\
+        --link-table Delibird-dev-DelibirdLinkTable \\
+        --domain-meta-table Delibird-dev-DelibirdDomainMetaTable \\
+        [--domain link.example.com] [--dry-run]
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Count the links of each domain and store the counts in the domain meta table.")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--link-table", required=True)
+    parser.add_argument("--domain-meta-table", required=True)
+    parser.add_argument("--domain", default=None, help="Count only the given domain.")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["AWS_REGION"] = args.region
+    os.environ["LINK_TABLE_NAME"] = args.link_table
+    os.environ["DOMAIN_META_TABLE_NAME"] = args.domain_meta_table
+    # リンクテーブルのモデルが読み込むカウンターテーブルには書き込まない
+    os.environ.setdefault("LINK_COUNTER_TABLE_NAME", "")
+    os.environ.setdefault("ENV_VAR", "{}")
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+
+    attributes = [DelibirdLinkTableModel.domain.attr_name, DelibirdLinkTableModel.disabled.attr_name]
+    if args.domain:
+        models = DelibirdLinkTableModel.query(hash_key=args.domain, attributes_to_get=attributes)
+    else:
+        models = DelibirdLinkTableModel.scan(attributes_to_get=attributes)
+
+    links: Counter[str] = Counter()
+    disabled_links: Counter[str] = Counter()
+    for model in models:
+        links[model.domain] += 1
+        disabled_links[model.domain] += int(bool(model.disabled))
+
+    for domain in sorted(links):
+        print(f"{domain}: links={links[domain]}, disabled={disabled_links[domain]}")
+        if args.dry_run:
+            continue
+        DelibirdDomainMetaTableModel(domain).update(actions=[
+            DelibirdDomainMetaTableModel.link_count.set(links[domain]),
+            DelibirdDomainMetaTableModel.disabled_link_count.set(disabled_links[domain]),
+        ])
+
+    print(f"domains: {len(links)}" + (" (dry run)" if args.dry_run else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
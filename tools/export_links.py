@@ -0,0 +1,279 @@
+"""
+リンクと使用回数を、NDJSONまたはCSVでローカルのディレクトリかS3(互換)のプレフィックスへエクスポートするツール。
+
+ドメインを指定しない場合はテーブル全体を、セグメントに分割したScanで並列に読み込む。
+読み込んだリンクはページごとに使用回数を集計して書き出すため、メモリの使用量はリンク数によらない。
+出力はセグメントごとに最大--part-rows件のパートファイルに分割され、完了後にmanifest.jsonを書き込む。
+パートを書き込むたびに出力先のcheckpoint.jsonへ読み込み位置を記録し、中断した場合は--resumeで続きから再開できる。
+列名は管理画面の一括作成(/admin/bulk)と同じため、エクスポートしたファイルをそのまま読み込める。
+
+Usage:
+    python tools/export_links.py --region ap-northeast-1 \\
+        --link-table Delibird-dev-DelibirdLinkTable \\
+        --link-counter-table Delibird-dev-DelibirdLinkCounterTable \\
+        --output s3://backup-bucket/delibird/2026-10-18 \\
+        [--domain link.example.com] [--format ndjson|csv] [--gzip] [--segments 8] [--shards 8] \\
+        [--include-passphrase] [--resume] [--s3-endpoint-url http://localhost:9000]
+"""
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+_CHECKPOINT_NAME = "checkpoint.json"
+_MANIFEST_NAME = "manifest.json"
+# パートをディスクへ書き出すまでメモリに保持する大きさ
+_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+_CSV_COLUMNS = ("domain", "link_slug", "link_origin", "status", "disabled", "disabled_at", "created_at", "memo", "tag",
+                "expiration_date", "expired_origin", "passphrase", "query_omit", "query_whitelist", "max_uses", "cacheable", "uses")
+# CSVで複数の値を持つ列の区切り文字 (一括作成と同じ)
+_CSV_LIST_SEPARATOR = ";"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export links and their uses as NDJSON or CSV.")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--link-table", required=True)
+    parser.add_argument("--link-counter-table", required=True)
+    parser.add_argument("--output", required=True, help="Local directory or s3://bucket/prefix.")
+    parser.add_argument("--domain", default=None, help="Export only the given domain (read with Query instead of Scan).")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--segments", type=int, default=4, help="Number of parallel Scan segments for the whole table.")
+    parser.add_argument("--page-size", type=int, default=500, help="Links read per request (and per counter lookup).")
+    parser.add_argument("--shards", type=int, default=8, help="Number of counter shards (LINK_COUNTER_SHARDS).")
+    parser.add_argument("--part-rows", type=int, default=100000, help="Maximum number of links in a part file.")
+    parser.add_argument("--include-passphrase", action="store_true")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint in the output.")
+    parser.add_argument("--s3-endpoint-url", default=None, help="Endpoint of an S3-compatible storage.")
+    args = parser.parse_args()
+    if args.domain:
+        args.segments = 1
+    if (args.segments < 1) or (args.page_size < 1) or (args.part_rows < 1):
+        parser.error("--segments, --page-size and --part-rows must be positive.")
+    return args
+
+
+class _LocalSink:
+    def __init__(self, path: str):
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+
+    def read(self, name: str) -> Optional[bytes]:
+        path = self._path / name
+        return path.read_bytes() if path.exists() else None
+
+    def write(self, name: str, data: BinaryIO) -> None:
+        # 書き込み途中のファイルが完成したパートに見えないように、一時ファイルから置き換える
+        tmp_path = self._path / f".{name}.tmp"
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(data, f)
+        os.replace(tmp_path, self._path / name)
+
+
+class _S3Sink:
+    def __init__(self, url: str, region: str, endpoint_url: Optional[str]):
+        import boto3
+
+        bucket, _, prefix = url.removeprefix("s3://").partition("/")
+        self._bucket = bucket
+        self._prefix = f"{prefix.rstrip('/')}/" if prefix else ""
+        self._client = boto3.client("s3", region_name=region, endpoint_url=endpoint_url)
+
+    def read(self, name: str) -> Optional[bytes]:
+        try:
+            return self._client.get_object(Bucket=self._bucket, Key=self._prefix + name)["Body"].read()
+        except self._client.exceptions.NoSuchKey:
+            return None
+
+    def write(self, name: str, data: BinaryIO) -> None:
+        # 大きなパートはマルチパートアップロードで送信される
+        self._client.upload_fileobj(data, self._bucket, self._prefix + name)
+
+
+class _Checkpoint:
+    """セグメントごとの読み込み位置。パートを書き込むたびに出力先へ保存する"""
+
+    def __init__(self, sink, options: dict[str, Any], segments: dict[str, Any]):
+        self._sink = sink
+        self._lock = threading.Lock()
+        self.options = options
+        self.segments = segments
+
+    @classmethod
+    def load(cls, sink, options: dict[str, Any], resume: bool) -> "_Checkpoint":
+        data = sink.read(_CHECKPOINT_NAME)
+        if data is None:
+            return cls(sink, options, {str(segment): {"next_part": 0, "last_evaluated_key": None, "done": False, "parts": []}
+                                       for segment in range(options["segments"])})
+        if not resume:
+            raise SystemExit("A checkpoint already exists in the output. Pass --resume to continue it, or use another output.")
+        checkpoint = json.loads(data)
+        if checkpoint["options"] != options:
+            raise SystemExit(f"The options differ from the checkpoint: {checkpoint['options']}")
+        return cls(sink, options, checkpoint["segments"])
+
+    def commit_part(self, segment: int, part: Optional[dict[str, Any]], last_evaluated_key: Optional[dict], done: bool) -> None:
+        with self._lock:
+            state = self.segments[str(segment)]
+            if part is not None:
+                state["parts"].append(part)
+                state["next_part"] += 1
+            state["last_evaluated_key"] = last_evaluated_key
+            state["done"] = done
+            self._sink.write(_CHECKPOINT_NAME, io.BytesIO(json.dumps({"options": self.options, "segments": self.segments}).encode()))
+
+
+class _PartWriter:
+    """1つのパートをメモリ(大きい場合は一時ファイル)に書き込む"""
+
+    def __init__(self, export_format: str, compress: bool):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+        self._gzip = gzip.GzipFile(fileobj=self._spool, mode="wb") if compress else None
+        self._text = io.TextIOWrapper(self._gzip or self._spool, encoding="utf-8", newline="")
+        self._csv = csv.DictWriter(self._text, fieldnames=_CSV_COLUMNS, extrasaction="ignore") if export_format == "csv" else None
+        if self._csv is not None:
+            self._csv.writeheader()
+        self.rows = 0
+
+    def write(self, row: dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow({key: _CSV_LIST_SEPARATOR.join(value) if isinstance(value, list) else _csv_value(value)
+                                for key, value in row.items()})
+        else:
+            self._text.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.rows += 1
+
+    def close(self) -> BinaryIO:
+        """書き込みを完了し、先頭へ巻き戻したパートのファイルを返す"""
+        self._text.flush()
+        self._text.detach()
+        if self._gzip is not None:
+            self._gzip.close()
+        self._spool.seek(0)
+        return self._spool
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["AWS_REGION"] = args.region
+    os.environ["LINK_TABLE_NAME"] = args.link_table
+    os.environ["LINK_COUNTER_TABLE_NAME"] = args.link_counter_table
+    # セグメントごとの読み込みとカウンターの読み込みが同時に接続を使用する
+    os.environ.setdefault("ENV_VAR", json.dumps({"DDB_MAX_POOL_CONNECTIONS": max(10, args.segments * 2), "LINK_COUNTER_SHARDS": args.shards}))
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+    from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel
+    from util.date_util import as_jst, get_jst_datetime_now
+
+    def iso_jst(value: Optional[datetime]) -> Optional[str]:
+        return as_jst(value).isoformat() if value is not None else None
+
+    def to_row(model: DelibirdLinkTableModel, uses: int) -> dict[str, Any]:
+        row = {
+            "domain": model.domain,
+            "link_slug": model.slug,
+            "link_origin": model.origin,
+            "status": int(model.status),
+            "disabled": bool(model.disabled),
+            "disabled_at": iso_jst(model.disabled_at),
+            "created_at": iso_jst(model.created_at),
+            "memo": model.memo,
+            "tag": sorted(model.tag or ()),
+            "expiration_date": iso_jst(model.expiration_date),
+            "expired_origin": model.expired_origin,
+            "passphrase": model.passphrase if args.include_passphrase else None,
+            "query_omit": bool(model.query_omit),
+            "query_whitelist": sorted(model.query_whitelist or ()),
+            "max_uses": int(model.max_uses) if model.max_uses is not None else None,
+            "cacheable": bool(model.cacheable),
+            # 移行前のリンクはリンクアイテム自体に使用回数を保持している
+            "uses": uses + (int(model.uses) if model.uses is not None else 0),
+        }
+        # 一括作成では指定されていない値を省略するため、値のない列は出力しない
+        return {key: value for key, value in row.items() if value is not None}
+
+    def page_uses(models: list[DelibirdLinkTableModel]) -> dict[tuple[str, str], int]:
+        # Scan・Queryはドメインごとにまとめて返すため、ページ内のドメインごとに全シャードのキーのBatchGetItemで集計する
+        uses: dict[tuple[str, str], int] = {}
+        for domain, group in itertools.groupby(models, key=lambda model: model.domain):
+            for slug, count in DelibirdLinkCounterTableModel.sum_slugs(domain, [model.slug for model in group]).items():
+                uses[(domain, slug)] = count
+        return uses
+
+    def read_links(segment: int, last_evaluated_key: Optional[dict]):
+        if args.domain:
+            return DelibirdLinkTableModel.query(hash_key=args.domain, page_size=args.page_size, last_evaluated_key=last_evaluated_key)
+        return DelibirdLinkTableModel.scan(segment=segment, total_segments=args.segments, page_size=args.page_size,
+                                           last_evaluated_key=last_evaluated_key)
+
+    extension = args.format + (".gz" if args.gzip else "")
+
+    def export_segment(segment: int) -> None:
+        state = checkpoint.segments[str(segment)]
+        if state["done"]:
+            return
+        links = read_links(segment, state["last_evaluated_key"])
+        pages: Iterator[list[DelibirdLinkTableModel]] = iter(lambda: list(itertools.islice(links, args.page_size)), [])
+        part_number = state["next_part"]
+        writer = _PartWriter(args.format, args.gzip)
+        for models in pages:
+            uses = page_uses(models)
+            for model in models:
+                writer.write(to_row(model, uses.get((model.domain, model.slug), 0)))
+            if writer.rows < args.part_rows:
+                continue
+            # パートはページの境界で区切り、次のパートはこのページの最後のリンクの次から読み込む
+            name = f"part-{segment:04d}-{part_number:05d}.{extension}"
+            sink.write(name, writer.close())
+            checkpoint.commit_part(segment, {"name": name, "rows": writer.rows}, links.last_evaluated_key, done=False)
+            print(f"segment {segment}: wrote {name} ({writer.rows} links)")
+            part_number += 1
+            writer = _PartWriter(args.format, args.gzip)
+
+        part = None
+        if writer.rows:
+            part = {"name": f"part-{segment:04d}-{part_number:05d}.{extension}", "rows": writer.rows}
+            sink.write(part["name"], writer.close())
+            print(f"segment {segment}: wrote {part['name']} ({writer.rows} links)")
+        checkpoint.commit_part(segment, part, None, done=True)
+
+    sink = _S3Sink(args.output, args.region, args.s3_endpoint_url) if args.output.startswith("s3://") else _LocalSink(args.output)
+    options = {"table": args.link_table, "domain": args.domain, "format": args.format, "gzip": args.gzip,
+               "segments": args.segments, "include_passphrase": args.include_passphrase}
+    checkpoint = _Checkpoint.load(sink, options, args.resume)
+
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        # 例外はここで送出させる (チェックポイントから再開できる)
+        list(executor.map(export_segment, range(args.segments)))
+
+    parts = [part for segment in range(args.segments) for part in checkpoint.segments[str(segment)]["parts"]]
+    manifest = {**options, "exported_at": get_jst_datetime_now().isoformat(), "rows": sum(part["rows"] for part in parts),
+                "parts": parts}
+    sink.write(_MANIFEST_NAME, io.BytesIO(json.dumps(manifest, indent=2).encode()))
+    print(f"links: {manifest['rows']}, parts: {len(parts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
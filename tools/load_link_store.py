@@ -0,0 +1,82 @@
+"""
+NDJSONのリンクを、リダイレクトの関数のローカルの保存先(STORE_BACKENDがsqlite)のSQLiteのファイルへ読み込むツール。
+
+入力はtools/export_links.pyのNDJSON(--format ndjson、.gzは展開する)か、管理画面の一括作成(/admin/bulk)と同じ形式のNDJSON。
+行にdomainがない場合は--domainのドメインに作成する。使用回数(uses)と作成日時(created_at)がある場合は引き継ぐ。
+既に存在するリンクは変更しない(使用回数も加算しない)ため、同じファイルを再実行しても安全。
+
+Usage:
+    python tools/load_link_store.py --sqlite-path /var/lib/delibird/delibird.sqlite3 \\
+        export/segment-000-part-00000.ndjson.gz [more files ...] [--domain link.example.com]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+_REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+_LAYER_DIR = _REPOSITORY_DIR / "lambda" / "layers" / "common" / "python"
+_ADMIN_PORTAL_DIR = _REPOSITORY_DIR / "lambda" / "admin_portal"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load links from NDJSON into the local SQLite link store.")
+    parser.add_argument("--sqlite-path", required=True, help="SQLite file of the store (STORE_SQLITE_PATH of the redirect function).")
+    parser.add_argument("files", nargs="+", help="NDJSON files (.gz files are decompressed).")
+    parser.add_argument("--domain", default=None, help="Domain of rows without a domain.")
+    return parser.parse_args()
+
+
+def _read_rows(path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as lines:
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["ENV_VAR"] = json.dumps({"STORE_BACKEND": "sqlite", "STORE_SQLITE_PATH": args.sqlite_path})
+    # テーブルモデルの定義に必要な環境変数 (DynamoDBには接続しない)
+    for name in ("AWS_REGION", "LINK_TABLE_NAME", "LINK_TAG_TABLE_NAME"):
+        os.environ.setdefault(name, "local")
+    sys.path[:0] = [str(_LAYER_DIR), str(_ADMIN_PORTAL_DIR)]
+
+    from portal_page.link_data import parse_link_data, new_link_model
+    from store.link_store import get_link_store
+    from util.date_util import as_jst
+
+    store = get_link_store()
+    created, skipped, failed = 0, 0, 0
+    for path in args.files:
+        for number, row in _read_rows(path):
+            domain: Optional[str] = row.get("domain") or args.domain
+            try:
+                if not domain:
+                    raise ValueError("domain is required (set --domain).")
+                model = new_link_model(parse_link_data(domain, row))
+                if "created_at" in row:
+                    model.created_at = as_jst(datetime.fromisoformat(str(row["created_at"])))
+                uses = int(row.get("uses") or 0)
+            except Exception as e:
+                print(f"{path}:{number}: {type(e).__name__}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            if not store.put_link(model):
+                skipped += 1
+                continue
+            if uses:
+                store.add_uses(domain, model.slug, uses)
+            created += 1
+
+    print(f"Created {created} links, skipped {skipped} existing links, failed {failed} rows.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
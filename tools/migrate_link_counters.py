@@ -0,0 +1,99 @@
+"""
+既存のリンクアイテムに保持されている使用回数(uses)を、カウンターテーブルへ移行するツール。
+
+リンクアイテムのusesを削除すると同時に、同じ値をカウンターテーブルのLIMITED_SHARDへ加算する。
+1アイテムずつトランザクションで実行するため、途中で中断しても再実行すれば残りが移行される。
+ドメインごとに移行した後はキャッシュの版数を更新し、リダイレクトのコンテナにキャッシュされた移行前のリンクを無効化する
+(--snapshot-bucketを指定した場合は、その版数のスナップショットも保存する)。
+
+Usage:
+    python tools/migrate_link_counters.py --region ap-northeast-1 \\
+        --link-table Delibird-dev-DelibirdLinkTable \\
+        --counter-table Delibird-dev-DelibirdLinkCounterTable \\
+        --domain-meta-table Delibird-dev-DelibirdDomainMetaTable \\
+        [--domain link.example.com] [--snapshot-bucket delibird-link-snapshots] [--dry-run]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from pathlib import Path
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Migrate link uses from the link table to the counter table.")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--link-table", required=True)
+    parser.add_argument("--counter-table", required=True)
+    parser.add_argument("--domain-meta-table", required=True)
+    parser.add_argument("--domain", default=None, help="Migrate only the given domain.")
+    parser.add_argument("--snapshot-bucket", default=None, help="Save the link snapshots of the new cache versions (LINK_SNAPSHOT_BUCKET).")
+    parser.add_argument("--snapshot-prefix", default="link-snapshots/", help="Key prefix in the bucket (LINK_SNAPSHOT_PREFIX).")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["AWS_REGION"] = args.region
+    os.environ["LINK_TABLE_NAME"] = args.link_table
+    os.environ["LINK_COUNTER_TABLE_NAME"] = args.counter_table
+    os.environ["DOMAIN_META_TABLE_NAME"] = args.domain_meta_table
+    os.environ.setdefault("ENV_VAR", json.dumps({"LINK_SNAPSHOT_BUCKET": args.snapshot_bucket or "",
+                                                 "LINK_SNAPSHOT_PREFIX": args.snapshot_prefix}))
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from pynamodb.connection import Connection
+    from pynamodb.exceptions import TransactWriteError
+    from pynamodb.transactions import TransactWrite
+
+    from ddb.models.delibird_domain_meta import DelibirdDomainMetaTableModel
+    from ddb.models.delibird_link import DelibirdLinkTableModel
+    from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel, LIMITED_SHARD
+    from store.link_snapshot import refresh_link_snapshot
+
+    connection = Connection(region=args.region)
+    if args.domain:
+        models = DelibirdLinkTableModel.query(hash_key=args.domain, filter_condition=DelibirdLinkTableModel.uses.exists())
+    else:
+        models = DelibirdLinkTableModel.scan(filter_condition=DelibirdLinkTableModel.uses.exists())
+
+    migrated, failed = 0, 0
+    # Scan・Queryはドメインごとにまとめて返すため、ドメインごとに移行してからキャッシュを無効化する
+    for domain, group in itertools.groupby(models, key=lambda model: model.domain):
+        domain_migrated = 0
+        for model in group:
+            uses = int(model.uses)
+            print(f"{model.domain}/{model.slug}: uses={uses}")
+            if args.dry_run:
+                continue
+
+            counter = DelibirdLinkCounterTableModel(DelibirdLinkCounterTableModel.build_counter_key(model.domain, model.slug, LIMITED_SHARD))
+            try:
+                with TransactWrite(connection=connection) as transaction:
+                    transaction.update(counter, actions=[DelibirdLinkCounterTableModel.uses.add(uses)])
+                    # 移行中に使用回数が変化した場合は失敗させ、再実行で移行する
+                    transaction.update(model, actions=[DelibirdLinkTableModel.uses.remove()], condition=(DelibirdLinkTableModel.uses == uses))
+            except TransactWriteError as e:
+                print(f"  failed: {e.cause_response_code} {e.cause_response_message}", file=sys.stderr)
+                failed += 1
+                continue
+            domain_migrated += 1
+
+        if domain_migrated:
+            # キャッシュされたリンクは移行前の使用回数を保持しているため、カウンターと二重に数えないように無効化する
+            version = DelibirdDomainMetaTableModel.bump_cache_version(domain)
+            # スナップショットのリンクには使用回数が含まれないため、版数のみを更新する
+            refresh_link_snapshot(domain, version)
+            print(f"{domain}: migrated {domain_migrated} links, cache version {version}")
+        migrated += domain_migrated
+
+    print(f"migrated: {migrated}, failed: {failed}" + (" (dry run)" if args.dry_run else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+共有キャッシュ(CDN)から返されたリダイレクトの使用回数を、CloudFrontの標準ログ(アクセスログ)から集計してカウンターテーブルへ反映するツール。
+
+共有キャッシュに保存するリンク(cacheable)へのリクエストのうち、CDNのキャッシュから返されたもの(x-edge-result-typeがHit)は
+リダイレクトの関数に届かないため、その分の使用回数をログから加算する。関数に届いたリクエスト(Miss・RefreshHit)は関数で計上される。
+ログファイルは行ごとに読み込み、(ドメイン, slug)ごとの件数のみを保持する。加算はシャードへの並列のUpdateItemで行う。
+
+処理したログファイルと未反映の件数は--stateのファイルに記録し、同じログファイルは2回集計しない。
+加算はチャンクごとに記録するため、中断した場合は同じコマンドを再実行すると未反映の件数から再開する
+(中断したチャンクの加算のみ、重複する可能性がある)。
+
+Usage:
+    python tools/reconcile_cdn_uses.py --region ap-northeast-1 \\
+        --link-counter-table Delibird-dev-DelibirdLinkCounterTable \\
+        --state reconcile-state.json \\
+        s3://log-bucket/cloudfront/ [more files, directories or prefixes ...] \\
+        [--link-prefix dev] [--result-types Hit] [--shards 8] [--dry-run] [--s3-endpoint-url http://localhost:9000]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+_LAYER_DIR = Path(__file__).resolve().parent.parent / "lambda" / "layers" / "common" / "python"
+
+# 加算を記録する単位 (中断した場合に重複しうる件数の上限)
+_APPLY_CHUNK_SIZE = 100
+# 状態ファイルで(ドメイン, slug)を1つのキーにする区切り文字 (ドメインにもslugにも使用できない)
+_KEY_SEPARATOR = " "
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Add the uses of redirects served from the CDN cache, from CloudFront access logs.")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--link-counter-table", required=True)
+    parser.add_argument("--state", required=True, help="Local JSON file recording the processed log files and pending counts.")
+    parser.add_argument("logs", nargs="+", help="Log files, directories or s3://bucket/prefix (.gz files are decompressed).")
+    parser.add_argument("--link-prefix", default="", help="Path prefix of the links (LINK_PREFIX of the admin portal).")
+    parser.add_argument("--result-types", default="Hit",
+                        help="Comma-separated x-edge-result-type values counted (requests that did not reach the function).")
+    parser.add_argument("--shards", type=int, default=8, help="Number of counter shards (LINK_COUNTER_SHARDS).")
+    parser.add_argument("--dry-run", action="store_true", help="Print the counts without writing them or the state.")
+    parser.add_argument("--s3-endpoint-url", default=None, help="Endpoint of an S3-compatible storage.")
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be positive.")
+    return args
+
+
+class _LogSource:
+    """ローカルのファイル・ディレクトリとS3のプレフィックスから、ログファイルを列挙して読み込む"""
+
+    def __init__(self, region: str, endpoint_url: Optional[str]):
+        self._region = region
+        self._endpoint_url = endpoint_url
+        self._client = None
+
+    def _s3(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", region_name=self._region, endpoint_url=self._endpoint_url)
+        return self._client
+
+    def list(self, location: str) -> Iterator[str]:
+        if location.startswith("s3://"):
+            bucket, _, prefix = location.removeprefix("s3://").partition("/")
+            for page in self._s3().get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+                for item in page.get("Contents", ()):
+                    yield f"s3://{bucket}/{item['Key']}"
+            return
+        path = Path(location)
+        if path.is_dir():
+            yield from (str(p.resolve()) for p in sorted(path.rglob("*")) if p.is_file())
+        else:
+            yield str(path.resolve())
+
+    def open(self, name: str) -> TextIO:
+        if name.startswith("s3://"):
+            bucket, _, key = name.removeprefix("s3://").partition("/")
+            stream = self._s3().get_object(Bucket=bucket, Key=key)["Body"]
+        else:
+            stream = open(name, "rb")
+        if name.endswith(".gz"):
+            stream = gzip.GzipFile(fileobj=stream)
+        return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def _count_log(lines: TextIO, link_prefix: str, result_types: set[str], counts: Counter) -> int:
+    """
+    CloudFrontの標準ログ(タブ区切り、#Fieldsの行で列名を指定)から、CDNのキャッシュから返されたリダイレクトを
+    (ドメイン, slug)ごとに数える。数えた件数を返す。
+    """
+    columns: dict[str, int] = {}
+    path_prefix = f"/{link_prefix}/" if link_prefix else "/"
+    counted = 0
+    for line in lines:
+        if line.startswith("#Fields:"):
+            columns = {name: i for i, name in enumerate(line.removeprefix("#Fields:").split())}
+            continue
+        if line.startswith("#") or (not line.strip()):
+            continue
+        if not columns:
+            raise ValueError("Log file has no #Fields line.")
+        values = line.rstrip("\n").split("\t")
+        if (values[columns["cs-method"]] != "GET") or (values[columns["x-edge-result-type"]] not in result_types):
+            continue
+        if not values[columns["sc-status"]].startswith("3"):
+            continue
+        uri = values[columns["cs-uri-stem"]]
+        if not uri.startswith(path_prefix):
+            continue
+        # リダイレクトの関数と同じく、ドメインはHostヘッダー(x-host-header)から判定する
+        domain = values[columns["x-host-header"]].strip().lower()
+        slug = uri.removeprefix(path_prefix).lstrip("/")
+        if domain and slug:
+            counts[(domain, slug)] += 1
+            counted += 1
+    return counted
+
+
+def _load_state(path: Path) -> dict:
+    if not path.exists():
+        return {"processed": [], "pending": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_state(path: Path, state: dict) -> None:
+    # 書き込み途中で中断しても前回の状態が残るように、一時ファイルから置き換える
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def main() -> int:
+    args = _parse_args()
+    os.environ["AWS_REGION"] = args.region
+    os.environ["LINK_COUNTER_TABLE_NAME"] = args.link_counter_table
+    os.environ.setdefault("ENV_VAR", "{}")
+    sys.path.insert(0, str(_LAYER_DIR))
+
+    from ddb.models.delibird_link_counter import DelibirdLinkCounterTableModel
+
+    state_path = Path(args.state)
+    state = _load_state(state_path)
+    processed = set(state["processed"])
+    result_types = {value.strip() for value in args.result_types.split(",") if value.strip()}
+    source = _LogSource(args.region, args.s3_endpoint_url)
+
+    # 前回までに反映できなかった件数に、新しいログファイルの件数を加える
+    counts: Counter = Counter({tuple(key.split(_KEY_SEPARATOR, 1)): count for key, count in state["pending"].items()})
+    new_files = [name for location in args.logs for name in source.list(location) if name not in processed]
+    for name in new_files:
+        with source.open(name) as lines:
+            counted = _count_log(lines, args.link_prefix, result_types, counts)
+        print(f"{name}: {counted} cached redirects", file=sys.stderr)
+
+    if args.dry_run:
+        for (domain, slug), count in sorted(counts.items()):
+            print(json.dumps({"domain": domain, "slug": slug, "uses": count}, ensure_ascii=False))
+        return 0
+
+    def save(pending: Counter) -> None:
+        state["processed"] = sorted(processed)
+        state["pending"] = {_KEY_SEPARATOR.join(key): count for key, count in pending.items()}
+        _save_state(state_path, state)
+
+    # ログファイルを処理済みにしてから加算し、加算した件数を未反映の件数から除いていく
+    processed.update(new_files)
+    save(counts)
+
+    def add(item: tuple[tuple[str, str], int]) -> Optional[tuple[str, str]]:
+        (domain, slug), count = item
+        try:
+            DelibirdLinkCounterTableModel.add_uses(domain, slug, random.randrange(args.shards), count)
+        except Exception as e:
+            print(f"Failed to add uses for domain: {domain}, slug: {slug}, count: {count}, error: {e}", file=sys.stderr)
+            return None
+        return domain, slug
+
+    items = sorted(counts.items())
+    applied = 0
+    with ThreadPoolExecutor(max_workers=DelibirdLinkCounterTableModel.Meta.max_pool_connections) as executor:
+        for start in range(0, len(items), _APPLY_CHUNK_SIZE):
+            for key in executor.map(add, items[start:start + _APPLY_CHUNK_SIZE]):
+                if key is not None:
+                    applied += counts.pop(key)
+            save(counts)
+
+    print(f"Added {applied} uses from {len(new_files)} log files, pending: {sum(counts.values())} uses of {len(counts)} links.",
+          file=sys.stderr)
+    return 1 if counts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())